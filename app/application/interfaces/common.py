@@ -1,7 +1,35 @@
 from abc import abstractmethod
-from typing import Coroutine, Protocol
+from collections.abc import Callable
+from enum import StrEnum
+from typing import Any, Coroutine, Protocol, TypeVar
+
+from app.models import OutboxMessage
+
+R = TypeVar("R")
+
+
+class OverflowPolicy(StrEnum):
+    BLOCK = "block"
+    DROP = "drop"
+    RAISE = "raise"
 
 
 class IBackgroundExecutor(Protocol):
     @abstractmethod
-    def submit(self, coroutine: Coroutine) -> None: ...
+    async def submit(
+        self, coroutine: Coroutine, overflow_policy: OverflowPolicy | None = None
+    ) -> bool: ...
+
+    @abstractmethod
+    async def run_in_pool(self, fn: Callable[..., R], *args: Any) -> R: ...
+
+    @abstractmethod
+    async def drain(self) -> None: ...
+
+    @abstractmethod
+    async def shutdown(self, timeout: float | None = None) -> None: ...
+
+
+class IOutboxSink(Protocol):
+    @abstractmethod
+    async def send(self, messages: list[OutboxMessage]) -> None: ...
@@ -0,0 +1,33 @@
+import uuid
+from abc import abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Protocol
+
+
+@dataclass(frozen=True, slots=True)
+class PostView:
+    """Пост для чтения: только колонки, без ORM-сущности и сессии"""
+
+    id: uuid.UUID
+    text: str
+    created_at: datetime
+    author_id: uuid.UUID
+    author_name: str
+    attachments_count: int
+    attachment_urls: tuple[str, ...]
+
+
+class IPostQueries(Protocol):
+    @abstractmethod
+    async def get_post_view(self, post_id: uuid.UUID) -> PostView: ...
+
+    @abstractmethod
+    async def get_post_views(
+        self, post_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, PostView]: ...
+
+    @abstractmethod
+    async def list_post_views_by_user(
+        self, user_id: uuid.UUID, limit: int = ...
+    ) -> list[PostView]: ...
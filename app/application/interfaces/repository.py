@@ -1,8 +1,9 @@
 import uuid
 from abc import abstractmethod
-from typing import Protocol
+from collections.abc import AsyncIterator
+from typing import Any, Protocol
 
-from app.models import Post, PostAttachment, User
+from app.models import OutboxMessage, Post, PostAttachment, User
 
 
 class IUserRepository(Protocol):
@@ -12,6 +13,20 @@ class IUserRepository(Protocol):
     @abstractmethod
     async def get_by_id(self, user_id: uuid.UUID) -> User: ...
 
+    @abstractmethod
+    async def get_many(self, user_ids: list[uuid.UUID]) -> dict[uuid.UUID, User]: ...
+
+    @abstractmethod
+    async def insert_list(self, users: list[User]) -> None: ...
+
+    @abstractmethod
+    async def increment_posts_count(
+        self, user_id: uuid.UUID, count: int = 1
+    ) -> None: ...
+
+    @abstractmethod
+    async def increment_posts_counts(self, counts: dict[uuid.UUID, int]) -> None: ...
+
 
 class IPostRepository(Protocol):
     @abstractmethod
@@ -20,7 +35,42 @@ class IPostRepository(Protocol):
     @abstractmethod
     async def get_by_id(self, post_id: uuid.UUID) -> Post: ...
 
+    @abstractmethod
+    async def get_many(self, post_ids: list[uuid.UUID]) -> dict[uuid.UUID, Post]: ...
+
+    @abstractmethod
+    async def insert_list(self, posts: list[Post]) -> None: ...
+
+    @abstractmethod
+    def iter_posts_by_user(
+        self, user_id: uuid.UUID, page_size: int = ...
+    ) -> AsyncIterator[Post]: ...
+
+    @abstractmethod
+    async def increment_attachments_count(
+        self, post_id: uuid.UUID, count: int = 1
+    ) -> None: ...
+
 
 class IPostAttachmentRepository(Protocol):
     @abstractmethod
     async def save_list(self, post_attachments: list[PostAttachment]) -> None: ...
+
+    @abstractmethod
+    async def insert_list(self, post_attachments: list[PostAttachment]) -> None: ...
+
+    @abstractmethod
+    def iter_attachments_by_post(
+        self, post_id: uuid.UUID, page_size: int = ...
+    ) -> AsyncIterator[PostAttachment]: ...
+
+
+class IOutboxRepository(Protocol):
+    @abstractmethod
+    async def add(self, topic: str, payload: dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def add_many(self, topic: str, payloads: list[dict[str, Any]]) -> None: ...
+
+    @abstractmethod
+    async def claim_batch(self, limit: int) -> list[OutboxMessage]: ...
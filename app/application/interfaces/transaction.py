@@ -1,5 +1,31 @@
 from abc import abstractmethod
-from typing import Callable, Protocol
+from enum import StrEnum
+from typing import Any, Awaitable, Callable, Iterable, Protocol, TypeVar
+
+T = TypeVar("T")
+
+OnCommitCallback = Callable[[], Awaitable[None] | None]
+
+
+class ChildTasks(StrEnum):
+    """
+    Какую сессию получают задачи, созданные внутри контекста
+    (asyncio.gather, TaskGroup, create_task)
+    """
+
+    # Своя сессия и своё соединение из пула
+    OWN_SESSION = "own_session"
+    # Сессия родителя только на чтение, tm.transaction() в дочерней задаче запрещён
+    INHERIT_READ_ONLY = "inherit_read_only"
+
+
+class IsolationLevel(StrEnum):
+    """Уровни изоляции от слабого к сильному"""
+
+    READ_UNCOMMITTED = "READ UNCOMMITTED"
+    READ_COMMITTED = "READ COMMITTED"
+    REPEATABLE_READ = "REPEATABLE READ"
+    SERIALIZABLE = "SERIALIZABLE"
 
 
 class ITransactionalSession(Protocol):
@@ -7,10 +33,13 @@ class ITransactionalSession(Protocol):
     async def flush(self) -> None: ...
 
     @abstractmethod
-    def add_on_commit(self, cb: Callable[[], None]) -> None: ...
+    def expunge_many(self, entities: Iterable[Any]) -> None: ...
+
+    @abstractmethod
+    def add_on_commit(self, cb: OnCommitCallback) -> None: ...
 
     @abstractmethod
-    def remove_on_commit(self, cb: Callable[[], None]) -> None: ...
+    def remove_on_commit(self, cb: OnCommitCallback) -> None: ...
 
 
 class ITransactionContext(Protocol):
@@ -23,4 +52,28 @@ class ITransactionContext(Protocol):
 
 class ITransactionManager(Protocol):
     @abstractmethod
-    def transaction(self) -> ITransactionContext: ...
+    def transaction(
+        self,
+        *,
+        child_tasks: ChildTasks | None = None,
+        name: str | None = None,
+        savepoint: bool = False,
+        isolation_level: IsolationLevel | None = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+    ) -> ITransactionContext: ...
+
+    @abstractmethod
+    async def run(
+        self,
+        unit: Callable[[], Awaitable[T]],
+        *,
+        child_tasks: ChildTasks | None = None,
+        name: str | None = None,
+        isolation_level: IsolationLevel | None = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+    ) -> T: ...
+
+    @abstractmethod
+    def current_session(self) -> ITransactionalSession | None: ...
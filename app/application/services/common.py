@@ -0,0 +1,2 @@
+# Сколько сущностей пакетные методы сервисов записывают за один раз
+BULK_CHUNK_SIZE = 500
@@ -1,10 +1,25 @@
+import itertools
 import uuid
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
 
-from app.application.interfaces.repository import IPostRepository, IUserRepository
+from app.application.interfaces.repository import (
+    IOutboxRepository,
+    IPostAttachmentRepository,
+    IPostRepository,
+    IUserRepository,
+)
 from app.application.interfaces.transaction import ITransactionManager
+from app.application.services.common import BULK_CHUNK_SIZE
 from app.application.services.post_attachment import PostattachmentService
-from app.models import Post
+from app.models import Post, PostAttachment
+
+
+@dataclass(frozen=True)
+class NewPost:
+    text: str
+    user_id: uuid.UUID
+    attachments_url: list[str] = field(default_factory=list)
 
 
 @dataclass
@@ -12,21 +27,84 @@ class PostService:
     _tm: ITransactionManager
     _post_repository: IPostRepository
     _user_repository: IUserRepository
+    _outbox_repository: IOutboxRepository
+    _post_attachment_repository: IPostAttachmentRepository
 
     _post_attachment_servie: PostattachmentService
 
     async def create_post(
         self, *, text: str, user_id: uuid.UUID, attachments_url: list[str]
     ) -> uuid.UUID:
-        async with self._tm.transaction():
-            post = Post.create(text=text, user_id=user_id)
-            await self._post_repository.save(post)
-            await self._post_attachment_servie.create_attachments(
-                post_id=post.id, file_urls=attachments_url
+        # Конкурентные посты одного пользователя обновляют одну строку users -
+        # при deadlock или serialization failure единица работы повторяется
+        return await self._tm.run(
+            lambda: self._create_post(
+                text=text, user_id=user_id, attachments_url=attachments_url
+            )
+        )
+
+    async def _create_post(
+        self, *, text: str, user_id: uuid.UUID, attachments_url: list[str]
+    ) -> uuid.UUID:
+        post = Post.create(text=text, user_id=user_id)
+        await self._post_repository.save(post)
+        await self._post_attachment_servie.create_attachments(
+            post_id=post.id, file_urls=attachments_url
+        )
+
+        await self._user_repository.increment_posts_count(post.user_id)
+
+        await self._outbox_repository.add(
+            "post_created", {"post_id": str(post.id), "user_id": str(post.user_id)}
+        )
+
+        return post.id
+
+    async def create_posts(
+        self, *, posts: list[NewPost], chunk_size: int = BULK_CHUNK_SIZE
+    ) -> list[uuid.UUID]:
+        return await self._tm.run(lambda: self._create_posts(posts, chunk_size))
+
+    async def _create_posts(
+        self, new_posts: list[NewPost], chunk_size: int
+    ) -> list[uuid.UUID]:
+        post_ids: list[uuid.UUID] = []
+        posts_count: Counter[uuid.UUID] = Counter()
+
+        # Транзакцию уже открыл tm.run, записанные сущности отпускаются из её сессии
+        session = self._tm.current_session()
+        assert session is not None
+        for chunk in itertools.batched(new_posts, chunk_size):
+            posts = [
+                Post.create(
+                    text=new_post.text,
+                    user_id=new_post.user_id,
+                    attachments_count=len(new_post.attachments_url),
+                )
+                for new_post in chunk
+            ]
+            attachments = [
+                PostAttachment.create(post_id=post.id, file_url=file_url)
+                for post, new_post in zip(posts, chunk)
+                for file_url in new_post.attachments_url
+            ]
+
+            await self._post_repository.insert_list(posts)
+            await self._post_attachment_repository.insert_list(attachments)
+            await self._outbox_repository.add_many(
+                "post_created",
+                [
+                    {"post_id": str(post.id), "user_id": str(post.user_id)}
+                    for post in posts
+                ],
             )
 
-            user = await self._user_repository.get_by_id(post.user_id)
-            user.increament_posts_count()
-            await self._user_repository.save(user)
+            posts_count.update(post.user_id for post in posts)
+            post_ids.extend(post.id for post in posts)
+            session.expunge_many([*posts, *attachments])
+
+        # Счётчики постов - за весь пакет, один UPDATE на каждое значение
+        # инкремента
+        await self._user_repository.increment_posts_counts(dict(posts_count))
 
-            return post.id
+        return post_ids
@@ -23,10 +23,10 @@ class PostattachmentService:
                 PostAttachment.create(post_id=post_id, file_url=file_url)
                 for file_url in file_urls
             ]
-            await self._post_attachment_repository.save_list(post_attachments)
+            await self._post_attachment_repository.insert_list(post_attachments)
 
-            post = await self._post_repository.get_by_id(post_id)
-            post.update_attachments_count(len(post_attachments))
-            await self._post_repository.save(post)
+            await self._post_repository.increment_attachments_count(
+                post_id, len(post_attachments)
+            )
 
             return [post_attachment.id for post_attachment in post_attachments]
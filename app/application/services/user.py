@@ -1,12 +1,16 @@
+import itertools
 import uuid
 from dataclasses import dataclass
 
 from app.application.interfaces.repository import IUserRepository
+from app.application.interfaces.transaction import ITransactionManager
+from app.application.services.common import BULK_CHUNK_SIZE
 from app.models import User
 
 
 @dataclass
 class UserService:
+    _tm: ITransactionManager
     _user_repository: IUserRepository
 
     async def create_user(self, *, name: str) -> uuid.UUID:
@@ -15,3 +19,23 @@ class UserService:
         await self._user_repository.save(user)
 
         return user.id
+
+    async def create_users(
+        self, *, names: list[str], chunk_size: int = BULK_CHUNK_SIZE
+    ) -> list[uuid.UUID]:
+        return await self._tm.run(lambda: self._create_users(names, chunk_size))
+
+    async def _create_users(self, names: list[str], chunk_size: int) -> list[uuid.UUID]:
+        user_ids: list[uuid.UUID] = []
+
+        # Транзакцию уже открыл tm.run, записанные сущности отпускаются из её сессии
+        session = self._tm.current_session()
+        assert session is not None
+        for chunk in itertools.batched(names, chunk_size):
+            users = [User.create(name=name) for name in chunk]
+            await self._user_repository.insert_list(users)
+
+            session.expunge_many(users)
+            user_ids.extend(user.id for user in users)
+
+        return user_ids
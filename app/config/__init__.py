@@ -1,4 +1,5 @@
 import os
+from dataclasses import dataclass
 
 from dotenv import load_dotenv
 
@@ -6,7 +7,7 @@ load_dotenv()
 
 
 def get_not_empty_env(key: str) -> str:
-    value = os.environ.get("DATABSE_URL")
+    value = os.environ.get(key)
 
     if value is None:
         raise ValueError(f"{key} not exist in enviroment")
@@ -16,3 +17,91 @@ def get_not_empty_env(key: str) -> str:
 
 DATABASE_URL = get_not_empty_env("DATABSE_URL")
 DB_NAME = DATABASE_URL.split("/").pop()
+DATABASE_REPLICA_URLS = [
+    url for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url
+]
+DATABASE_REPLICA_SELECTION = os.environ.get("DATABASE_REPLICA_SELECTION", "round_robin")
+# Отдельный пул для tm.transaction(read_only=True); пусто - общий пул
+DATABASE_READ_ONLY_URL = os.environ.get("DATABASE_READ_ONLY_URL") or None
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    size: int = 5
+    max_overflow: int = 10
+    # Секунды; -1 - не пересоздавать соединения
+    recycle: int = -1
+    pre_ping: bool = False
+    # Сколько секунд ждать свободное соединение
+    timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            size=int(os.environ.get("DB_POOL_SIZE", cls.size)),
+            max_overflow=int(os.environ.get("DB_POOL_MAX_OVERFLOW", cls.max_overflow)),
+            recycle=int(os.environ.get("DB_POOL_RECYCLE", cls.recycle)),
+            pre_ping=os.environ.get("DB_POOL_PRE_PING", str(cls.pre_ping)).lower()
+            in ("1", "true", "yes"),
+            timeout=float(os.environ.get("DB_POOL_TIMEOUT", cls.timeout)),
+        )
+
+
+POOL_SETTINGS = PoolSettings.from_env()
+
+
+@dataclass(frozen=True)
+class StatementCacheSettings:
+    # Кэш скомпилированных SQLAlchemy запросов на движок; 0 - выключен
+    compiled_cache_size: int = 500
+    # Кэш prepared statements asyncpg на соединение; 0 - выключен
+    prepared_statement_cache_size: int = 100
+
+    @classmethod
+    def from_env(cls) -> "StatementCacheSettings":
+        return cls(
+            compiled_cache_size=int(
+                os.environ.get("DB_COMPILED_CACHE_SIZE", cls.compiled_cache_size)
+            ),
+            prepared_statement_cache_size=int(
+                os.environ.get(
+                    "DB_PREPARED_STATEMENT_CACHE_SIZE",
+                    cls.prepared_statement_cache_size,
+                )
+            ),
+        )
+
+
+STATEMENT_CACHE_SETTINGS = StatementCacheSettings.from_env()
+
+
+@dataclass(frozen=True)
+class EntityCacheSettings:
+    # Записей в кэше каждой сущности (User, Post)
+    max_size: int = 10_000
+    # Секунды; изменения вытесняют запись при коммите, TTL - страховка
+    ttl: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "EntityCacheSettings":
+        return cls(
+            max_size=int(os.environ.get("ENTITY_CACHE_MAX_SIZE", cls.max_size)),
+            ttl=float(os.environ.get("ENTITY_CACHE_TTL", cls.ttl)),
+        )
+
+
+ENTITY_CACHE_SETTINGS = EntityCacheSettings.from_env()
+
+BACKGROUND_POOL_MODE = os.environ.get("BACKGROUND_POOL_MODE", "thread")
+BACKGROUND_POOL_SIZE = int(os.environ.get("BACKGROUND_POOL_SIZE") or 0) or None
+
+# Лог-детектор для staging: пусто - выключен
+QUERY_BUDGET_MAX_STATEMENTS = (
+    int(os.environ.get("QUERY_BUDGET_MAX_STATEMENTS") or 0) or None
+)
+QUERY_BUDGET_MAX_REPEATS = int(os.environ.get("QUERY_BUDGET_MAX_REPEATS") or 0) or None
+
+# Повтор корневых транзакций tm.run() при deadlock/serialization failure
+RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS") or 3)
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY") or 0.01)
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY") or 0.5)
@@ -0,0 +1,86 @@
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from typing import Protocol, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+K_contra = TypeVar("K_contra", bound=Hashable, contravariant=True)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class ICacheBackend(Protocol[K_contra, V]):
+    stats: CacheStats
+
+    @abstractmethod
+    def get(self, key: K_contra) -> V | None: ...
+
+    @abstractmethod
+    def set(self, key: K_contra, value: V) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: K_contra) -> None: ...
+
+
+class LRUCache(ICacheBackend[K, V]):
+    _max_size: int
+    _ttl: float | None
+    _clock: Callable[[], float]
+    _data: OrderedDict[K, tuple[float, V]]
+    stats: CacheStats
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float | None = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        expires_at = float("inf") if self._ttl is None else self._clock() + self._ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def delete(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -1,17 +1,191 @@
 import asyncio
-from typing import Coroutine
+import functools
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any, Coroutine, TypeVar
 
-from app.application.interfaces.common import IBackgroundExecutor
+from app.application.interfaces.common import IBackgroundExecutor, OverflowPolicy
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+class PoolMode(StrEnum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+@dataclass
+class BackgroundExecutorStats:
+    queue_depth: int = 0
+    in_flight: int = 0
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    dropped: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        finished = self.completed + self.failed
+        return self.latency_total / finished if finished else 0.0
 
 
 class BackgroundExecutor(IBackgroundExecutor):
+    """
+    Выполняет корутины в фоне не более чем по max_concurrency одновременно.
+    Ещё max_queue_size корутин могут ждать своей очереди, при переполнении
+    срабатывает overflow_policy, submit может передать свою.
+
+    CPU-нагруженные функции выполняются через run_in_pool в пуле потоков
+    или процессов (pool_mode), чтобы не блокировать event loop.
+    """
+
+    _max_concurrency: int
+    _max_queue_size: int
+    _overflow_policy: OverflowPolicy
     _tasks: set[asyncio.Task]
+    _stats: BackgroundExecutorStats
+    _closed: bool
+    _capacity: asyncio.Semaphore | None
+    _concurrency: asyncio.Semaphore | None
+    _pool_mode: PoolMode
+    _pool_size: int | None
+    _pool: Executor | None
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        max_concurrency: int = 100,
+        max_queue_size: int = 1000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        pool_mode: PoolMode = PoolMode.THREAD,
+        pool_size: int | None = None,
+    ) -> None:
+        self._max_concurrency = max_concurrency
+        self._max_queue_size = max_queue_size
+        self._overflow_policy = overflow_policy
+        self._pool_mode = pool_mode
+        self._pool_size = pool_size
+        self._pool = None
         self._tasks = set()
+        self._stats = BackgroundExecutorStats()
+        self._closed = False
+        # Семафоры создаются лениво, чтобы привязаться к работающему event loop-у
+        self._capacity = None
+        self._concurrency = None
+
+    @property
+    def stats(self) -> BackgroundExecutorStats:
+        return self._stats
+
+    async def submit(
+        self, coroutine: Coroutine, overflow_policy: OverflowPolicy | None = None
+    ) -> bool:
+        if self._closed:
+            coroutine.close()
+            raise RuntimeError("Background executor is shut down")
 
-    def submit(self, coroutine: Coroutine) -> None:
-        loop = asyncio.get_event_loop()
-        task = loop.create_task(coroutine)
+        capacity, concurrency = self._get_semaphores()
+        overflow_policy = overflow_policy or self._overflow_policy
+
+        if capacity.locked():
+            if overflow_policy == OverflowPolicy.DROP:
+                coroutine.close()
+                self._stats.dropped += 1
+                logger.warning("Background executor queue is full, task dropped")
+                return False
+            if overflow_policy == OverflowPolicy.RAISE:
+                coroutine.close()
+                raise RuntimeError("Background executor queue is full")
+
+        await capacity.acquire()
+
+        self._stats.submitted += 1
+        self._stats.queue_depth += 1
+        task = asyncio.get_running_loop().create_task(
+            self._run(coroutine, capacity, concurrency, time.perf_counter())
+        )
         self._tasks.add(task)
         task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def run_in_pool(self, fn: Callable[..., R], *args: Any) -> R:
+        if self._closed:
+            raise RuntimeError("Background executor is shut down")
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_pool(), functools.partial(fn, *args)
+        )
+
+    async def drain(self) -> None:
+        while tasks := [task for task in self._tasks if not task.done()]:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def shutdown(self, timeout: float | None = None) -> None:
+        self._closed = True
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except TimeoutError:
+            tasks = [task for task in self._tasks if not task.done()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self._pool_mode == PoolMode.PROCESS:
+                self._pool = ProcessPoolExecutor(self._pool_size)
+            else:
+                self._pool = ThreadPoolExecutor(self._pool_size)
+        return self._pool
+
+    def _get_semaphores(self) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        if self._capacity is None or self._concurrency is None:
+            self._capacity = asyncio.Semaphore(
+                self._max_concurrency + self._max_queue_size
+            )
+            self._concurrency = asyncio.Semaphore(self._max_concurrency)
+        return self._capacity, self._concurrency
+
+    async def _run(
+        self,
+        coroutine: Coroutine,
+        capacity: asyncio.Semaphore,
+        concurrency: asyncio.Semaphore,
+        submitted_at: float,
+    ) -> None:
+        try:
+            try:
+                await concurrency.acquire()
+            except asyncio.CancelledError:
+                coroutine.close()
+                raise
+            finally:
+                self._stats.queue_depth -= 1
+
+            self._stats.in_flight += 1
+            try:
+                await coroutine
+            except Exception:
+                self._stats.failed += 1
+                logger.exception("Background task %r failed", coroutine)
+            else:
+                self._stats.completed += 1
+            finally:
+                self._stats.in_flight -= 1
+                concurrency.release()
+                latency = time.perf_counter() - submitted_at
+                self._stats.latency_total += latency
+                self._stats.latency_max = max(self._stats.latency_max, latency)
+        finally:
+            capacity.release()
@@ -0,0 +1,188 @@
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Sequence
+from dataclasses import dataclass
+from itertools import batched
+from operator import attrgetter
+from typing import TypeVar
+
+from sqlalchemy import func, insert, inspect, select, update
+
+from app.infrastructure.database.repository.cached import EntityCache
+from app.infrastructure.database.repository.common import in_ids
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+from app.models import BaseModel, Post, PostAttachment, User
+
+T = TypeVar("T")
+
+# Строк в одном COPY / executemany, каждый чанк пишется своей транзакцией
+INGEST_CHUNK_SIZE = 5000
+
+
+async def abatched(items: AsyncIterable[T], size: int) -> AsyncIterator[list[T]]:
+    if size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    chunk: list[T] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def _collect_ids(
+    items: AsyncIterable[T], ids: set[uuid.UUID], key: Callable[[T], uuid.UUID]
+) -> AsyncIterator[T]:
+    async for item in items:
+        ids.add(key(item))
+        yield item
+
+
+async def copy_entities(
+    session: TransactionalSession, model: type[BaseModel], entities: Sequence[BaseModel]
+) -> None:
+    # Колонки берутся из маппера один раз на чанк, а не через to_row
+    # на каждую сущность: на миллионах строк это основная цена Python
+    columns = [attr.key for attr in inspect(model).column_attrs]
+    records = list(map(attrgetter(*columns), entities))
+    connection = await session.connection()
+
+    if connection.dialect.driver != "asyncpg":
+        await session.execute(
+            insert(model), [dict(zip(columns, record)) for record in records]
+        )
+        return
+
+    async with session.io_lock:
+        # Адаптер asyncpg открывает транзакцию на первом запросе, а COPY идёт
+        # мимо него: без этого данные записались бы вне транзакции сессии
+        await connection.exec_driver_sql("SELECT 1")
+        raw = await connection.get_raw_connection()
+        driver_connection = raw.driver_connection
+        assert driver_connection is not None
+        await driver_connection.copy_records_to_table(
+            model.__tablename__, records=records, columns=columns
+        )
+
+
+@dataclass
+class BulkIngest:
+    """
+    Загрузка постов и вложений большими объёмами (бэкфилы, перенос данных).
+
+    Строки берутся из асинхронного итератора чанками и пишутся через COPY
+    (asyncpg) или executemany (остальные драйверы), минуя ORM. Каждый чанк -
+    отдельная транзакция, внутри tm.transaction() - общая транзакция
+    вызывающего кода. Денормализованные счётчики при загрузке не ведутся,
+    их пересчитывает recompute_counters для затронутых пользователей
+    и постов, вытесняя их из кэшей сущностей после коммита
+    """
+
+    _tm: TransactionManager
+    _user_cache: EntityCache[User]
+    _post_cache: EntityCache[Post]
+
+    async def ingest_posts(
+        self, posts: AsyncIterable[Post], *, chunk_size: int = INGEST_CHUNK_SIZE
+    ) -> int:
+        count = 0
+        async for chunk in abatched(posts, chunk_size):
+            async with self._tm.transaction() as tx:
+                await copy_entities(tx, Post, chunk)
+            count += len(chunk)
+        return count
+
+    async def ingest_attachments(
+        self,
+        attachments: AsyncIterable[PostAttachment],
+        *,
+        chunk_size: int = INGEST_CHUNK_SIZE,
+    ) -> int:
+        count = 0
+        async for chunk in abatched(attachments, chunk_size):
+            # Чанк проверяется целиком до записи, невалидный url
+            # не даёт записать ни одной строки чанка
+            for attachment in chunk:
+                try:
+                    PostAttachment.validate_file_url(attachment.file_url)
+                except ValueError as e:
+                    raise ValueError(f"Attachment {attachment.id}: {e}") from e
+
+            async with self._tm.transaction() as tx:
+                await copy_entities(tx, PostAttachment, chunk)
+            count += len(chunk)
+        return count
+
+    async def recompute_counters(
+        self,
+        user_ids: Iterable[uuid.UUID],
+        post_ids: Iterable[uuid.UUID],
+        *,
+        chunk_size: int = INGEST_CHUNK_SIZE,
+    ) -> None:
+        # Только переданные строки, чанками в своих транзакциях: UPDATE
+        # не проходит по всей таблице и не держит блокировки до конца пересчёта.
+        # id сортируются, чтобы параллельные пересчёты брали блокировки
+        # в одном порядке
+        now = BaseModel.gen_native_utc_now()
+        attachments_count = (
+            select(func.count())
+            .where(PostAttachment.post_id == Post.id)
+            .scalar_subquery()
+        )
+        posts_count = (
+            select(func.count()).where(Post.user_id == User.id).scalar_subquery()
+        )
+
+        for chunk in batched(sorted(set(post_ids)), chunk_size):
+            async with self._tm.transaction() as tx:
+                self._post_cache.invalidate_on_commit(tx, chunk)
+                await tx.execute(
+                    update(Post)
+                    .where(
+                        in_ids(Post.id, tx.get_bind().dialect.name),
+                        Post.attachments_count != attachments_count,
+                    )
+                    .values(attachments_count=attachments_count, updated_at=now)
+                    .execution_options(synchronize_session=False),
+                    {"ids": list(chunk)},
+                )
+
+        for chunk in batched(sorted(set(user_ids)), chunk_size):
+            async with self._tm.transaction() as tx:
+                self._user_cache.invalidate_on_commit(tx, chunk)
+                await tx.execute(
+                    update(User)
+                    .where(
+                        in_ids(User.id, tx.get_bind().dialect.name),
+                        User.posts_count != posts_count,
+                    )
+                    .values(posts_count=posts_count, updated_at=now)
+                    .execution_options(synchronize_session=False),
+                    {"ids": list(chunk)},
+                )
+
+    async def ingest(
+        self,
+        posts: AsyncIterable[Post],
+        attachments: AsyncIterable[PostAttachment],
+        *,
+        chunk_size: int = INGEST_CHUNK_SIZE,
+    ) -> tuple[int, int]:
+        user_ids: set[uuid.UUID] = set()
+        post_ids: set[uuid.UUID] = set()
+        posts_total = await self.ingest_posts(
+            _collect_ids(posts, user_ids, attrgetter("user_id")),
+            chunk_size=chunk_size,
+        )
+        attachments_total = await self.ingest_attachments(
+            _collect_ids(attachments, post_ids, attrgetter("post_id")),
+            chunk_size=chunk_size,
+        )
+        await self.recompute_counters(user_ids, post_ids, chunk_size=chunk_size)
+        return posts_total, attachments_total
@@ -0,0 +1,58 @@
+"""listing indexes
+
+Revision ID: 3f1c2a7d9e41
+Revises: 10b8c97becf8
+Create Date: 2026-10-18 18:20:41.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9e41'
+down_revision: Union[str, Sequence[str], None] = '10b8c97becf8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_post_user_id_created_at', 'post', ['user_id', 'created_at', 'id']),
+    ('ix_post_attachment_post_id_created_at', 'post_attachment', ['post_id', 'created_at', 'id']),
+)
+TABLES = ('user', 'post', 'post_attachment', 'outbox_message')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы строятся без блокировки записи, а CONCURRENTLY
+    # нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+    # UniqueConstraint('id') дублировал первичный ключ. Postgres такой
+    # дубль не создаёт, но базы, поднятые другими инструментами, могут его иметь.
+    # downgrade его не возвращает: он ничего не добавлял к первичному ключу
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS "{table}_id_key"')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
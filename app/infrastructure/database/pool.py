@@ -0,0 +1,156 @@
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+
+from app.config import PoolSettings, StatementCacheSettings
+
+
+@dataclass
+class PoolStats:
+    size: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+    checkouts: int = 0
+    overflow_checkouts: int = 0
+    peak_checked_out: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    @property
+    def wait_avg(self) -> float:
+        return self.wait_total / self.checkouts if self.checkouts else 0.0
+
+
+class PoolMetrics:
+    """
+    Метрики пулов соединений движков.
+
+    Выдачи и возвраты соединений считаются по событиям пула checkout/checkin,
+    время ожидания и таймауты - в InstrumentedPool.connect. Один объект
+    можно подключить к нескольким движкам (primary, реплики, read-only),
+    тогда метрики суммируются по всем их пулам.
+    """
+
+    _stats: PoolStats
+    _engines: list[AsyncEngine]
+
+    def __init__(self) -> None:
+        self._stats = PoolStats()
+        self._engines = []
+
+    def attach(self, engine: AsyncEngine) -> None:
+        pool = engine.sync_engine.pool
+        if isinstance(pool, InstrumentedPool):
+            pool.metrics = self
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self._on_checkout(engine)
+
+        event.listen(engine.sync_engine, "checkout", on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+        self._engines.append(engine)
+
+    def snapshot(self) -> PoolStats:
+        stats = PoolStats(**vars(self._stats))
+        for engine in self._engines:
+            pool = self._queue_pool(engine)
+            if pool is not None:
+                stats.size += pool.size()
+                stats.overflow += max(pool.overflow(), 0)
+        return stats
+
+    def record_wait(self, seconds: float) -> None:
+        self._stats.wait_total += seconds
+        self._stats.wait_max = max(self._stats.wait_max, seconds)
+
+    def record_timeout(self) -> None:
+        self._stats.timeouts += 1
+
+    def _on_checkout(self, engine: AsyncEngine) -> None:
+        self._stats.checkouts += 1
+        self._stats.checked_out += 1
+        self._stats.peak_checked_out = max(
+            self._stats.peak_checked_out, self._stats.checked_out
+        )
+
+        pool = self._queue_pool(engine)
+        if pool is not None and pool.overflow() > 0:
+            self._stats.overflow_checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self._stats.checked_out -= 1
+
+    def _queue_pool(self, engine: AsyncEngine) -> AsyncAdaptedQueuePool | None:
+        pool = engine.sync_engine.pool
+        return pool if isinstance(pool, AsyncAdaptedQueuePool) else None
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    metrics: PoolMetrics | None = None
+
+    def connect(self) -> PoolProxiedConnection:
+        if self.metrics is None:
+            return super().connect()
+
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+    def recreate(self) -> QueuePool:
+        # engine.dispose() пересоздаёт пул - метрики должны перейти в новый
+        pool = super().recreate()
+        if isinstance(pool, InstrumentedPool):
+            pool.metrics = self.metrics
+        return pool
+
+
+# Встраиваемые БД: пул выбирает диалект (StaticPool для :memory: и т.п.),
+# настройки PoolSettings к нему не применяются
+_EMBEDDED_BACKENDS = {"sqlite"}
+
+
+def make_engine(
+    url: str,
+    settings: PoolSettings,
+    metrics: PoolMetrics | None = None,
+    statement_cache: StatementCacheSettings | None = None,
+) -> AsyncEngine:
+    statement_cache = statement_cache or StatementCacheSettings()
+    parsed_url = make_url(url)
+    connect_args = {}
+    if parsed_url.get_driver_name() == "asyncpg":
+        connect_args["prepared_statement_cache_size"] = (
+            statement_cache.prepared_statement_cache_size
+        )
+
+    pool_args: dict[str, Any] = {}
+    if parsed_url.get_backend_name() not in _EMBEDDED_BACKENDS:
+        pool_args = {
+            "poolclass": InstrumentedPool,
+            "pool_size": settings.size,
+            "max_overflow": settings.max_overflow,
+            "pool_recycle": settings.recycle,
+            "pool_timeout": settings.timeout,
+        }
+
+    engine = create_async_engine(
+        url,
+        pool_pre_ping=settings.pre_ping,
+        query_cache_size=statement_cache.compiled_cache_size,
+        connect_args=connect_args,
+        **pool_args,
+    )
+    if metrics is not None:
+        metrics.attach(engine)
+    return engine
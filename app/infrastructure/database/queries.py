@@ -0,0 +1,132 @@
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Row, Select, bindparam, select
+
+from app.application.interfaces.queries import IPostQueries, PostView
+from app.infrastructure.database.repository.common import in_ids
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+from app.models import Post, PostAttachment, User
+
+_POST_VIEW = select(
+    Post.id,
+    Post.text,
+    Post.created_at,
+    Post.user_id,
+    User.name,
+    Post.attachments_count,
+).join(User, User.id == Post.user_id)
+
+_POST_VIEWS_BY_USER = (
+    _POST_VIEW.where(Post.user_id == bindparam("user_id"))
+    .order_by(Post.created_at.desc(), Post.id.desc())
+    .limit(bindparam("limit"))
+)
+
+_queries: dict[tuple[str, str], Select] = {}
+
+
+def _query(name: str, dialect_name: str) -> Select:
+    # Запросы по списку id зависят от диалекта (см. in_ids), строятся один раз
+    key = (name, dialect_name)
+    query = _queries.get(key)
+    if query is None:
+        if name == "posts":
+            query = _POST_VIEW.where(in_ids(Post.id, dialect_name))
+        else:
+            query = (
+                select(PostAttachment.post_id, PostAttachment.file_url)
+                .where(in_ids(PostAttachment.post_id, dialect_name))
+                .order_by(
+                    PostAttachment.post_id,
+                    PostAttachment.created_at,
+                    PostAttachment.id,
+                )
+            )
+        _queries[key] = query
+    return query
+
+
+@dataclass
+class PostQueries(IPostQueries):
+    """
+    Чтение постов в PostView.
+
+    Запросы выбирают только колонки и выполняются на соединении сессии
+    в обход ORM: строки не попадают в identity map, не инструментируются
+    и не истекают после commit
+    """
+
+    _tm: TransactionManager
+
+    async def get_post_view(self, post_id: uuid.UUID) -> PostView:
+        views = await self.get_post_views([post_id])
+
+        if post_id not in views:
+            raise ValueError("Post not found")
+
+        return views[post_id]
+
+    async def get_post_views(
+        self, post_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, PostView]:
+        if not post_ids:
+            return {}
+
+        async with self._tm.session() as session:
+            query = _query("posts", session.get_bind().dialect.name)
+            rows = await self._execute(
+                session, query, {"ids": list(dict.fromkeys(post_ids))}
+            )
+            views = await self._to_views(session, rows)
+
+        return {view.id: view for view in views}
+
+    async def list_post_views_by_user(
+        self, user_id: uuid.UUID, limit: int = 50
+    ) -> list[PostView]:
+        async with self._tm.session() as session:
+            rows = await self._execute(
+                session, _POST_VIEWS_BY_USER, {"user_id": user_id, "limit": limit}
+            )
+            return await self._to_views(session, rows)
+
+    async def _execute(
+        self, session: TransactionalSession, query: Select, params: dict[str, Any]
+    ) -> Sequence[Row]:
+        return (await session.execute_core(query, params)).all()
+
+    async def _to_views(
+        self, session: TransactionalSession, rows: Sequence[Row]
+    ) -> list[PostView]:
+        # Вложения читаются одним запросом и только для постов,
+        # у которых они есть по денормализованному attachments_count
+        post_ids = [row[0] for row in rows if row[5]]
+        urls: dict[uuid.UUID, list[str]] = {}
+        if post_ids:
+            query = _query("attachments", session.get_bind().dialect.name)
+            for post_id, file_url in await self._execute(
+                session, query, {"ids": post_ids}
+            ):
+                urls.setdefault(post_id, []).append(file_url)
+
+        # Распаковка строки по позиции в разы дешевле доступа к Row по имени
+        views = []
+        for post_id, text, created_at, author_id, author_name, count in rows:
+            views.append(
+                PostView(
+                    id=post_id,
+                    text=text,
+                    created_at=created_at,
+                    author_id=author_id,
+                    author_name=author_name,
+                    attachments_count=count,
+                    attachment_urls=tuple(urls.get(post_id, ())),
+                )
+            )
+        return views
@@ -0,0 +1,163 @@
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_PARAM = re.compile(r"\$\d+(?:::[\w\[\]]+)?|%\(\w+\)s|%s|\?")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_GROUP = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_GROUPS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Форма запроса без значений: параметры и литералы заменяются на ?,
+    списки IN (...) и VALUES (...), (...) сворачиваются в один (?)
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _GROUP.sub("(?)", shape)
+    shape = _GROUPS.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+@dataclass
+class QueryReport:
+    name: str | None = None
+    statements: list[str] = field(default_factory=list)
+    # Отчёт объемлющего бюджета, ему тоже достаются запросы
+    parent: "QueryReport | None" = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter[str]:
+        return Counter(statement_shape(statement) for statement in self.statements)
+
+    def repeated(self, max_repeats: int) -> dict[str, int]:
+        return {
+            shape: count
+            for shape, count in self.shapes().items()
+            if count > max_repeats
+        }
+
+    def format(
+        self, max_statements: int | None = None, max_repeats: int | None = None
+    ) -> str:
+        title = f"Query budget of {self.name}" if self.name else "Query budget"
+        limit = f" (max {max_statements})" if max_statements is not None else ""
+        lines = [f"{title}: {len(self)} statements{limit}"]
+
+        if max_repeats is not None:
+            repeated = self.repeated(max_repeats)
+            if repeated:
+                lines.append(f"Repeated statements (max {max_repeats}):")
+                lines.extend(f"  {count}x {shape}" for shape, count in repeated.items())
+
+        lines.append("Statements:")
+        lines.extend(
+            f"  {i}. {_SPACES.sub(' ', statement).strip()}"
+            for i, statement in enumerate(self.statements, 1)
+        )
+        return "\n".join(lines)
+
+
+_current_report: ContextVar[QueryReport | None] = ContextVar(
+    "current_query_report", default=None
+)
+
+
+class QueryBudget:
+    """
+    Ограничение числа запросов в единице работы.
+
+    Учитываются запросы любых движков, выполненные в текущем контексте
+    и в задачах, созданных внутри него. max_statements - предел числа
+    запросов, max_repeats - сколько раз может выполниться запрос одной
+    формы (N+1). При превышении бросается AssertionError с отчётом,
+    а с log_only=True отчёт только пишется в лог.
+
+        with QueryBudget(max_statements=5, max_repeats=1):
+            await post_service.create_post(...)
+    """
+
+    max_statements: int | None
+    max_repeats: int | None
+    log_only: bool
+    report: QueryReport
+    _token: Token[QueryReport | None] | None
+
+    def __init__(
+        self,
+        max_statements: int | None = None,
+        max_repeats: int | None = None,
+        *,
+        log_only: bool = False,
+        name: str | None = None,
+    ) -> None:
+        self.max_statements = max_statements
+        self.max_repeats = max_repeats
+        self.log_only = log_only
+        self.report = QueryReport(name)
+        self._token = None
+
+    def __enter__(self) -> QueryReport:
+        _listen_once()
+        self.report.parent = _current_report.get()
+        self._token = _current_report.set(self.report)
+        return self.report
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._token is not None:
+            _current_report.reset(self._token)
+            self._token = None
+
+        if exc_value is None:
+            self.check()
+
+    def is_exceeded(self) -> bool:
+        if self.max_statements is not None and len(self.report) > self.max_statements:
+            return True
+        return self.max_repeats is not None and bool(
+            self.report.repeated(self.max_repeats)
+        )
+
+    def check(self) -> None:
+        if not self.is_exceeded():
+            return
+
+        message = self.report.format(self.max_statements, self.max_repeats)
+        if self.log_only:
+            logger.warning(message)
+        else:
+            raise AssertionError(message)
+
+
+def _on_before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+) -> None:
+    report = _current_report.get()
+    while report is not None:
+        report.statements.append(statement)
+        report = report.parent
+
+
+_listening = False
+
+
+def _listen_once() -> None:
+    global _listening
+    if _listening:
+        return
+
+    event.listen(Engine, "before_cursor_execute", _on_before_cursor_execute)
+    _listening = True
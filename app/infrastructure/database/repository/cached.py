@@ -0,0 +1,267 @@
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Generic, Protocol, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.application.interfaces.repository import IPostRepository, IUserRepository
+from app.infrastructure.cache import CacheStats, ICacheBackend
+from app.infrastructure.database.repository.common import STREAM_PAGE_SIZE, T, to_row
+from app.infrastructure.database.repository.loader import BatchLoader
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.user import UserRepository
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+from app.models import BaseModel, Post, User
+
+T_co = TypeVar("T_co", bound=BaseModel, covariant=True)
+
+
+class EntityCache(Generic[T]):
+    """
+    Кэш закомиченных строк сущностей.
+
+    Хранятся снимки колонок, а не ORM-объекты: на каждое попадание
+    собирается новый detached экземпляр. Записи вытесняются колбэком
+    add_on_commit, поэтому откаченные изменения кэш не затрагивают,
+    а внутри единицы работы, изменившей сущность, кэш не используется.
+
+    Кэш заполняется только промахами вне единицы работы, и load должен
+    читать их в новой сессии на primary. Строка, прочитанная в сессии
+    вызывающего кода, могла устареть: реплика отстаёт, а транзакция
+    REPEATABLE READ / SERIALIZABLE видит свой снимок - такая строка
+    пережила бы инвалидацию до конца TTL.
+
+    Хранилище передаётся снаружи (ICacheBackend), размер и TTL задаются
+    при его создании.
+    """
+
+    _model: type[T]
+    _backend: ICacheBackend[uuid.UUID, dict[str, Any]]
+    _generation: int
+
+    def __init__(
+        self, model: type[T], backend: ICacheBackend[uuid.UUID, dict[str, Any]]
+    ) -> None:
+        self._model = model
+        self._backend = backend
+        self._generation = 0
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._backend.stats
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(
+        self, session: TransactionalSession | None, entity_id: uuid.UUID
+    ) -> T | None:
+        if session is not None and (
+            self._is_written(session, entity_id)
+            or session.identity_key(self._model, entity_id) in session.identity_map
+        ):
+            return None
+
+        row = self._backend.get(entity_id)
+        if row is None:
+            return None
+
+        entity = self._model(**row)
+        make_transient_to_detached(entity)
+        return entity
+
+    async def get_by_id(
+        self,
+        session: TransactionalSession | None,
+        entity_id: uuid.UUID,
+        load: Callable[[uuid.UUID], Awaitable[T]],
+    ) -> T:
+        entity = self.get(session, entity_id)
+        if entity is not None:
+            return entity
+
+        generation = self._generation
+        entity = await load(entity_id)
+        if session is None:
+            self.put(entity, generation)
+        return entity
+
+    async def get_many(
+        self,
+        session: TransactionalSession | None,
+        entity_ids: list[uuid.UUID],
+        load_many: Callable[[list[uuid.UUID]], Awaitable[dict[uuid.UUID, T]]],
+    ) -> dict[uuid.UUID, T]:
+        entities = {}
+        for entity_id in entity_ids:
+            entity = self.get(session, entity_id)
+            if entity is not None:
+                entities[entity_id] = entity
+
+        missing = [entity_id for entity_id in entity_ids if entity_id not in entities]
+        if missing:
+            generation = self._generation
+            loaded = await load_many(missing)
+            if session is None:
+                for entity in loaded.values():
+                    self.put(entity, generation)
+            entities.update(loaded)
+
+        return entities
+
+    def put(self, entity: T, generation: int) -> None:
+        # Пока читали из БД, мог закоммититься чужой UPDATE - такой снимок
+        # может быть устаревшим, поэтому его не кладём
+        if generation != self._generation or inspect(entity).modified:
+            return
+
+        self._backend.set(entity.id, to_row(entity))
+
+    def invalidate_on_commit(
+        self, session: TransactionalSession, entity_ids: Iterable[uuid.UUID]
+    ) -> None:
+        entry = session.info.get(self)
+        if entry is None:
+            written: set[uuid.UUID] = set()
+            entry = session.info[self] = (written, lambda: self._invalidate(written))
+
+        written, invalidate = entry
+        written.update(entity_ids)
+        # Колбэк мог быть отброшен откатом SAVEPOINT - регистрируем повторно,
+        # add_on_commit не добавит его дважды
+        session.add_on_commit(invalidate)
+
+    def _is_written(self, session: TransactionalSession, entity_id: uuid.UUID) -> bool:
+        entry = session.info.get(self)
+        return entry is not None and entity_id in entry[0]
+
+    def _invalidate(self, entity_ids: set[uuid.UUID]) -> None:
+        self._generation += 1
+        for entity_id in entity_ids:
+            self._backend.delete(entity_id)
+
+
+class EntityReader(Protocol[T_co]):
+    async def get_by_id(self, entity_id: uuid.UUID, /) -> T_co: ...
+
+    async def get_many(
+        self, entity_ids: list[uuid.UUID], /
+    ) -> Mapping[uuid.UUID, T_co]: ...
+
+
+@dataclass
+class CachedRepository(Generic[T]):
+    """
+    Чтение по id через EntityCache поверх обёрнутого репозитория.
+
+    Промахи вне единицы работы читаются обёрнутым репозиторием в сессии
+    на primary: get_by_id из разных задач одного тика собираются в один
+    запрос. Внутри единицы работы репозиторий читает в её сессии,
+    и прочитанное в кэш не кладётся
+    """
+
+    _tm: TransactionManager
+    _repository: EntityReader[T]
+    cache: EntityCache[T]
+
+    _not_found: ClassVar[str] = "Entity not found"
+    _loader: BatchLoader[uuid.UUID, T] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._loader = BatchLoader(self._tm, self._load_many, read_your_writes=True)
+
+    async def _load_many(
+        self, session: TransactionalSession, entity_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, T]:
+        # Сессия загрузчика привязана к его задаче, репозиторий читает в ней
+        return dict(await self._repository.get_many(entity_ids))
+
+    async def _load(self, entity_id: uuid.UUID) -> T:
+        if self._tm.current_session() is not None:
+            return await self._repository.get_by_id(entity_id)
+
+        entity = await self._loader.load(entity_id)
+
+        if entity is None:
+            raise ValueError(self._not_found)
+
+        return entity
+
+    async def _load_primary(self, entity_ids: list[uuid.UUID]) -> dict[uuid.UUID, T]:
+        async with self._tm.session(read_your_writes=True):
+            return dict(await self._repository.get_many(entity_ids))
+
+    async def get_by_id(self, entity_id: uuid.UUID) -> T:
+        return await self.cache.get_by_id(
+            self._tm.current_session(), entity_id, self._load
+        )
+
+    async def get_many(self, entity_ids: list[uuid.UUID]) -> dict[uuid.UUID, T]:
+        return await self.cache.get_many(
+            self._tm.current_session(), entity_ids, self._load_primary
+        )
+
+
+@dataclass
+class CachedUserRepository(CachedRepository[User], IUserRepository):
+    _repository: UserRepository
+    cache: EntityCache[User]
+
+    _not_found = "User not found"
+
+    async def save(self, user: User) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [user.id])
+            await self._repository.save(user)
+
+    async def insert_list(self, users: list[User]) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [user.id for user in users])
+            await self._repository.insert_list(users)
+
+    async def increment_posts_count(self, user_id: uuid.UUID, count: int = 1) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [user_id])
+            await self._repository.increment_posts_count(user_id, count)
+
+    async def increment_posts_counts(self, counts: dict[uuid.UUID, int]) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, list(counts))
+            await self._repository.increment_posts_counts(counts)
+
+
+@dataclass
+class CachedPostRepository(CachedRepository[Post], IPostRepository):
+    _repository: PostRepository
+    cache: EntityCache[Post]
+
+    _not_found = "Post not found"
+
+    def iter_posts_by_user(
+        self, user_id: uuid.UUID, page_size: int = STREAM_PAGE_SIZE
+    ) -> AsyncIterator[Post]:
+        # Потоковое чтение идёт мимо кэша, чтобы не вытеснять горячие записи
+        return self._repository.iter_posts_by_user(user_id, page_size)
+
+    async def save(self, post: Post) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [post.id])
+            await self._repository.save(post)
+
+    async def insert_list(self, posts: list[Post]) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [post.id for post in posts])
+            await self._repository.insert_list(posts)
+
+    async def increment_attachments_count(
+        self, post_id: uuid.UUID, count: int = 1
+    ) -> None:
+        async with self._tm.transaction() as tx:
+            self.cache.invalidate_on_commit(tx, [post_id])
+            await self._repository.increment_attachments_count(post_id, count)
@@ -0,0 +1,213 @@
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from datetime import datetime
+from typing import Any, TypeVar
+
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    any_,
+    bindparam,
+    insert,
+    inspect,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+from app.models import BaseModel
+
+T = TypeVar("T", bound=BaseModel)
+
+# Строк в одной странице keyset-пагинации и в одной выборке с курсора
+STREAM_PAGE_SIZE = 1000
+STREAM_YIELD_PER = 100
+
+
+_select_by_ids: dict[tuple[type[BaseModel], str], Select] = {}
+
+
+def in_ids(
+    column: InstrumentedAttribute[uuid.UUID], dialect_name: str
+) -> ColumnElement[bool]:
+    """Условие column IN (:ids) для запроса, который строится один раз"""
+    if dialect_name == "postgresql":
+        # = ANY(:ids) даёт один текст запроса при любом числе id,
+        # поэтому prepared statement asyncpg переиспользуется
+        return column == any_(bindparam("ids", type_=ARRAY(column.type)))
+    return column.in_(bindparam("ids", expanding=True))
+
+
+def select_by_ids(model: type[T], dialect_name: str) -> Select[tuple[T]]:
+    """
+    SELECT сущностей по списку id, параметр - ids.
+    Запрос строится один раз на модель и диалект
+    """
+    key = (model, dialect_name)
+    query = _select_by_ids.get(key)
+    if query is None:
+        query = _select_by_ids[key] = select(model).where(
+            in_ids(model.id, dialect_name)
+        )
+    return query
+
+
+def to_row(entity: BaseModel) -> dict[str, Any]:
+    mapper = inspect(entity).mapper
+    return {attr.key: getattr(entity, attr.key) for attr in mapper.column_attrs}
+
+
+def changed_columns(entity: BaseModel) -> dict[str, Any]:
+    state = inspect(entity)
+    changed = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.added:
+            changed[attr.key] = history.added[0]
+    return changed
+
+
+async def get_entities(
+    session: TransactionalSession, model: type[T], entity_ids: Iterable[uuid.UUID]
+) -> dict[uuid.UUID, T]:
+    # Сначала identity map сессии, затем сущности, записанные в этой
+    # единице работы, и только потом один SELECT ... WHERE id IN (...)
+    entities: dict[uuid.UUID, T] = {}
+    missing: list[uuid.UUID] = []
+
+    for entity_id in dict.fromkeys(entity_ids):
+        key = session.identity_key(model, entity_id)
+        entity = session.identity_map.get(key)
+        if entity is None:
+            entity = session.entity_cache.get(key)
+        elif inspect(entity).expired:
+            entity = None
+
+        if entity is None:
+            missing.append(entity_id)
+        else:
+            entities[entity_id] = entity
+
+    if missing:
+        query = select_by_ids(model, session.get_bind().dialect.name)
+        for entity in await session.scalars(query, {"ids": missing}):
+            entities[entity.id] = entity
+
+    return entities
+
+
+def evict_entity(
+    session: TransactionalSession, model: type[BaseModel], entity_id: uuid.UUID
+) -> None:
+    session.entity_cache.pop(session.identity_key(model, entity_id), None)
+
+
+async def flush_pending(session: TransactionalSession) -> None:
+    # Core-запрос идёт мимо unit of work: ожидающие ORM-объекты (tx.add)
+    # записываются раньше, чтобы внешние ключи ссылались на существующие строки
+    if session.new or session.deleted or session.identity_map.check_modified():
+        await session.flush()
+
+
+async def insert_entities(
+    session: TransactionalSession, model: type[T], entities: list[T]
+) -> None:
+    await flush_pending(session)
+    await session.execute(insert(model), [to_row(entity) for entity in entities])
+    for entity in entities:
+        session.mark_inserted(entity)
+
+
+async def save_entity(session: TransactionalSession, entity: BaseModel) -> None:
+    state = inspect(entity)
+    model = type(entity)
+
+    if state.transient:
+        # Новая сущность (.create()): сразу INSERT, без SELECT по первичному ключу
+        await flush_pending(session)
+        await session.execute(insert(model).values(to_row(entity)))
+        session.mark_inserted(entity)
+        return
+
+    if state.async_session is session:
+        # Сущность уже отслеживается сессией, изменения уйдут при flush
+        return
+
+    if (
+        state.detached
+        and state.key is not None
+        and session.identity_map.get(state.key) is None
+    ):
+        # Сущность из другой сессии: UPDATE только изменённых колонок
+        changed = changed_columns(entity)
+        if changed:
+            await flush_pending(session)
+            await session.execute(
+                update(model)
+                .where(model.id == entity.id)
+                .values(changed)
+                .execution_options(synchronize_session=False)
+            )
+            for key, value in changed.items():
+                set_committed_value(entity, key, value)
+
+        session.entity_cache[session.identity_key(model, entity.id)] = entity
+        return
+
+    await session.merge(entity)
+
+
+async def _as_async(items: Iterable[T]) -> AsyncIterator[T]:
+    for item in items:
+        yield item
+
+
+async def iter_keyset(
+    tm: TransactionManager,
+    model: type[T],
+    condition: ColumnElement[bool],
+    page_size: int = STREAM_PAGE_SIZE,
+) -> AsyncIterator[T]:
+    """
+    Потоково отдаёт сущности по condition в порядке (created_at, id).
+
+    Страница читается серверным курсором, следующая начинается после
+    последней отданной строки. Вне сессии каждая страница читается
+    в своей короткой сессии, которая закрывается до запроса следующей,
+    внутри tm.session() / tm.transaction() - в сессии вызывающего кода.
+    Сессию, разделённую с дочерними задачами, курсор занимать не может,
+    в ней страница читается целиком
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1")
+
+    order = (model.created_at, model.id)
+    last: tuple[datetime, uuid.UUID] | None = None
+    while True:
+        query = select(model).where(condition).order_by(*order).limit(page_size)
+        if last is not None:
+            query = query.where(tuple_(*order) > last)
+
+        count = 0
+        async with tm.session(bind=False) as session:
+            entities: AsyncIterable[T]
+            if session.is_shared:
+                entities = _as_async(await session.scalars(query))
+            else:
+                entities = await session.stream_scalars(
+                    query.execution_options(yield_per=STREAM_YIELD_PER)
+                )
+            async for entity in entities:
+                count += 1
+                last = (entity.created_at, entity.id)
+                yield entity
+
+        if count < page_size:
+            return
@@ -0,0 +1,91 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+LoadMany = Callable[[TransactionalSession, list[K]], Awaitable[dict[K, V]]]
+
+
+class BatchLoader(Generic[K, V]):
+    """
+    Собирает вызовы load(), сделанные в одном тике event loop-а,
+    и выполняет их одним запросом load_many.
+
+    Вызовы группируются по сессии, привязанной к вызывающей задаче:
+    внутри единицы работы пачка грузится в её сессии, вне её - в новой
+    сессии tm.session(), открытой задачей загрузчика. read_your_writes=True
+    открывает такую сессию на primary, а не на реплике.
+    """
+
+    _tm: TransactionManager
+    _load_many: LoadMany[K, V]
+    _batches: dict[TransactionalSession | None, dict[K, asyncio.Future[V | None]]]
+    _tasks: set[asyncio.Task]
+    _read_your_writes: bool
+
+    def __init__(
+        self,
+        tm: TransactionManager,
+        load_many: LoadMany[K, V],
+        read_your_writes: bool = False,
+    ) -> None:
+        self._tm = tm
+        self._load_many = load_many
+        self._read_your_writes = read_your_writes
+        self._batches = {}
+        self._tasks = set()
+
+    async def load(self, key: K) -> V | None:
+        loop = asyncio.get_running_loop()
+        session = self._tm.current_session()
+
+        batch = self._batches.get(session)
+        if batch is None:
+            batch = self._batches[session] = {}
+            loop.call_soon(self._dispatch, session)
+
+        future = batch.get(key)
+        if future is None:
+            future = batch[key] = loop.create_future()
+
+        return await asyncio.shield(future)
+
+    def _dispatch(self, session: TransactionalSession | None) -> None:
+        batch = self._batches.pop(session)
+        task = asyncio.get_running_loop().create_task(self._run(session, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        session: TransactionalSession | None,
+        batch: dict[K, asyncio.Future[V | None]],
+    ) -> None:
+        try:
+            if session is None:
+                async with self._tm.session(
+                    read_your_writes=self._read_your_writes
+                ) as s:
+                    result = await self._load_many(s, list(batch))
+            else:
+                result = await self._load_many(session, list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(result.get(key))
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import delete, insert, select
+
+from app.application.interfaces.repository import IOutboxRepository
+from app.infrastructure.database.repository.common import save_entity, to_row
+from app.infrastructure.database.transaction import TransactionManager
+from app.models import OutboxMessage
+
+
+@dataclass
+class OutboxRepository(IOutboxRepository):
+    _tm: TransactionManager
+
+    async def add(self, topic: str, payload: dict[str, Any]) -> None:
+        async with self._tm.transaction() as tx:
+            await save_entity(tx, OutboxMessage.create(topic=topic, payload=payload))
+
+    async def add_many(self, topic: str, payloads: list[dict[str, Any]]) -> None:
+        if not payloads:
+            return
+
+        # Сообщения не читаются в той же единице работы, поэтому
+        # в кэш сессии не попадают
+        rows = [
+            to_row(OutboxMessage.create(topic=topic, payload=payload))
+            for payload in payloads
+        ]
+        async with self._tm.transaction() as tx:
+            await tx.execute(insert(OutboxMessage), rows)
+
+    async def claim_batch(self, limit: int) -> list[OutboxMessage]:
+        # Сообщения удаляются в момент захвата: если доставка не удалась,
+        # откат транзакции вернёт их обратно. На Postgres параллельные
+        # релеи пропускают захваченные строки (FOR UPDATE SKIP LOCKED),
+        # на SQLite DELETE сам берёт блокировку записи на всю базу
+        # Пачка выбирается в CTE: подзапрос IN Postgres может выполнить
+        # повторно (nested loop), и тогда удаляется больше limit строк
+        batch = (
+            select(OutboxMessage.id)
+            .order_by(OutboxMessage.created_at, OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .cte("batch")
+        )
+        query = (
+            delete(OutboxMessage)
+            .add_cte(batch)
+            .where(OutboxMessage.id.in_(select(batch.c.id)))
+            .returning(OutboxMessage)
+            .execution_options(synchronize_session=False)
+        )
+
+        async with self._tm.transaction() as tx:
+            messages = list(await tx.scalars(query))
+            for message in messages:
+                tx.expunge(message)
+
+        messages.sort(key=lambda message: (message.created_at, message.id))
+        return messages
@@ -1,28 +1,90 @@
 import uuid
-from dataclasses import dataclass
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, update
 
 from app.application.interfaces.repository import IPostRepository
-from app.infrastructure.database.transaction import TransactionManager
+from app.infrastructure.database.repository.common import (
+    STREAM_PAGE_SIZE,
+    evict_entity,
+    get_entities,
+    insert_entities,
+    iter_keyset,
+    save_entity,
+)
+from app.infrastructure.database.repository.loader import BatchLoader
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
 from app.models import Post
 
+# Горячий запрос строится один раз, значения передаются параметрами
+_INCREMENT_ATTACHMENTS_COUNT = (
+    update(Post)
+    .where(Post.id == bindparam("entity_id"))
+    .values(
+        attachments_count=Post.attachments_count + bindparam("count"),
+        updated_at=bindparam("now"),
+    )
+    .returning(Post.id)
+)
+
 
 @dataclass
 class PostRepository(IPostRepository):
     _tm: TransactionManager
+    _loader: BatchLoader[uuid.UUID, Post] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._loader = BatchLoader(self._tm, self._load_many)
+
+    async def _load_many(
+        self, session: TransactionalSession, post_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, Post]:
+        return await get_entities(session, Post, post_ids)
 
     async def get_by_id(self, post_id: uuid.UUID) -> Post:
-        query = select(Post).where(Post.id == post_id).limit(1)
+        post = await self._loader.load(post_id)
 
-        async with self._tm.session() as session:
-            post = await session.scalar(query)
+        if post is None:
+            raise ValueError("Post not found")
 
-            if post is None:
-                raise ValueError("Post not found")
+        return post
+
+    async def get_many(self, post_ids: list[uuid.UUID]) -> dict[uuid.UUID, Post]:
+        async with self._tm.session() as session:
+            return await self._load_many(session, post_ids)
 
-            return post
+    def iter_posts_by_user(
+        self, user_id: uuid.UUID, page_size: int = STREAM_PAGE_SIZE
+    ) -> AsyncIterator[Post]:
+        return iter_keyset(self._tm, Post, Post.user_id == user_id, page_size)
 
     async def save(self, post: Post) -> None:
         async with self._tm.transaction() as tx:
-            await tx.merge(post)
+            await save_entity(tx, post)
+
+    async def insert_list(self, posts: list[Post]) -> None:
+        if not posts:
+            return
+
+        async with self._tm.transaction() as tx:
+            await insert_entities(tx, Post, posts)
+
+    async def increment_attachments_count(
+        self, post_id: uuid.UUID, count: int = 1
+    ) -> None:
+        async with self._tm.transaction() as tx:
+            evict_entity(tx, Post, post_id)
+            updated = await tx.scalar(
+                _INCREMENT_ATTACHMENTS_COUNT,
+                {
+                    "entity_id": post_id,
+                    "count": count,
+                    "now": Post.gen_native_utc_now(),
+                },
+            )
+            if updated is None:
+                raise ValueError("Post not found")
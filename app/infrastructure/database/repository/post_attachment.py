@@ -1,6 +1,14 @@
+import uuid
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 
 from app.application.interfaces.repository import IPostAttachmentRepository
+from app.infrastructure.database.repository.common import (
+    STREAM_PAGE_SIZE,
+    insert_entities,
+    iter_keyset,
+    save_entity,
+)
 from app.infrastructure.database.transaction import TransactionManager
 from app.models import PostAttachment
 
@@ -12,4 +20,18 @@ class PostAttachmentRepository(IPostAttachmentRepository):
     async def save_list(self, post_attachments: list[PostAttachment]) -> None:
         async with self._tm.transaction() as tx:
             for post_attachment in post_attachments:
-                await tx.merge(post_attachment)
+                await save_entity(tx, post_attachment)
+
+    async def insert_list(self, post_attachments: list[PostAttachment]) -> None:
+        if not post_attachments:
+            return
+
+        async with self._tm.transaction() as tx:
+            await insert_entities(tx, PostAttachment, post_attachments)
+
+    def iter_attachments_by_post(
+        self, post_id: uuid.UUID, page_size: int = STREAM_PAGE_SIZE
+    ) -> AsyncIterator[PostAttachment]:
+        return iter_keyset(
+            self._tm, PostAttachment, PostAttachment.post_id == post_id, page_size
+        )
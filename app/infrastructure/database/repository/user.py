@@ -1,28 +1,105 @@
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, update
 
 from app.application.interfaces.repository import IUserRepository
-from app.infrastructure.database.transaction import TransactionManager
+from app.infrastructure.database.repository.common import (
+    evict_entity,
+    get_entities,
+    insert_entities,
+    save_entity,
+)
+from app.infrastructure.database.repository.loader import BatchLoader
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
 from app.models import User
 
+# Горячий запрос строится один раз, значения передаются параметрами
+_INCREMENT_POSTS_COUNT = (
+    update(User)
+    .where(User.id == bindparam("entity_id"))
+    .values(
+        posts_count=User.posts_count + bindparam("count"),
+        updated_at=bindparam("now"),
+    )
+    .returning(User.id)
+)
+
 
 @dataclass
 class UserRepository(IUserRepository):
     _tm: TransactionManager
+    _loader: BatchLoader[uuid.UUID, User] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._loader = BatchLoader(self._tm, self._load_many)
+
+    async def _load_many(
+        self, session: TransactionalSession, user_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, User]:
+        return await get_entities(session, User, user_ids)
 
     async def get_by_id(self, user_id: uuid.UUID) -> User:
-        query = select(User).where(User.id == user_id).limit(1)
+        user = await self._loader.load(user_id)
+
+        if user is None:
+            raise ValueError("User not found")
 
+        return user
+
+    async def get_many(self, user_ids: list[uuid.UUID]) -> dict[uuid.UUID, User]:
         async with self._tm.session() as session:
-            user = await session.scalar(query)
+            return await self._load_many(session, user_ids)
+
+    async def save(self, user: User) -> None:
+        async with self._tm.transaction() as tx:
+            await save_entity(tx, user)
+
+    async def insert_list(self, users: list[User]) -> None:
+        if not users:
+            return
+
+        async with self._tm.transaction() as tx:
+            await insert_entities(tx, User, users)
 
-            if user is None:
+    async def increment_posts_count(self, user_id: uuid.UUID, count: int = 1) -> None:
+        async with self._tm.transaction() as tx:
+            evict_entity(tx, User, user_id)
+            updated = await tx.scalar(
+                _INCREMENT_POSTS_COUNT,
+                {
+                    "entity_id": user_id,
+                    "count": count,
+                    "now": User.gen_native_utc_now(),
+                },
+            )
+            if updated is None:
                 raise ValueError("User not found")
 
-            return user
+    async def increment_posts_counts(self, counts: dict[uuid.UUID, int]) -> None:
+        # Один UPDATE на каждое значение инкремента, каждая строка
+        # обновляется один раз
+        user_ids_by_count: dict[int, list[uuid.UUID]] = {}
+        for user_id, count in counts.items():
+            user_ids_by_count.setdefault(count, []).append(user_id)
 
-    async def save(self, user: User) -> None:
         async with self._tm.transaction() as tx:
-            await tx.merge(user)
+            for count, user_ids in user_ids_by_count.items():
+                for user_id in user_ids:
+                    evict_entity(tx, User, user_id)
+
+                query = (
+                    update(User)
+                    .where(User.id.in_(user_ids))
+                    .values(
+                        posts_count=User.posts_count + count,
+                        updated_at=User.gen_native_utc_now(),
+                    )
+                    .returning(User.id)
+                )
+                updated = set(await tx.scalars(query))
+                if len(updated) != len(user_ids):
+                    raise ValueError("User not found")
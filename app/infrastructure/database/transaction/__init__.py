@@ -1,4 +1,11 @@
 from .manager import TransactionManager
+from .replicas import ReplicaRouter, ReplicaSelection
 from .session import TransactionalSession, TransactionalSessionFactory
 
-__all__ = ("TransactionManager", "TransactionalSession", "TransactionalSessionFactory")
+__all__ = (
+    "ReplicaRouter",
+    "ReplicaSelection",
+    "TransactionManager",
+    "TransactionalSession",
+    "TransactionalSessionFactory",
+)
@@ -0,0 +1,58 @@
+import inspect
+import logging
+import time
+
+from app.application.interfaces.common import IBackgroundExecutor, OverflowPolicy
+from app.application.interfaces.transaction import OnCommitCallback
+
+logger = logging.getLogger(__name__)
+
+
+async def dispatch_on_commit(
+    callbacks: list[OnCommitCallback],
+    background_executor: IBackgroundExecutor,
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP,
+) -> None:
+    # Синхронные колбэки выполняются сразу, асинхронные уходят в фон.
+    # Ошибка одного колбэка не мешает выполнению остальных. По умолчанию
+    # при переполненном executor-е колбэк отбрасывается, а не ждёт места:
+    # иначе закоммиченный запрос ждал бы чужую фоновую работу
+    for cb in callbacks:
+        started = time.perf_counter()
+        try:
+            result = cb()
+        except Exception:
+            logger.exception("On-commit callback %r failed", cb)
+            continue
+
+        if inspect.isawaitable(result):
+            try:
+                accepted = await background_executor.submit(
+                    _await_callback(cb, result), overflow_policy
+                )
+            except Exception:
+                logger.exception("On-commit callback %r was not scheduled", cb)
+                accepted = False
+
+            if not accepted:
+                logger.warning("On-commit callback %r was dropped", cb)
+                if inspect.iscoroutine(result):
+                    result.close()
+        else:
+            _log_duration(cb, started)
+
+
+async def _await_callback(cb: OnCommitCallback, awaitable) -> None:
+    started = time.perf_counter()
+    try:
+        await awaitable
+    except Exception:
+        logger.exception("On-commit callback %r failed", cb)
+    else:
+        _log_duration(cb, started)
+
+
+def _log_duration(cb: OnCommitCallback, started: float) -> None:
+    logger.debug(
+        "On-commit callback %r took %.3f ms", cb, (time.perf_counter() - started) * 1000
+    )
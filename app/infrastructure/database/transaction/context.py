@@ -1,101 +1,435 @@
 import asyncio
-from weakref import WeakKeyDictionary
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any
 
+from sqlalchemy.ext.asyncio import AsyncSessionTransaction
+
+from app.application.interfaces.common import IBackgroundExecutor, OverflowPolicy
+from app.application.interfaces.transaction import ChildTasks, IsolationLevel
+from app.infrastructure.database.query_budget import QueryBudget
+from app.infrastructure.database.transaction.callbacks import dispatch_on_commit
+from app.infrastructure.database.transaction.instrumentation import (
+    TransactionInstrumentation,
+    TransactionOutcome,
+    caller_name,
+)
+from app.infrastructure.database.transaction.replicas import (
+    REPLICA_SESSION_KEY,
+    Replica,
+    ReplicaRouter,
+    is_replica_session,
+)
 from app.infrastructure.database.transaction.session import (
     TransactionalSession,
     TransactionalSessionFactory,
 )
 
-_task_sessions: WeakKeyDictionary[asyncio.Task, TransactionalSession] = (
-    WeakKeyDictionary()
+
+TRANSACTION_OPTIONS_KEY = "transaction_options"
+
+_ISOLATION_STRENGTH = {level: i for i, level in enumerate(IsolationLevel)}
+
+
+@dataclass(frozen=True)
+class TransactionOptions:
+    """
+    Параметры корневой транзакции. isolation_level=None - уровень
+    по умолчанию движка. deferrable имеет смысл только для
+    SERIALIZABLE READ ONLY: такая транзакция ждёт безопасный снимок
+    и не может получить serialization failure.
+    """
+
+    isolation_level: IsolationLevel | None = None
+    read_only: bool = False
+    deferrable: bool = False
+
+    def __post_init__(self) -> None:
+        if self.deferrable and not (
+            self.read_only and self.isolation_level == IsolationLevel.SERIALIZABLE
+        ):
+            raise ValueError(
+                "deferrable requires read_only=True and SERIALIZABLE isolation level"
+            )
+
+    def execution_options(self) -> dict[str, Any]:
+        # Опции соединения, SQLAlchemy сбрасывает их при возврате в пул
+        options: dict[str, Any] = {}
+        if self.isolation_level is not None:
+            options["isolation_level"] = str(self.isolation_level)
+        if self.read_only:
+            options["postgresql_readonly"] = True
+        if self.deferrable:
+            options["postgresql_deferrable"] = True
+        return options
+
+
+class _SessionBinding:
+    """
+    Сессия, привязанная к контексту задачи-владельца.
+
+    Дочерние задачи получают копию контекста вместе с привязкой,
+    но используют сессию родителя только при ChildTasks.INHERIT_READ_ONLY
+    и пока корневой контекст родителя не закрыт.
+    """
+
+    __slots__ = ("session", "owner", "child_tasks", "active")
+
+    def __init__(
+        self,
+        session: TransactionalSession,
+        owner: asyncio.Task | None,
+        child_tasks: ChildTasks,
+    ) -> None:
+        self.session = session
+        self.owner = owner
+        self.child_tasks = child_tasks
+        self.active = True
+
+    def resolve(self, task: asyncio.Task | None) -> TransactionalSession | None:
+        if not self.active:
+            return None
+        if task is self.owner or self.child_tasks == ChildTasks.INHERIT_READ_ONLY:
+            return self.session
+        return None
+
+    def is_inherited(self, task: asyncio.Task | None) -> bool:
+        return task is not self.owner
+
+
+_current_binding: ContextVar[_SessionBinding | None] = ContextVar(
+    "current_session_binding", default=None
 )
 
 
-def _get_task() -> asyncio.Task:
-    task = asyncio.current_task()
-    if task is None:
-        raise RuntimeError("No current asyncio task; cannot bind session")
-    return task
+def _resolve_binding() -> _SessionBinding | None:
+    binding = _current_binding.get()
+    if binding is None or binding.resolve(asyncio.current_task()) is None:
+        return None
+    return binding
 
 
-def _on_task_done(task: asyncio.Task) -> None:
-    try:
-        _task_sessions.pop(task)
-    except RuntimeError:
-        pass
+def get_current_session() -> TransactionalSession | None:
+    binding = _resolve_binding()
+    return binding.session if binding is not None else None
 
 
 class _BaseSessionContext:
     _session_factory: TransactionalSessionFactory
+    _child_tasks: ChildTasks | None
     _session: TransactionalSession | None
+    _binding: _SessionBinding | None
+    _token: Token[_SessionBinding | None] | None
+    _bind_context: bool
 
-    def __init__(self, session_factory: TransactionalSessionFactory) -> None:
+    def __init__(
+        self,
+        session_factory: TransactionalSessionFactory,
+        child_tasks: ChildTasks | None = None,
+    ) -> None:
         self._session_factory = session_factory
+        self._child_tasks = child_tasks
+        self._bind_context = True
         self._session = None
+        self._binding = None
+        self._token = None
 
     @property
     def _is_root(self) -> bool:
         return self._session is not None
 
     async def _get_or_create_session(self) -> TransactionalSession:
-        task = _get_task()
+        task = asyncio.current_task()
 
-        existing = _task_sessions.get(task)
+        existing = _resolve_binding()
         if existing is not None:
-            return existing
+            if self._child_tasks is not None and not existing.is_inherited(task):
+                # Вложенный контекст меняет политику только на время своей работы
+                self._bind(existing.session, task, self._child_tasks)
+            return existing.session
 
-        self._session = self._session_factory()
-        _task_sessions[task] = self._session
-        task.add_done_callback(_on_task_done)
+        self._session = self._create_session()
+        if self._bind_context:
+            self._bind(self._session, task, self._child_tasks or ChildTasks.OWN_SESSION)
 
         return self._session
 
+    def _create_session(self) -> TransactionalSession:
+        return self._session_factory()
+
+    def _bind(
+        self,
+        session: TransactionalSession,
+        task: asyncio.Task | None,
+        child_tasks: ChildTasks,
+    ) -> None:
+        self._binding = _SessionBinding(session, task, child_tasks)
+        self._token = _current_binding.set(self._binding)
+        if child_tasks == ChildTasks.INHERIT_READ_ONLY:
+            session.share()
+
+    def _unbind(self) -> None:
+        if self._binding is not None:
+            self._binding.active = False
+            if self._binding.child_tasks == ChildTasks.INHERIT_READ_ONLY:
+                self._binding.session.unshare()
+            self._binding = None
+        if self._token is not None:
+            _current_binding.reset(self._token)
+            self._token = None
+
     async def _flush_if_not_root(self) -> None:
         if self._is_root:
             return
-        task = _get_task()
-        session = _task_sessions.get(task)
+        session = get_current_session()
         if session is not None:
             await session.flush()
 
     async def _close_session_if_root(self) -> None:
         if not self._is_root:
+            self._unbind()
             return
 
-        task = _get_task()
-
         try:
             if self._session:
                 await self._session.close()
         finally:
-            _task_sessions.pop(task, None)
+            self._unbind()
 
 
 class TransactionContext(_BaseSessionContext):
+    _background_executor: IBackgroundExecutor
+    _instrumentation: TransactionInstrumentation
+    _query_budget: tuple[int | None, int | None] | None
+    _name: str | None
+    _budget: QueryBudget | None
+    _use_savepoint: bool
+    _savepoint: tuple[TransactionalSession, AsyncSessionTransaction] | None
+    _savepoint_callbacks: int
+    _savepoint_inserted: int
+    _attempt: int
+    _options: TransactionOptions
+    _on_commit_overflow: OverflowPolicy
+
+    def __init__(
+        self,
+        session_factory: TransactionalSessionFactory,
+        background_executor: IBackgroundExecutor,
+        instrumentation: TransactionInstrumentation,
+        query_budget: tuple[int | None, int | None] | None = None,
+        child_tasks: ChildTasks | None = None,
+        name: str | None = None,
+        savepoint: bool = False,
+        attempt: int = 1,
+        options: TransactionOptions | None = None,
+        on_commit_overflow: OverflowPolicy = OverflowPolicy.DROP,
+    ) -> None:
+        super().__init__(session_factory, child_tasks)
+        self._background_executor = background_executor
+        self._instrumentation = instrumentation
+        self._query_budget = query_budget
+        self._name = name
+        self._budget = None
+        self._use_savepoint = savepoint
+        self._savepoint = None
+        self._savepoint_callbacks = 0
+        self._savepoint_inserted = 0
+        self._attempt = attempt
+        self._options = options or TransactionOptions()
+        self._on_commit_overflow = on_commit_overflow
+
     async def __aenter__(self) -> TransactionalSession:
+        existing = _resolve_binding()
+        if existing is not None and existing.is_inherited(asyncio.current_task()):
+            raise RuntimeError(
+                "Session inherited from parent task is read-only; "
+                "cannot open transaction"
+            )
+        if existing is not None and is_replica_session(existing.session):
+            raise RuntimeError(
+                "Cannot open transaction inside replica session; "
+                "use tm.session(read_your_writes=True)"
+            )
+
         session = await self._get_or_create_session()
         if self._is_root:
+            if self._instrumentation.enabled or self._query_budget is not None:
+                self._start_instrumentation(session, self._name or caller_name())
             await session.begin()
+            session.info[TRANSACTION_OPTIONS_KEY] = self._options
+            execution_options = self._options.execution_options()
+            if execution_options:
+                # Опции применяются только к соединению, взятому первым,
+                # поэтому оно берётся сразу
+                try:
+                    await session.connection(execution_options=execution_options)
+                except BaseException as e:
+                    await self.__aexit__(type(e), e, e.__traceback__)
+                    raise
+            return session
+
+        try:
+            await self._check_nested(session)
+        except BaseException:
+            self._unbind()
+            raise
+        if self._use_savepoint:
+            self._savepoint_callbacks = len(session.callbacks_on_commit)
+            self._savepoint_inserted = len(session.inserted_entities)
+            async with session.io_lock:
+                self._savepoint = (session, await session.begin_nested())
         return session
 
+    async def _check_nested(self, session: TransactionalSession) -> None:
+        # Вложенный контекст не может ослабить гарантии, которых ждёт
+        # его код: запись в read-only транзакции или более слабая изоляция
+        root = session.info.get(TRANSACTION_OPTIONS_KEY, TransactionOptions())
+        options = self._options
+
+        if root.read_only and not options.read_only:
+            raise RuntimeError(
+                "Cannot open writable transaction inside read-only transaction"
+            )
+        if options.deferrable and not root.deferrable:
+            raise RuntimeError(
+                "Cannot open deferrable transaction inside non-deferrable transaction"
+            )
+        if options.isolation_level is None:
+            return
+
+        root_level = root.isolation_level
+        if root_level is None:
+            connection = await session.connection()
+            root_level = IsolationLevel(await connection.get_isolation_level())
+        if (
+            _ISOLATION_STRENGTH[root_level]
+            < _ISOLATION_STRENGTH[options.isolation_level]
+        ):
+            raise RuntimeError(
+                f"Nested transaction requires {options.isolation_level} isolation, "
+                f"but root transaction runs at {root_level}"
+            )
+
+    def _start_instrumentation(self, session: TransactionalSession, name: str) -> None:
+        if self._instrumentation.enabled:
+            self._instrumentation.begin(session, name, self._attempt)
+        if self._query_budget is not None:
+            max_statements, max_repeats = self._query_budget
+            self._budget = QueryBudget(
+                max_statements, max_repeats, log_only=True, name=name
+            )
+            self._budget.__enter__()
+
     async def __aexit__(self, exc_type, exc_value, traceback) -> None:
         if self._session is None:
-            if exc_value is None:
-                await self._flush_if_not_root()
+            try:
+                if self._savepoint is not None:
+                    await self._exit_savepoint(exc_value)
+                elif exc_value is None:
+                    await self._flush_if_not_root()
+            finally:
+                self._unbind()
             return
 
+        outcome = TransactionOutcome.ROLLBACK
         try:
             if exc_value is not None:
                 await self._session.rollback()
-            else:
-                await self._session.commit()
+                return
+
+            await self._session.commit()
+            outcome = TransactionOutcome.COMMIT
+            callbacks = self._session.pop_callbacks_on_commit()
         finally:
-            await self._close_session_if_root()
+            try:
+                self._instrumentation.end(self._session, outcome)
+                if self._budget is not None:
+                    self._budget.__exit__(exc_type, exc_value, traceback)
+            finally:
+                await self._close_session_if_root()
+
+        await dispatch_on_commit(
+            callbacks, self._background_executor, self._on_commit_overflow
+        )
+
+    async def _exit_savepoint(self, exc_value: BaseException | None) -> None:
+        # Вложенный контекст с savepoint=True при ошибке откатывает только
+        # свою работу, внешняя транзакция может продолжаться
+        if self._savepoint is None:
+            return
+        (session, savepoint), self._savepoint = self._savepoint, None
+
+        if exc_value is None:
+            try:
+                async with session.io_lock:
+                    await savepoint.commit()
+                return
+            except BaseException:
+                async with session.io_lock:
+                    await savepoint.rollback()
+                session.discard_savepoint_state(
+                    self._savepoint_callbacks, self._savepoint_inserted
+                )
+                raise
+
+        async with session.io_lock:
+            await savepoint.rollback()
+        session.discard_savepoint_state(
+            self._savepoint_callbacks, self._savepoint_inserted
+        )
 
 
 class SessionContext(_BaseSessionContext):
+    """
+    Корневой контекст читает с реплики, если они настроены.
+    Вложенный контекст использует уже открытую сессию, поэтому чтения
+    внутри транзакции остаются на primary. read_your_writes=True
+    принудительно открывает сессию на primary.
+
+    bind=False не привязывает новую сессию к контексту задачи: так
+    async-генератор, отдающий управление вызывающему коду, не подменяет
+    ему сессию. Уже открытая сессия используется как обычно.
+    """
+
+    _replicas: ReplicaRouter | None
+    _read_your_writes: bool
+    _replica: Replica | None
+
+    def __init__(
+        self,
+        session_factory: TransactionalSessionFactory,
+        child_tasks: ChildTasks | None = None,
+        replicas: ReplicaRouter | None = None,
+        read_your_writes: bool = False,
+        bind: bool = True,
+    ) -> None:
+        super().__init__(session_factory, child_tasks)
+        self._replicas = replicas
+        self._read_your_writes = read_your_writes
+        self._replica = None
+        self._bind_context = bind
+
     async def __aenter__(self) -> TransactionalSession:
         return await self._get_or_create_session()
 
     async def __aexit__(self, exc_type, exc_value, traceback) -> None:
-        await self._close_session_if_root()
+        try:
+            await self._close_session_if_root()
+        finally:
+            if self._replica is not None:
+                self._replica.in_use -= 1
+                self._replica = None
+
+    def _create_session(self) -> TransactionalSession:
+        if self._replicas is None or self._read_your_writes:
+            return super()._create_session()
+
+        replica = self._replicas.choose()
+        if replica is None:
+            return super()._create_session()
+
+        session = replica.session_factory()
+        session.info[REPLICA_SESSION_KEY] = True
+        replica.in_use += 1
+        self._replica = replica
+        return session
@@ -0,0 +1,173 @@
+import logging
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import StrEnum
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.infrastructure.database.transaction.session import TransactionalSession
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "transaction_stats"
+
+
+class TransactionOutcome(StrEnum):
+    COMMIT = "commit"
+    ROLLBACK = "rollback"
+
+
+@dataclass(frozen=True)
+class TransactionReport:
+    name: str
+    outcome: TransactionOutcome
+    # Секунды от входа в корневой контекст до завершения commit/rollback
+    wall_time: float
+    # Секунды от начала транзакции на соединении до её завершения
+    connection_time: float
+    statements: int
+    flushes: int
+    rows: int
+    # Номер попытки tm.run(); повторы после конфликта начинаются со второй
+    attempt: int = 1
+
+
+TransactionHook = Callable[[TransactionReport], None]
+
+
+@dataclass
+class _TransactionStats:
+    name: str
+    started_at: float
+    attempt: int = 1
+    connection_acquired_at: float | None = None
+    statements: int = 0
+    flushes: int = 0
+    rows: int = 0
+    finished: bool = False
+
+
+class TransactionInstrumentation:
+    """
+    Собирает TransactionReport по каждой корневой транзакции и передаёт его хукам.
+
+    Пока хуков нет, транзакции не инструментируются.
+    Статистика транзакции кладётся в info сессии, а при начале транзакции
+    на соединении (after_begin) - и в info соединения, где её находят
+    события Engine, считающие запросы и строки.
+    """
+
+    _hooks: list[TransactionHook]
+
+    def __init__(self) -> None:
+        self._hooks = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._hooks)
+
+    def add_hook(self, hook: TransactionHook) -> None:
+        _listen_once()
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: TransactionHook) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def begin(self, session: TransactionalSession, name: str, attempt: int = 1) -> None:
+        session.info[STATS_KEY] = _TransactionStats(
+            name=name, started_at=time.perf_counter(), attempt=attempt
+        )
+
+    def end(self, session: TransactionalSession, outcome: TransactionOutcome) -> None:
+        stats: _TransactionStats | None = session.info.pop(STATS_KEY, None)
+        if stats is None:
+            return
+
+        stats.finished = True
+        finished_at = time.perf_counter()
+        report = TransactionReport(
+            name=stats.name,
+            outcome=outcome,
+            wall_time=finished_at - stats.started_at,
+            connection_time=(
+                finished_at - stats.connection_acquired_at
+                if stats.connection_acquired_at is not None
+                else 0.0
+            ),
+            statements=stats.statements,
+            flushes=stats.flushes,
+            rows=stats.rows,
+            attempt=stats.attempt,
+        )
+
+        for hook in self._hooks:
+            try:
+                hook(report)
+            except Exception:
+                logger.exception("Transaction hook %r failed", hook)
+
+
+def caller_name() -> str:
+    # Первый кадр вне пакета transaction - метод, открывший транзакцию
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith(
+        __package__ or ""
+    ):
+        frame = frame.f_back  # type: ignore[assignment]
+    return frame.f_code.co_qualname if frame is not None else "unknown"
+
+
+def _on_after_begin(session, transaction, connection) -> None:
+    stats = session.info.get(STATS_KEY)
+    if stats is None:
+        return
+
+    if stats.connection_acquired_at is None:
+        stats.connection_acquired_at = time.perf_counter()
+    connection.info[STATS_KEY] = stats
+
+
+def _on_after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+) -> None:
+    # info соединения живёт между выдачами из пула, поэтому статистика
+    # завершённой транзакции остаётся там до следующего after_begin
+    stats = conn.info.get(STATS_KEY)
+    if stats is None or stats.finished:
+        return
+
+    stats.statements += 1
+    if context is not None and (
+        context.isinsert or context.isupdate or context.isdelete
+    ):
+        rowcount = cursor.rowcount
+        # asyncpg не сообщает rowcount для executemany
+        if rowcount < 0 and executemany:
+            rowcount = len(parameters)
+        stats.rows += max(rowcount, 0)
+
+
+def _on_after_flush(session, flush_context) -> None:
+    stats = session.info.get(STATS_KEY)
+    if stats is not None:
+        stats.flushes += 1
+
+
+_listening = False
+
+
+def _listen_once() -> None:
+    global _listening
+    if _listening:
+        return
+
+    event.listen(Session, "after_begin", _on_after_begin)
+    event.listen(Session, "after_flush", _on_after_flush)
+    event.listen(Engine, "after_cursor_execute", _on_after_cursor_execute)
+    _listening = True
@@ -1,17 +1,191 @@
-from app.application.interfaces.transaction import ITransactionManager
-from app.infrastructure.database.transaction.session import TransactionalSessionFactory
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
 
-from .context import SessionContext, TransactionContext
+from app.application.interfaces.common import IBackgroundExecutor, OverflowPolicy
+from app.application.interfaces.transaction import (
+    ChildTasks,
+    IsolationLevel,
+    ITransactionManager,
+)
+from app.infrastructure.database.transaction.session import (
+    TransactionalSession,
+    TransactionalSessionFactory,
+)
+
+from .context import (
+    SessionContext,
+    TransactionContext,
+    TransactionOptions,
+    get_current_session,
+)
+from .instrumentation import TransactionHook, TransactionInstrumentation
+from .replicas import ReplicaRouter
+from .retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 class TransactionManager(ITransactionManager):
     _session_factory: TransactionalSessionFactory
+    _background_executor: IBackgroundExecutor
+    _replicas: ReplicaRouter | None
+    _instrumentation: TransactionInstrumentation
+    _query_budget: tuple[int | None, int | None] | None
+    _retry_policy: RetryPolicy | None
+    _read_only_session_factory: TransactionalSessionFactory | None
+    _on_commit_overflow: OverflowPolicy
 
-    def __init__(self, session_factory: TransactionalSessionFactory) -> None:
+    def __init__(
+        self,
+        session_factory: TransactionalSessionFactory,
+        background_executor: IBackgroundExecutor,
+        replicas: ReplicaRouter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        read_only_session_factory: TransactionalSessionFactory | None = None,
+        on_commit_overflow: OverflowPolicy = OverflowPolicy.DROP,
+    ) -> None:
+        """
+        read_only_session_factory - отдельный пул для корневых
+        tm.transaction(read_only=True), чтобы длинные отчётные чтения
+        не занимали соединения пишущих транзакций.
+
+        on_commit_overflow - что делать с асинхронным колбэком on_commit,
+        если BackgroundExecutor переполнен. DROP (по умолчанию) не держит
+        закоммиченный запрос, BLOCK ждёт места в очереди
+        """
         self._session_factory = session_factory
+        self._background_executor = background_executor
+        self._replicas = replicas
+        self._retry_policy = retry_policy
+        self._read_only_session_factory = read_only_session_factory
+        self._on_commit_overflow = on_commit_overflow
+        self._instrumentation = TransactionInstrumentation()
+        self._query_budget = None
+
+    def transaction(
+        self,
+        *,
+        child_tasks: ChildTasks | None = None,
+        name: str | None = None,
+        savepoint: bool = False,
+        isolation_level: IsolationLevel | None = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+    ) -> TransactionContext:
+        return self._transaction_context(
+            child_tasks,
+            name,
+            savepoint,
+            TransactionOptions(isolation_level, read_only, deferrable),
+        )
+
+    async def run(
+        self,
+        unit: Callable[[], Awaitable[T]],
+        *,
+        child_tasks: ChildTasks | None = None,
+        name: str | None = None,
+        isolation_level: IsolationLevel | None = None,
+        read_only: bool = False,
+        deferrable: bool = False,
+    ) -> T:
+        """
+        Выполняет unit в транзакции. Корневая транзакция при ошибке,
+        которую RetryPolicy считает конфликтом (deadlock, serialization
+        failure, SQLite busy), повторяется целиком в новой сессии:
+        колбэки on_commit неудачных попыток отбрасываются вместе с ней.
+        Внутри уже открытой транзакции unit выполняется один раз
+        """
+        options = TransactionOptions(isolation_level, read_only, deferrable)
+        policy = self._retry_policy
+        if policy is None or get_current_session() is not None:
+            async with self._transaction_context(child_tasks, name, False, options):
+                return await unit()
+
+        attempt = 1
+        while True:
+            try:
+                async with self._transaction_context(
+                    child_tasks, name, False, options, attempt
+                ):
+                    return await unit()
+            except Exception as e:
+                if attempt >= policy.max_attempts or not policy.is_retryable(e):
+                    raise
+                delay = policy.backoff(attempt)
+                logger.warning(
+                    "Retrying transaction after %s (attempt %d of %d, in %.3fs)",
+                    type(e).__name__,
+                    attempt + 1,
+                    policy.max_attempts,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _transaction_context(
+        self,
+        child_tasks: ChildTasks | None,
+        name: str | None,
+        savepoint: bool,
+        options: TransactionOptions,
+        attempt: int = 1,
+    ) -> TransactionContext:
+        # Фабрика нужна только корневому контексту, вложенный берёт открытую сессию
+        session_factory = self._session_factory
+        if options.read_only and self._read_only_session_factory is not None:
+            session_factory = self._read_only_session_factory
+
+        return TransactionContext(
+            session_factory,
+            self._background_executor,
+            self._instrumentation,
+            self._query_budget,
+            child_tasks,
+            name,
+            savepoint,
+            attempt,
+            options,
+            self._on_commit_overflow,
+        )
+
+    def session(
+        self,
+        *,
+        child_tasks: ChildTasks | None = None,
+        read_your_writes: bool = False,
+        bind: bool = True,
+    ) -> SessionContext:
+        return SessionContext(
+            self._session_factory, child_tasks, self._replicas, read_your_writes, bind
+        )
+
+    def current_session(self) -> TransactionalSession | None:
+        return get_current_session()
+
+    def add_hook(self, hook: TransactionHook) -> None:
+        """
+        Хук получает TransactionReport после каждой корневой транзакции.
+        Если name в tm.transaction() не передан, отчёт помечается
+        именем метода, открывшего транзакцию
+        """
+        self._instrumentation.add_hook(hook)
 
-    def transaction(self) -> TransactionContext:
-        return TransactionContext(self._session_factory)
+    def remove_hook(self, hook: TransactionHook) -> None:
+        self._instrumentation.remove_hook(hook)
 
-    def session(self) -> SessionContext:
-        return SessionContext(self._session_factory)
+    def set_query_budget(
+        self, max_statements: int | None = None, max_repeats: int | None = None
+    ) -> None:
+        """
+        Детектор для staging: корневые транзакции, превысившие бюджет
+        запросов (см. QueryBudget), пишутся в лог с отчётом
+        """
+        if max_statements is None and max_repeats is None:
+            self._query_budget = None
+        else:
+            self._query_budget = (max_statements, max_repeats)
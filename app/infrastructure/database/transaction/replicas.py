@@ -0,0 +1,63 @@
+import itertools
+from enum import StrEnum
+
+from app.infrastructure.database.transaction.session import (
+    TransactionalSession,
+    TransactionalSessionFactory,
+)
+
+REPLICA_SESSION_KEY = "replica"
+
+
+class ReplicaSelection(StrEnum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_BUSY = "least_busy"
+
+
+class Replica:
+    session_factory: TransactionalSessionFactory
+    in_use: int
+
+    def __init__(self, session_factory: TransactionalSessionFactory) -> None:
+        self.session_factory = session_factory
+        self.in_use = 0
+
+
+class ReplicaRouter:
+    """
+    Выбирает реплику для корневых tm.session().
+
+    LEAST_BUSY выбирает реплику с наименьшим числом открытых на ней сессий,
+    при равенстве - по кругу.
+    """
+
+    _replicas: list[Replica]
+    _selection: ReplicaSelection
+    _counter: itertools.count
+
+    def __init__(
+        self,
+        session_factories: list[TransactionalSessionFactory],
+        selection: ReplicaSelection = ReplicaSelection.ROUND_ROBIN,
+    ) -> None:
+        self._replicas = [Replica(factory) for factory in session_factories]
+        self._selection = selection
+        self._counter = itertools.count()
+
+    @property
+    def replicas(self) -> list[Replica]:
+        return self._replicas
+
+    def choose(self) -> Replica | None:
+        if not self._replicas:
+            return None
+
+        start = next(self._counter) % len(self._replicas)
+        ordered = self._replicas[start:] + self._replicas[:start]
+        if self._selection == ReplicaSelection.LEAST_BUSY:
+            return min(ordered, key=lambda replica: replica.in_use)
+        return ordered[0]
+
+
+def is_replica_session(session: TransactionalSession) -> bool:
+    return session.info.get(REPLICA_SESSION_KEY, False)
@@ -0,0 +1,86 @@
+import random
+import sqlite3
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+Classifier = Callable[[BaseException], bool]
+
+# SQLSTATE PostgreSQL
+SERIALIZATION_FAILURE = "40001"
+DEADLOCK_DETECTED = "40P01"
+
+
+def _error_chain(exc: BaseException) -> Iterator[BaseException]:
+    # Ошибка SQLAlchemy хранит ошибку драйвера в orig, адаптер asyncpg -
+    # исходное исключение asyncpg в __cause__
+    seen: set[int] = set()
+    current: BaseException | None = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        yield current
+        orig = getattr(current, "orig", None)
+        current = orig if isinstance(orig, BaseException) else current.__cause__
+
+
+def _has_sqlstate(exc: BaseException, sqlstate: str) -> bool:
+    return any(
+        getattr(error, "sqlstate", None) == sqlstate
+        or getattr(error, "pgcode", None) == sqlstate
+        for error in _error_chain(exc)
+    )
+
+
+def is_serialization_failure(exc: BaseException) -> bool:
+    return _has_sqlstate(exc, SERIALIZATION_FAILURE)
+
+
+def is_deadlock(exc: BaseException) -> bool:
+    return _has_sqlstate(exc, DEADLOCK_DETECTED)
+
+
+def is_sqlite_busy(exc: BaseException) -> bool:
+    for error in _error_chain(exc):
+        if not isinstance(error, sqlite3.OperationalError):
+            continue
+        if getattr(error, "sqlite_errorname", None) in ("SQLITE_BUSY", "SQLITE_LOCKED"):
+            return True
+        if "database is locked" in str(error):
+            return True
+    return False
+
+
+DEFAULT_CLASSIFIERS: tuple[Classifier, ...] = (
+    is_serialization_failure,
+    is_deadlock,
+    is_sqlite_busy,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Повтор корневой единицы работы (tm.run) при конфликтах транзакций.
+
+    max_attempts - число попыток вместе с первой. Пауза перед повтором
+    случайна в [0, min(max_delay, base_delay * 2 ** (attempt - 1))] секунд,
+    чтобы конкурирующие транзакции не столкнулись снова.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.01
+    max_delay: float = 0.5
+    classifiers: tuple[Classifier, ...] = DEFAULT_CLASSIFIERS
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError("Retry delays must not be negative")
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        return any(classifier(exc) for classifier in self.classifiers)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
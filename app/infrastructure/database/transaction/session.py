@@ -1,32 +1,182 @@
-from typing import Callable
+import asyncio
+import weakref
+from collections.abc import Iterable
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import Executable, Result, inspect
+from sqlalchemy.orm import make_transient, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
 
-from app.application.interfaces.transaction import ITransactionalSession
+from app.application.interfaces.transaction import (
+    ITransactionalSession,
+    OnCommitCallback,
+)
+
+EntityKey = tuple[type, tuple[Any, ...], Any]
 
 
 class TransactionalSession(AsyncSession, ITransactionalSession):
-    set_callbacks_on_commit: set[Callable[[], None]]
-    callbacks_on_commit: list[Callable[[], None]]
+    set_callbacks_on_commit: set[OnCommitCallback]
+    callbacks_on_commit: list[OnCommitCallback]
+    entity_cache: dict[EntityKey, Any]
+    # Сущности, записанные Core INSERT в текущей транзакции: при откате
+    # они снова становятся новыми, иначе повторный save() ничего не запишет.
+    # Слабые ссылки - пакетная запись не держит уже отпущенные сущности
+    inserted_entities: list[weakref.ref]
+    # Сессию могут читать дочерние задачи (ChildTasks.INHERIT_READ_ONLY),
+    # а соединение одно - все обращения к нему выполняются по очереди
+    _io_lock: asyncio.Lock
+    _shared: int
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.set_callbacks_on_commit = set()
         self.callbacks_on_commit = []
+        self.entity_cache = {}
+        self.inserted_entities = []
+        self._io_lock = asyncio.Lock()
+        self._shared = 0
+
+    @property
+    def io_lock(self) -> asyncio.Lock:
+        return self._io_lock
+
+    @property
+    def is_shared(self) -> bool:
+        """Сессию сейчас могут читать дочерние задачи"""
+        return self._shared > 0
+
+    def share(self) -> None:
+        self._shared += 1
+
+    def unshare(self) -> None:
+        self._shared -= 1
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._io_lock:
+            return await super().execute(*args, **kwargs)
+
+    async def execute_core(
+        self, statement: Executable, params: dict[str, Any] | None = None
+    ) -> Result:
+        # Core-запрос на соединении сессии мимо ORM, результат буферизован
+        async with self._io_lock:
+            connection = await super().connection()
+            return await connection.execute(statement, params)
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._io_lock:
+            return await super().scalar(*args, **kwargs)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._io_lock:
+            return await super().get(*args, **kwargs)
+
+    async def get_one(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._io_lock:
+            return await super().get_one(*args, **kwargs)
+
+    async def merge(self, *args: Any, **kwargs: Any) -> Any:
+        async with self._io_lock:
+            return await super().merge(*args, **kwargs)
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        async with self._io_lock:
+            await super().refresh(*args, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        async with self._io_lock:
+            await super().delete(instance)
 
-    def add_on_commit(self, cb: Callable[[], None]) -> None:
+    async def flush(self, objects=None) -> None:
+        async with self._io_lock:
+            await super().flush(objects)
+
+    async def connection(self, *args: Any, **kwargs: Any) -> AsyncConnection:
+        async with self._io_lock:
+            return await super().connection(*args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> Any:
+        # Серверный курсор занимает соединение между выборками строк,
+        # поэтому с дочерними задачами его не разделить
+        if self.is_shared:
+            raise RuntimeError(
+                "Cannot stream results in session shared with child tasks"
+            )
+        return await super().stream(*args, **kwargs)
+
+    def mark_inserted(self, entity: Any) -> None:
+        make_transient_to_detached(entity)
+        self.inserted_entities.append(weakref.ref(entity))
+        self.entity_cache[inspect(entity).key] = entity
+
+    def _revert_inserted(self, inserted_count: int = 0) -> None:
+        for ref in self.inserted_entities[inserted_count:]:
+            entity = ref()
+            if entity is not None:
+                make_transient(entity)
+        del self.inserted_entities[inserted_count:]
+
+    def expunge_many(self, entities: Iterable[Any]) -> None:
+        # Пакетная запись отпускает уже записанные сущности: ни identity map,
+        # ни кэш единицы работы не растут с размером пакета
+        for entity in entities:
+            key = inspect(entity).key
+            if key is not None:
+                self.entity_cache.pop(key, None)
+            if entity in self:
+                self.expunge(entity)
+
+    def add_on_commit(self, cb: OnCommitCallback) -> None:
         if cb in self.set_callbacks_on_commit:
             return
 
         self.set_callbacks_on_commit.add(cb)
         self.callbacks_on_commit.append(cb)
 
-    def remove_on_commit(self, cb: Callable[[], None]) -> None:
+    def remove_on_commit(self, cb: OnCommitCallback) -> None:
         if cb not in self.set_callbacks_on_commit:
             return
 
         self.set_callbacks_on_commit.discard(cb)
         self.callbacks_on_commit.remove(cb)
 
+    def discard_savepoint_state(
+        self, callbacks_count: int, inserted_count: int
+    ) -> None:
+        # Откат SAVEPOINT: колбэки, добавленные после него, кэш единицы работы
+        # и записанные после него сущности больше не соответствуют данным транзакции
+        self.entity_cache.clear()
+        self._revert_inserted(inserted_count)
+        for cb in self.callbacks_on_commit[callbacks_count:]:
+            self.set_callbacks_on_commit.discard(cb)
+        del self.callbacks_on_commit[callbacks_count:]
+
+    def pop_callbacks_on_commit(self) -> list[OnCommitCallback]:
+        callbacks = self.callbacks_on_commit
+        self.set_callbacks_on_commit = set()
+        self.callbacks_on_commit = []
+        return callbacks
+
+    async def commit(self) -> None:
+        async with self._io_lock:
+            await super().commit()
+        self.inserted_entities.clear()
+
+    async def rollback(self) -> None:
+        self.entity_cache.clear()
+        self._revert_inserted()
+        self.pop_callbacks_on_commit()
+        async with self._io_lock:
+            await super().rollback()
+
+    async def close(self) -> None:
+        # Незакоммиченная транзакция при закрытии откатывается
+        self.entity_cache.clear()
+        self._revert_inserted()
+        self.pop_callbacks_on_commit()
+        async with self._io_lock:
+            await super().close()
+
 
 TransactionalSessionFactory = async_sessionmaker[TransactionalSession]
@@ -0,0 +1,130 @@
+import bisect
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from app.infrastructure.database.transaction.instrumentation import TransactionReport
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+
+@dataclass
+class Histogram:
+    buckets: Sequence[float]
+    counts: list[int] = field(init=False)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self) -> None:
+        # Последняя ячейка - +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> float:
+        """Оценка перцентиля: верхняя граница ячейки, в которую он попадает."""
+        if not self.count:
+            return 0.0
+
+        rank = math.ceil(q * self.count)
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+
+
+METRICS = (
+    ("wall_time", "transaction_duration_seconds", SECONDS_BUCKETS),
+    ("connection_time", "transaction_connection_seconds", SECONDS_BUCKETS),
+    ("statements", "transaction_statements", COUNT_BUCKETS),
+    ("flushes", "transaction_flushes", COUNT_BUCKETS),
+    ("rows", "transaction_rows", COUNT_BUCKETS),
+)
+
+
+class TransactionMetrics:
+    """
+    Агрегирует TransactionReport в гистограммы по (name, outcome).
+
+    Экземпляр - хук для tm.add_hook(), export() отдаёт метрики
+    в текстовом формате Prometheus. Повторные попытки tm.run()
+    дополнительно считаются в transaction_retries_total.
+    """
+
+    _histograms: dict[tuple[str, str], dict[str, Histogram]]
+    _retries: dict[tuple[str, str], int]
+
+    def __init__(self) -> None:
+        self._histograms = {}
+        self._retries = {}
+
+    def __call__(self, report: TransactionReport) -> None:
+        key = (report.name, str(report.outcome))
+        histograms = self._histograms.get(key)
+        if histograms is None:
+            histograms = self._histograms[key] = {
+                attr: Histogram(buckets) for attr, _, buckets in METRICS
+            }
+
+        for attr, _, _ in METRICS:
+            histograms[attr].observe(getattr(report, attr))
+
+        if report.attempt > 1:
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def histogram(self, name: str, outcome: str, metric: str) -> Histogram | None:
+        histograms = self._histograms.get((name, outcome))
+        return histograms[metric] if histograms is not None else None
+
+    def retries(self, name: str, outcome: str) -> int:
+        return self._retries.get((name, outcome), 0)
+
+    def export(self) -> str:
+        lines = []
+        for attr, metric, buckets in METRICS:
+            lines.append(f"# TYPE {metric} histogram")
+            for (name, outcome), histograms in sorted(self._histograms.items()):
+                histogram = histograms[attr]
+                labels = f'name="{_escape(name)}",outcome="{outcome}"'
+
+                cumulative = 0
+                for bound, count in zip((*buckets, math.inf), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else _format(bound)
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{labels}}} {_format(histogram.sum)}")
+                lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+
+        lines.append("# TYPE transaction_retries_total counter")
+        for (name, outcome), retries in sorted(self._retries.items()):
+            labels = f'name="{_escape(name)}",outcome="{outcome}"'
+            lines.append(f"transaction_retries_total{{{labels}}} {retries}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from app.application.interfaces.common import IOutboxSink
+from app.application.interfaces.repository import IOutboxRepository
+from app.application.interfaces.transaction import ITransactionManager
+from app.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryOutboxSink(IOutboxSink):
+    messages: list[OutboxMessage]
+
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def send(self, messages: list[OutboxMessage]) -> None:
+        self.messages.extend(messages)
+
+
+class OutboxRelay:
+    _tm: ITransactionManager
+    _outbox_repository: IOutboxRepository
+    _sink: IOutboxSink
+    _batch_size: int
+    _poll_interval: float
+    _stopped: asyncio.Event
+
+    def __init__(
+        self,
+        tm: ITransactionManager,
+        outbox_repository: IOutboxRepository,
+        sink: IOutboxSink,
+        *,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self._tm = tm
+        self._outbox_repository = outbox_repository
+        self._sink = sink
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._stopped = asyncio.Event()
+
+    async def relay_once(self) -> int:
+        # Захват и доставка пачки идут в одной транзакции: при ошибке sink-а
+        # сообщения остаются в таблице и будут доставлены повторно
+        async with self._tm.transaction():
+            messages = await self._outbox_repository.claim_batch(self._batch_size)
+            if messages:
+                await self._sink.send(messages)
+
+        return len(messages)
+
+    async def run(self) -> None:
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                delivered = await self.relay_once()
+            except Exception:
+                logger.exception("Outbox relay failed to deliver a batch")
+                delivered = 0
+
+            # Полная пачка - скорее всего, в очереди есть ещё сообщения
+            if delivered >= self._batch_size:
+                continue
+
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._stopped.wait(), self._poll_interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
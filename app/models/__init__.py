@@ -1,6 +1,7 @@
 from .base import BaseModel
+from .outbox import OutboxMessage
 from .post import Post
 from .post_attachment import PostAttachment
 from .user import User
 
-__all__ = ("BaseModel", "User", "Post", "PostAttachment")
+__all__ = ("BaseModel", "User", "Post", "PostAttachment", "OutboxMessage")
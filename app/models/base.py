@@ -1,10 +1,12 @@
 import uuid
 from datetime import UTC, datetime
-from typing import Any
+from typing import Any, Callable, ClassVar
 
 from sqlalchemy import MetaData
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, registry
 
+from .ids import uuid7
+
 mapper_registry = registry(metadata=MetaData())
 
 
@@ -14,10 +16,11 @@ class BaseModel(DeclarativeBase):
     registry = mapper_registry
     metadata = mapper_registry.metadata
 
-    id: Mapped[uuid.UUID] = mapped_column(
-        primary_key=True,
-        unique=True,
-    )
+    # Генератор первичного ключа, модель может выбрать свой (например, uuid.uuid4).
+    # UUIDv7 растут со временем, поэтому вставки идут в правый край индекса
+    id_factory: ClassVar[Callable[[], uuid.UUID]] = uuid7
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True)
     created_at: Mapped[datetime]
     updated_at: Mapped[datetime | None]
 
@@ -28,7 +31,7 @@ class BaseModel(DeclarativeBase):
     @classmethod
     def gen_base_properties(cls) -> dict[str, Any]:
         return {
-            "id": uuid.uuid4(),
+            "id": cls.id_factory(),
             "created_at": cls.gen_native_utc_now(),
             "updated_at": None,
         }
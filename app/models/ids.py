@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+import uuid
+
+# 42 бита счётчика: rand_a (12) и старшие 30 бит rand_b
+_COUNTER_BITS = 42
+_COUNTER_MAX = (1 << _COUNTER_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    UUIDv7 (RFC 9562): 48 бит времени в миллисекундах, затем счётчик
+    и случайные биты.
+
+    Ключи, созданные в процессе, строго возрастают: в пределах одной
+    миллисекунды (и если часы пошли назад) увеличивается счётчик,
+    начальное значение которого случайно. Генерация под блокировкой,
+    поэтому безопасна и для задач, и для потоков пула.
+    """
+    global _last_ms, _counter
+
+    random_bits = int.from_bytes(os.urandom(10))
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Старший бит счётчика нулевой - запас на инкременты
+            _counter = random_bits >> (80 - _COUNTER_BITS + 1)
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            _last_ms += 1
+            _counter = 0
+        ms, counter = _last_ms, _counter
+
+    return uuid.UUID(
+        int=(ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (counter >> 30) << 64
+        | 0b10 << 62
+        | (counter & 0x3FFF_FFFF) << 32
+        | random_bits & 0xFFFF_FFFF
+    )
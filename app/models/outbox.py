@@ -0,0 +1,18 @@
+from typing import Any
+
+from sqlalchemy import JSON, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+
+class OutboxMessage(BaseModel):
+    __tablename__ = "outbox_message"
+    __table_args__ = (Index("ix_outbox_message_created_at", "created_at", "id"),)
+
+    topic: Mapped[str]
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON)
+
+    @classmethod
+    def create(cls, *, topic: str, payload: dict[str, Any]) -> "OutboxMessage":
+        return OutboxMessage(**cls.gen_base_properties(), topic=topic, payload=payload)
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import BaseModel
@@ -8,15 +8,24 @@ from .base import BaseModel
 
 class Post(BaseModel):
     __tablename__ = "post"
+    # Список постов пользователя с keyset-пагинацией по (created_at, id)
+    __table_args__ = (
+        Index("ix_post_user_id_created_at", "user_id", "created_at", "id"),
+    )
 
     text: Mapped[str]
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("user.id"))
     attachments_count: Mapped[int]
 
     @classmethod
-    def create(cls, *, text: str, user_id: uuid.UUID) -> "Post":
+    def create(
+        cls, *, text: str, user_id: uuid.UUID, attachments_count: int = 0
+    ) -> "Post":
         return Post(
-            **cls.gen_base_properties(), text=text, user_id=user_id, attachments_count=0
+            **cls.gen_base_properties(),
+            text=text,
+            user_id=user_id,
+            attachments_count=attachments_count,
         )
 
     def _on_update(self) -> None:
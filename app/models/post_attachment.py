@@ -1,7 +1,7 @@
 import re
 import uuid
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from .base import BaseModel
@@ -9,6 +9,9 @@ from .base import BaseModel
 
 class PostAttachment(BaseModel):
     __tablename__ = "post_attachment"
+    __table_args__ = (
+        Index("ix_post_attachment_post_id_created_at", "post_id", "created_at", "id"),
+    )
 
     file_url: Mapped[str]
     post_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("post.id"))
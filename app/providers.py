@@ -1,11 +1,16 @@
+from collections.abc import AsyncIterator
+from typing import TypeVar
+
 from dishka import Provider, Scope, alias, provide
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     async_sessionmaker,
-    create_async_engine,
 )
 
+from app.application.interfaces.common import IBackgroundExecutor
+from app.application.interfaces.queries import IPostQueries
 from app.application.interfaces.repository import (
+    IOutboxRepository,
     IPostAttachmentRepository,
     IPostRepository,
     IUserRepository,
@@ -14,50 +19,169 @@ from app.application.interfaces.transaction import ITransactionManager
 from app.application.services.post import PostService
 from app.application.services.post_attachment import PostattachmentService
 from app.application.services.user import UserService
-from app.config import DATABASE_URL
+from app.config import (
+    BACKGROUND_POOL_MODE,
+    BACKGROUND_POOL_SIZE,
+    DATABASE_READ_ONLY_URL,
+    DATABASE_REPLICA_SELECTION,
+    DATABASE_REPLICA_URLS,
+    DATABASE_URL,
+    ENTITY_CACHE_SETTINGS,
+    POOL_SETTINGS,
+    QUERY_BUDGET_MAX_REPEATS,
+    QUERY_BUDGET_MAX_STATEMENTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+    STATEMENT_CACHE_SETTINGS,
+)
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.common import BackgroundExecutor, PoolMode
+from app.infrastructure.database.ingest import BulkIngest
+from app.infrastructure.database.pool import PoolMetrics, make_engine
+from app.infrastructure.database.queries import PostQueries
+from app.infrastructure.database.repository.cached import (
+    CachedPostRepository,
+    CachedUserRepository,
+    EntityCache,
+)
+from app.infrastructure.database.repository.outbox import OutboxRepository
 from app.infrastructure.database.repository.post import PostRepository
 from app.infrastructure.database.repository.post_attachment import (
     PostAttachmentRepository,
 )
 from app.infrastructure.database.repository.user import UserRepository
 from app.infrastructure.database.transaction import (
+    ReplicaRouter,
+    ReplicaSelection,
     TransactionalSession,
     TransactionalSessionFactory,
     TransactionManager,
 )
+from app.infrastructure.database.transaction.retry import RetryPolicy
+from app.infrastructure.metrics import TransactionMetrics
+from app.models import BaseModel, Post, User
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def make_entity_cache(model: type[T]) -> EntityCache[T]:
+    return EntityCache(
+        model,
+        LRUCache(
+            max_size=ENTITY_CACHE_SETTINGS.max_size, ttl=ENTITY_CACHE_SETTINGS.ttl
+        ),
+    )
+
+
+def make_session_factory(engine: AsyncEngine) -> TransactionalSessionFactory:
+    return async_sessionmaker(
+        bind=engine,
+        class_=TransactionalSession,
+        expire_on_commit=True,
+        autoflush=False,
+    )
 
 
 class DatabaseProvider(Provider):
     scope = Scope.APP
 
     @provide
-    def engine(self) -> AsyncEngine:
-        engine = create_async_engine(
-            DATABASE_URL,
+    def pool_metrics(self) -> PoolMetrics:
+        return PoolMetrics()
+
+    @provide
+    def engine(self, pool_metrics: PoolMetrics) -> AsyncEngine:
+        return make_engine(
+            DATABASE_URL, POOL_SETTINGS, pool_metrics, STATEMENT_CACHE_SETTINGS
         )
-        return engine
 
     @provide
     def session_factory(self, engine: AsyncEngine) -> TransactionalSessionFactory:
-        return async_sessionmaker(
-            bind=engine,
-            class_=TransactionalSession,
-            expire_on_commit=True,
-            autoflush=False,
+        return make_session_factory(engine)
+
+    @provide
+    def replica_router(self, pool_metrics: PoolMetrics) -> ReplicaRouter:
+        return ReplicaRouter(
+            [
+                make_session_factory(
+                    make_engine(
+                        url, POOL_SETTINGS, pool_metrics, STATEMENT_CACHE_SETTINGS
+                    )
+                )
+                for url in DATABASE_REPLICA_URLS
+            ],
+            ReplicaSelection(DATABASE_REPLICA_SELECTION),
         )
 
 
 class InfrastructureProvider(Provider):
     scope = Scope.APP
 
-    transaction_manager_impl = provide(TransactionManager)
+    @provide
+    async def background_executor(self) -> AsyncIterator[IBackgroundExecutor]:
+        executor = BackgroundExecutor(
+            pool_mode=PoolMode(BACKGROUND_POOL_MODE), pool_size=BACKGROUND_POOL_SIZE
+        )
+        yield executor
+        # При закрытии контейнера поставленные задачи (в том числе колбэки
+        # on_commit) дорабатывают, затем закрывается пул потоков/процессов
+        await executor.drain()
+        await executor.shutdown()
+
+    transaction_metrics = provide(TransactionMetrics)
+
+    @provide
+    def transaction_manager_impl(
+        self,
+        session_factory: TransactionalSessionFactory,
+        background_executor: IBackgroundExecutor,
+        replicas: ReplicaRouter,
+        transaction_metrics: TransactionMetrics,
+        pool_metrics: PoolMetrics,
+    ) -> TransactionManager:
+        tm = TransactionManager(
+            session_factory,
+            background_executor,
+            replicas,
+            RetryPolicy(RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY),
+            (
+                make_session_factory(
+                    make_engine(
+                        DATABASE_READ_ONLY_URL,
+                        POOL_SETTINGS,
+                        pool_metrics,
+                        STATEMENT_CACHE_SETTINGS,
+                    )
+                )
+                if DATABASE_READ_ONLY_URL
+                else None
+            ),
+        )
+        tm.add_hook(transaction_metrics)
+        tm.set_query_budget(QUERY_BUDGET_MAX_STATEMENTS, QUERY_BUDGET_MAX_REPEATS)
+        return tm
+
     transaction_manager = alias(source=TransactionManager, provides=ITransactionManager)
 
-    user_repository = provide(UserRepository, provides=IUserRepository)
-    post_repository = provide(PostRepository, provides=IPostRepository)
+    @provide
+    def user_cache(self) -> EntityCache[User]:
+        return make_entity_cache(User)
+
+    @provide
+    def post_cache(self) -> EntityCache[Post]:
+        return make_entity_cache(Post)
+
+    user_repository_impl = provide(UserRepository)
+    post_repository_impl = provide(PostRepository)
+    user_repository = provide(CachedUserRepository, provides=IUserRepository)
+    post_repository = provide(CachedPostRepository, provides=IPostRepository)
     post_attachment_repository = provide(
         PostAttachmentRepository, provides=IPostAttachmentRepository
     )
+    outbox_repository = provide(OutboxRepository, provides=IOutboxRepository)
+    post_queries = provide(PostQueries, provides=IPostQueries)
+    bulk_ingest = provide(BulkIngest)
 
 
 class ApplicationProvider(Provider):
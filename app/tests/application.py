@@ -1,39 +1,48 @@
+import asyncio
+
 import pytest
-from dishka import Container, make_container
-from sqlalchemy import func, select, text
+import pytest_asyncio
+from dishka import AsyncContainer, make_async_container
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
 
-from app.application.services.post import PostService
+from app.application.interfaces.common import IBackgroundExecutor
+from app.application.interfaces.repository import IPostRepository
+from app.application.services.post import NewPost, PostService
+from app.application.services.post_attachment import PostattachmentService
 from app.application.services.user import UserService
 from app.config import DB_NAME
+from app.infrastructure.database.query_budget import QueryBudget
 from app.infrastructure.database.transaction import (
     TransactionalSessionFactory,
     TransactionManager,
 )
+from app.infrastructure.metrics import TransactionMetrics
 from app.models import Post, PostAttachment, User
 from app.providers import ApplicationProvider, DatabaseProvider, InfrastructureProvider
 
 pytestmark = pytest.mark.asyncio
 
 
-@pytest.fixture
-def di():
-    di = make_container(
+@pytest_asyncio.fixture
+async def di():
+    di = make_async_container(
         DatabaseProvider(), InfrastructureProvider(), ApplicationProvider()
     )
     yield di
-    di.close()
+    await di.close()
 
 
 class TestApplication:
-    async def test_create_post_integration_on_sucess(self, di: Container):
+    async def test_create_post_integration_on_sucess(self, di: AsyncContainer):
         """
         Сервисы корректно работают, используя TransactionManager.
         Все данные сохраняються в БД
         """
 
-        tm = di.get(TransactionManager)
-        user_service = di.get(UserService)
-        post_service = di.get(PostService)
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
 
         async with tm.transaction():
             user_id = await user_service.create_user(name="Bob")
@@ -67,14 +76,14 @@ class TestApplication:
 
         await self._assert_no_stuck_transactions(di)
 
-    async def test_create_post_integration_on_fail(self, di: Container):
+    async def test_create_post_integration_on_fail(self, di: AsyncContainer):
         """
         При возникновении ошибки все данные не сохраняються
         """
 
-        tm = di.get(TransactionManager)
-        user_service = di.get(UserService)
-        post_service = di.get(PostService)
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
 
         user_id = None
         post_id = None
@@ -108,8 +117,273 @@ class TestApplication:
 
         await self._assert_no_stuck_transactions(di)
 
-    async def _assert_no_stuck_transactions(self, di: Container):
-        session_maker = di.get(TransactionalSessionFactory)
+    async def test_failed_attachments_in_savepoint_do_not_abort_post(
+        self, di: AsyncContainer
+    ):
+        """
+        create_attachments во вложенном контексте с savepoint=True при ошибке
+        откатывает только свою работу: внешняя транзакция продолжается,
+        и создание вложений можно повторить
+        """
+
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_repository = await di.get(IPostRepository)
+        attachment_service = await di.get(PostattachmentService)
+
+        user_id = await user_service.create_user(name="Bob")
+
+        async with tm.transaction():
+            post = Post.create(text="Hello world", user_id=user_id)
+            await post_repository.save(post)
+
+            with pytest.raises(RuntimeError):
+                async with tm.transaction(savepoint=True):
+                    await attachment_service.create_attachments(
+                        ["https://examle.com/image1.jpg"], post.id
+                    )
+                    raise RuntimeError("BOOM!")
+
+            await attachment_service.create_attachments(
+                ["https://examle.com/image1.jpg", "https://examle.com/image2.jpg"],
+                post.id,
+            )
+
+        async with tm.session(read_your_writes=True) as s:
+            created_post = await s.get(Post, post.id)
+            assert created_post is not None
+            assert created_post.attachments_count == 2
+
+            attachments_count = await s.scalar(
+                select(func.count())
+                .select_from(PostAttachment)
+                .where(PostAttachment.post_id == post.id)
+            )
+            assert attachments_count == 2
+
+        await self._assert_no_stuck_transactions(di)
+
+    async def test_concurrent_create_post_does_not_lose_increments(
+        self, di: AsyncContainer
+    ):
+        """
+        Параллельное создание постов одного пользователя не теряет инкременты
+        posts_count: счётчик обновляется атомарно на стороне БД
+        """
+
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        user_id = await user_service.create_user(name="Bob")
+
+        async def create_post(i: int) -> None:
+            await post_service.create_post(
+                text=f"Post {i}",
+                user_id=user_id,
+                attachments_url=["https://examle.com/image.jpg"],
+            )
+
+        await asyncio.gather(*(create_post(i) for i in range(20)))
+
+        async with tm.session() as s:
+            created_user = await s.get(User, user_id)
+
+            assert created_user is not None
+            assert created_user.posts_count == 20
+
+        await self._assert_no_stuck_transactions(di)
+
+    async def test_create_post_does_not_select(self, di: AsyncContainer):
+        """
+        Создание поста не выполняет ни одного SELECT: новые сущности вставляются
+        без merge(), а счётчики обновляются без загрузки строк
+        """
+
+        engine = await di.get(AsyncEngine)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        user_id = await user_service.create_user(name="Bob")
+
+        statements: list[str] = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+        try:
+            await post_service.create_post(
+                text="Hello world",
+                user_id=user_id,
+                attachments_url=[
+                    "https://examle.com/image1.jpg",
+                    "https://examle.com/image2.jpg",
+                ],
+            )
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+
+        assert [s.split()[0].upper() for s in statements] == [
+            "INSERT",
+            "INSERT",
+            "UPDATE",
+            "UPDATE",
+            "INSERT",
+        ]
+
+    async def test_create_post_is_reported_by_service_method(self, di: AsyncContainer):
+        """
+        Транзакция create_post попадает в метрики под именем метода сервиса
+        вместе с числом запросов и затронутых строк
+        """
+
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+        metrics = await di.get(TransactionMetrics)
+
+        user_id = await user_service.create_user(name="Bob")
+        await post_service.create_post(
+            text="Hello world",
+            user_id=user_id,
+            attachments_url=["https://examle.com/image1.jpg"],
+        )
+
+        statements = metrics.histogram(
+            "PostService.create_post", "commit", "statements"
+        )
+        rows = metrics.histogram("PostService.create_post", "commit", "rows")
+        assert statements is not None and rows is not None
+        assert statements.sum == 5
+        assert rows.sum == 5
+        assert 'name="PostService.create_post"' in metrics.export()
+
+    @pytest.mark.query_budget(max_statements=6, max_repeats=1)
+    async def test_create_post_fits_query_budget(
+        self, di: AsyncContainer, query_budget
+    ):
+        """
+        create_post укладывается в 5 запросов без повторяющихся (N+1)
+        при любом числе вложений, бюджет теста - ещё один INSERT пользователя
+        """
+
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        user_id = await user_service.create_user(name="Bob")
+        statements_before = len(query_budget)
+
+        await post_service.create_post(
+            text="Hello world",
+            user_id=user_id,
+            attachments_url=[f"https://examle.com/image{i}.jpg" for i in range(20)],
+        )
+
+        assert len(query_budget) - statements_before == 5
+
+    async def test_create_posts_in_chunks(self, di: AsyncContainer):
+        """
+        Пакетное создание пишет посты, вложения и сообщения outbox
+        чанками по несколько запросов на чанк, отпускает записанные сущности
+        и обновляет posts_count одним запросом на каждое значение инкремента
+        """
+
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        bob_id, alice_id = await user_service.create_users(
+            names=["Bob", "Alice"], chunk_size=1
+        )
+        new_posts = [
+            NewPost(
+                text=f"Post {i}",
+                user_id=bob_id if i % 3 else alice_id,
+                attachments_url=[f"https://examle.com/image{i}.jpg"] * (i % 2),
+            )
+            for i in range(10)
+        ]
+
+        async with tm.transaction() as tx:
+            with QueryBudget(max_statements=11) as report:
+                post_ids = await post_service.create_posts(
+                    posts=new_posts, chunk_size=4
+                )
+            assert not tx.identity_map and not tx.entity_cache
+
+        # 3 чанка по 3 INSERT и два UPDATE счётчиков: у Bob и Alice разное
+        # число постов, UPDATE выполняется на каждое значение инкремента
+        assert len(report) == 3 * 3 + 2
+        assert len(post_ids) == 10
+
+        async with tm.session() as s:
+            bob = await s.get(User, bob_id)
+            alice = await s.get(User, alice_id)
+            assert bob is not None and bob.posts_count == 6
+            assert alice is not None and alice.posts_count == 4
+
+            posts = list(await s.scalars(select(Post).where(Post.id.in_(post_ids))))
+            assert sum(post.attachments_count for post in posts) == 5
+            attachments_count = await s.scalar(
+                select(func.count())
+                .select_from(PostAttachment)
+                .where(PostAttachment.post_id.in_(post_ids))
+            )
+            assert attachments_count == 5
+
+        await self._assert_no_stuck_transactions(di)
+
+    async def test_create_posts_rolls_back_whole_batch(self, di: AsyncContainer):
+        """
+        Ошибка в любом чанке откатывает весь пакет
+        """
+
+        tm = await di.get(TransactionManager)
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        (user_id,) = await user_service.create_users(names=["Bob"])
+        new_posts = [NewPost(text=f"Post {i}", user_id=user_id) for i in range(5)]
+        new_posts.append(
+            NewPost(text="Bad", user_id=user_id, attachments_url=["not an url"])
+        )
+
+        with pytest.raises(ValueError):
+            await post_service.create_posts(posts=new_posts, chunk_size=2)
+
+        async with tm.session() as s:
+            user = await s.get(User, user_id)
+            assert user is not None and user.posts_count == 0
+            posts_count = await s.scalar(
+                select(func.count()).select_from(Post).where(Post.user_id == user_id)
+            )
+            assert posts_count == 0
+
+        await self._assert_no_stuck_transactions(di)
+
+    async def test_container_close_drains_background_executor(self):
+        """
+        При закрытии контейнера BackgroundExecutor дожидается поставленных задач,
+        после чего новые задачи не принимаются
+        """
+
+        di = make_async_container(DatabaseProvider(), InfrastructureProvider())
+        executor = await di.get(IBackgroundExecutor)
+        done = asyncio.Event()
+
+        async def task() -> None:
+            await asyncio.sleep(0.05)
+            done.set()
+
+        await executor.submit(task())
+        await di.close()
+
+        assert done.is_set()
+        with pytest.raises(RuntimeError, match="shut down"):
+            await executor.submit(task())
+
+    async def _assert_no_stuck_transactions(self, di: AsyncContainer):
+        session_maker = await di.get(TransactionalSessionFactory)
         async with session_maker() as s:
             stuck_tx_count = await s.scalar(
                 text(f"""
@@ -1,16 +1,41 @@
 import asyncio
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from asyncpg.exceptions import (
+    DeadlockDetectedError,
+    SerializationError,
+    UniqueViolationError,
+)
 from dishka import make_container
-
-from app.infrastructure.common import BackgroundExecutor
+from sqlalchemy import text, update
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.application.interfaces.transaction import ChildTasks, IsolationLevel
+from app.config import DATABASE_URL, PoolSettings
+from app.infrastructure.common import BackgroundExecutor, OverflowPolicy, PoolMode
+from app.infrastructure.database.pool import InstrumentedPool, PoolMetrics, make_engine
 from app.infrastructure.database.transaction import (
+    ReplicaRouter,
+    ReplicaSelection,
     TransactionalSession,
     TransactionalSessionFactory,
     TransactionManager,
 )
-from app.models import User
-from app.providers import DatabaseProvider
+from app.infrastructure.database.transaction.instrumentation import (
+    TransactionOutcome,
+    TransactionReport,
+)
+from app.infrastructure.database.transaction.retry import RetryPolicy
+from app.infrastructure.metrics import Histogram, TransactionMetrics
+from app.models import BaseModel, User
+from app.models.ids import uuid7
+from app.providers import DatabaseProvider, make_session_factory
 
 pytestmark = pytest.mark.asyncio
 
@@ -23,13 +48,15 @@ def di_container():
 
 
 @pytest.fixture
-def tm(di_container) -> TransactionManager:
-    return TransactionManager(di_container.get(TransactionalSessionFactory))
+def background_executor() -> BackgroundExecutor:
+    return BackgroundExecutor()
 
 
 @pytest.fixture
-def background_executor() -> BackgroundExecutor:
-    return BackgroundExecutor()
+def tm(di_container, background_executor) -> TransactionManager:
+    return TransactionManager(
+        di_container.get(TransactionalSessionFactory), background_executor
+    )
 
 
 @pytest.fixture
@@ -37,6 +64,14 @@ def session_factory(di_container) -> TransactionalSessionFactory:
     return di_container.get(TransactionalSessionFactory)
 
 
+@pytest.fixture
+def replica_engines(tmp_path) -> list[AsyncEngine]:
+    return [
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica{i}.db")
+        for i in range(2)
+    ]
+
+
 class TestTransactionManagerUnit:
     async def test_nested_session_shares_same_instance(self, tm: TransactionManager):
         """
@@ -281,7 +316,884 @@ class TestTransactionManagerUnit:
 
         async with tm.transaction() as s:
             sessions.append(s)
-            background_executor.submit(another_db_task())
+            await background_executor.submit(another_db_task())
             await asyncio.sleep(0.1)
 
         assert sessions[0] is not sessions[1]
+
+    async def test_child_tasks_inherit_read_only_session(self, tm: TransactionManager):
+        """
+        С ChildTasks.INHERIT_READ_ONLY дочерние задачи (gather) используют сессию
+        родителя и могут читать из неё параллельно, но не могут открыть транзакцию
+        """
+
+        async def read():
+            async with tm.session() as s:
+                await s.execute(text("SELECT pg_sleep(0.01)"))
+                return s
+
+        async def write():
+            async with tm.transaction():
+                pass
+
+        async with tm.transaction(child_tasks=ChildTasks.INHERIT_READ_ONLY) as s:
+            sessions = await asyncio.gather(*(read() for _ in range(5)))
+            assert all(child is s for child in sessions)
+
+            with pytest.raises(RuntimeError):
+                await asyncio.create_task(write())
+
+            assert s.in_transaction()
+
+    async def test_child_tasks_policy_is_scoped_to_context(
+        self, tm: TransactionManager
+    ):
+        """
+        Политика, заданная во вложенном контексте, действует только внутри него,
+        а дочерняя задача, пережившая корневой контекст, получает свою сессию
+        """
+
+        async def current():
+            return tm.current_session()
+
+        async with tm.session() as s:
+            async with tm.session(child_tasks=ChildTasks.INHERIT_READ_ONLY) as s2:
+                assert s2 is s
+                assert await asyncio.create_task(current()) is s
+
+                release = asyncio.Event()
+
+                async def late():
+                    await release.wait()
+                    return tm.current_session()
+
+                late_task = asyncio.create_task(late())
+
+            assert await asyncio.create_task(current()) is None
+
+        release.set()
+        assert await late_task is None
+
+    async def test_savepoint_rolls_back_only_nested_unit(self, tm: TransactionManager):
+        """
+        Вложенный контекст с savepoint=True при ошибке откатывает только свои
+        изменения и свои колбэки add_on_commit, корневая транзакция коммитится
+        """
+
+        calls = []
+        bob = User.create(name="Bob")
+        alice = User.create(name="Alice")
+        carol = User.create(name="Carol")
+
+        async with tm.transaction() as tx:
+            await tx.merge(bob)
+
+            with pytest.raises(RuntimeError):
+                async with tm.transaction(savepoint=True) as s:
+                    assert s is tx
+                    await s.merge(alice)
+                    s.add_on_commit(lambda: calls.append("alice"))
+                    raise RuntimeError("BOOM!")
+
+            async with tm.transaction(savepoint=True) as s:
+                await s.merge(carol)
+                s.add_on_commit(lambda: calls.append("carol"))
+
+            assert tx.in_transaction()
+
+        async with tm.session(read_your_writes=True) as s:
+            assert await s.get(User, bob.id) is not None
+            assert await s.get(User, alice.id) is None
+            assert await s.get(User, carol.id) is not None
+
+        assert calls == ["carol"]
+
+    async def test_on_commit_callbacks_run_once_after_root_commit(
+        self, tm: TransactionManager
+    ):
+        """
+        Колбэки add_on_commit выполняются ровно один раз и только после коммита
+        корневой транзакции, в том числе добавленные во вложенных контекстах
+        """
+
+        calls = []
+
+        def on_commit():
+            calls.append("commit")
+
+        async with tm.transaction() as tx:
+            tx.add_on_commit(on_commit)
+
+            async with tm.transaction() as nested_tx:
+                nested_tx.add_on_commit(on_commit)
+                nested_tx.add_on_commit(lambda: calls.append("nested"))
+
+            assert calls == []
+
+        assert calls == ["commit", "nested"]
+
+        async with tm.transaction():
+            pass
+
+        assert calls == ["commit", "nested"]
+
+    async def test_on_commit_callbacks_dropped_on_rollback(
+        self, tm: TransactionManager
+    ):
+        """
+        При откате транзакции колбэки add_on_commit не выполняются
+        """
+
+        calls = []
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction() as tx:
+                tx.add_on_commit(lambda: calls.append("commit"))
+                raise RuntimeError("BOOM!")
+
+        assert calls == []
+
+    async def test_async_on_commit_callback_runs_in_background(
+        self, tm: TransactionManager
+    ):
+        """
+        Асинхронные колбэки передаются в BackgroundExecutor
+        и не задерживают выход из контекста транзакции
+        """
+
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def on_commit():
+            started.set()
+            await release.wait()
+
+        async with tm.transaction() as tx:
+            tx.add_on_commit(on_commit)
+
+        assert not started.is_set()
+
+        await asyncio.wait_for(started.wait(), timeout=1)
+        release.set()
+
+    async def test_on_commit_callback_does_not_wait_for_full_executor(
+        self, session_factory, caplog
+    ):
+        """
+        Если BackgroundExecutor переполнен, асинхронный колбэк on_commit
+        по умолчанию отбрасывается, а не держит выход из транзакции.
+        on_commit_overflow=BLOCK ждёт места в очереди
+        """
+
+        executor = BackgroundExecutor(max_concurrency=1, max_queue_size=0)
+        release = asyncio.Event()
+        assert await executor.submit(release.wait())
+
+        calls = []
+
+        async def on_commit():
+            calls.append("on_commit")
+
+        tm = TransactionManager(session_factory, executor)
+        async with asyncio.timeout(1):
+            async with tm.transaction() as tx:
+                tx.add_on_commit(on_commit)
+        assert "was dropped" in caplog.text
+
+        tm = TransactionManager(
+            session_factory, executor, on_commit_overflow=OverflowPolicy.BLOCK
+        )
+
+        async def commit():
+            async with tm.transaction() as tx:
+                tx.add_on_commit(on_commit)
+
+        blocked = asyncio.create_task(commit())
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        release.set()
+        await asyncio.wait_for(blocked, timeout=1)
+        await executor.drain()
+        assert calls == ["on_commit"]
+
+    async def test_failing_on_commit_callback_does_not_block_others(
+        self, tm: TransactionManager
+    ):
+        """
+        Ошибка в одном колбэке (синхронном или асинхронном) не мешает
+        выполнению остальных и не пробрасывается из контекста транзакции
+        """
+
+        calls = []
+
+        def failing():
+            raise RuntimeError("BOOM!")
+
+        async def async_failing():
+            raise RuntimeError("BOOM!")
+
+        async def async_ok():
+            calls.append("async")
+
+        async with tm.transaction() as tx:
+            tx.add_on_commit(failing)
+            tx.add_on_commit(async_failing)
+            tx.add_on_commit(lambda: calls.append("sync"))
+            tx.add_on_commit(async_ok)
+
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert sorted(calls) == ["async", "sync"]
+
+
+class TestBackgroundExecutor:
+    async def test_concurrency_is_bounded(self):
+        """
+        Одновременно выполняется не больше max_concurrency задач,
+        остальные ждут в очереди
+        """
+
+        executor = BackgroundExecutor(max_concurrency=2, max_queue_size=10)
+        release = asyncio.Event()
+        running = 0
+        max_running = 0
+
+        async def task():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await release.wait()
+            running -= 1
+
+        for _ in range(5):
+            assert await executor.submit(task())
+
+        await asyncio.sleep(0.01)
+        assert executor.stats.in_flight == 2
+        assert executor.stats.queue_depth == 3
+
+        release.set()
+        await executor.drain()
+
+        assert max_running == 2
+        assert executor.stats.completed == 5
+        assert executor.stats.queue_depth == 0
+
+    async def test_drop_policy_discards_overflow(self):
+        """
+        При переполнении с политикой DROP задача отбрасывается, submit возвращает False
+        """
+
+        executor = BackgroundExecutor(
+            max_concurrency=1, max_queue_size=1, overflow_policy=OverflowPolicy.DROP
+        )
+        release = asyncio.Event()
+
+        assert await executor.submit(release.wait())
+        assert await executor.submit(release.wait())
+        assert not await executor.submit(release.wait())
+        assert executor.stats.dropped == 1
+
+        release.set()
+        await executor.drain()
+        assert executor.stats.completed == 2
+
+    async def test_raise_policy_raises_on_overflow(self):
+        """
+        При переполнении с политикой RAISE submit бросает исключение
+        """
+
+        executor = BackgroundExecutor(
+            max_concurrency=1, max_queue_size=0, overflow_policy=OverflowPolicy.RAISE
+        )
+        release = asyncio.Event()
+
+        assert await executor.submit(release.wait())
+        with pytest.raises(RuntimeError):
+            await executor.submit(release.wait())
+
+        release.set()
+        await executor.drain()
+
+    async def test_block_policy_waits_for_capacity(self):
+        """
+        При переполнении с политикой BLOCK submit ждёт, пока освободится место
+        """
+
+        executor = BackgroundExecutor(max_concurrency=1, max_queue_size=0)
+        release = asyncio.Event()
+
+        assert await executor.submit(release.wait())
+        blocked = asyncio.create_task(executor.submit(release.wait()))
+
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+
+        release.set()
+        assert await asyncio.wait_for(blocked, timeout=1)
+        await executor.drain()
+        assert executor.stats.completed == 2
+
+    async def test_failed_task_is_counted_and_logged(self, caplog):
+        """
+        Ошибка фоновой задачи логируется и учитывается в статистике
+        """
+
+        executor = BackgroundExecutor()
+
+        async def failing():
+            raise RuntimeError("BOOM!")
+
+        await executor.submit(failing())
+        await executor.drain()
+
+        assert executor.stats.failed == 1
+        assert "BOOM!" in caplog.text
+
+    async def test_shutdown_cancels_tasks_after_timeout(self):
+        """
+        shutdown ждёт завершения задач не дольше timeout, затем отменяет их,
+        новые задачи после shutdown не принимаются
+        """
+
+        executor = BackgroundExecutor(max_concurrency=1)
+        done = []
+
+        async def fast():
+            done.append("fast")
+
+        await executor.submit(fast())
+        await executor.submit(asyncio.sleep(10))
+        await executor.submit(asyncio.sleep(10))
+
+        await executor.shutdown(timeout=0.05)
+
+        assert done == ["fast"]
+        assert executor.stats.in_flight == 0
+        assert executor.stats.queue_depth == 0
+
+        coroutine = fast()
+        with pytest.raises(RuntimeError):
+            await executor.submit(coroutine)
+
+    @pytest.mark.parametrize("pool_mode", [PoolMode.THREAD, PoolMode.PROCESS])
+    async def test_run_in_pool_returns_result(self, pool_mode: PoolMode):
+        """
+        run_in_pool выполняет обычную функцию в пуле и возвращает её результат,
+        исключения функции пробрасываются вызывающему
+        """
+
+        executor = BackgroundExecutor(pool_mode=pool_mode, pool_size=2)
+
+        results = await asyncio.gather(
+            *(executor.run_in_pool(pow, 2, i) for i in range(5))
+        )
+        assert results == [1, 2, 4, 8, 16]
+
+        with pytest.raises(ValueError):
+            await executor.run_in_pool(int, "not a number")
+
+        await executor.shutdown()
+
+        with pytest.raises(RuntimeError):
+            await executor.run_in_pool(pow, 2, 2)
+
+
+class TestReadReplicas:
+    async def test_reads_go_to_replica_and_transactions_to_primary(
+        self,
+        session_factory: TransactionalSessionFactory,
+        background_executor: BackgroundExecutor,
+        replica_engines: list[AsyncEngine],
+    ):
+        """
+        Корневой tm.session() читает с реплики, tm.transaction() и вложенные в неё
+        сессии работают с primary, read_your_writes=True читает с primary
+        """
+
+        replica = replica_engines[0]
+        await self._create_schema(replica)
+        tm = TransactionManager(
+            session_factory,
+            background_executor,
+            ReplicaRouter([make_session_factory(replica)]),
+        )
+
+        bob = User.create(name="Bob")
+        async with tm.transaction() as tx:
+            await tx.merge(bob)
+            await tx.flush()
+            async with tm.session() as s:
+                assert s is tx
+                assert await s.get(User, bob.id) is not None
+
+        async with tm.session() as s:
+            assert s.bind is replica
+            assert await s.get(User, bob.id) is None
+
+            with pytest.raises(RuntimeError):
+                async with tm.transaction():
+                    pass
+
+        async with tm.session(read_your_writes=True) as s:
+            assert s.bind is not replica
+            assert await s.get(User, bob.id) is not None
+
+        await replica.dispose()
+
+    async def test_replica_selection(
+        self,
+        session_factory: TransactionalSessionFactory,
+        background_executor: BackgroundExecutor,
+        replica_engines: list[AsyncEngine],
+    ):
+        """
+        ROUND_ROBIN выбирает реплики по кругу, LEAST_BUSY - реплику
+        с наименьшим числом открытых сессий
+        """
+
+        factories = [make_session_factory(engine) for engine in replica_engines]
+
+        tm = TransactionManager(
+            session_factory, background_executor, ReplicaRouter(factories)
+        )
+        binds = []
+        for _ in range(4):
+            async with tm.session() as s:
+                binds.append(s.bind)
+        assert binds == replica_engines * 2
+
+        tm = TransactionManager(
+            session_factory,
+            background_executor,
+            ReplicaRouter(factories, ReplicaSelection.LEAST_BUSY),
+        )
+        release = asyncio.Event()
+        busy = []
+
+        async def hold():
+            async with tm.session() as s:
+                busy.append(s.bind)
+                await release.wait()
+
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        for _ in range(2):
+            async with tm.session() as s:
+                assert s.bind is not busy[0]
+
+        release.set()
+        await task
+
+    async def _create_schema(self, engine: AsyncEngine):
+        async with engine.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.create_all)
+
+
+class TestPoolMetrics:
+    async def test_metrics_track_checkouts_overflow_and_timeouts(self):
+        """
+        Метрики пула считают выданные соединения, использование overflow,
+        время ожидания соединения и таймауты
+        """
+
+        metrics = PoolMetrics()
+        engine = make_engine(
+            DATABASE_URL, PoolSettings(size=1, max_overflow=1, timeout=0.1), metrics
+        )
+
+        async with engine.connect() as c1:
+            await c1.execute(text("SELECT 1"))
+            async with engine.connect() as c2:
+                await c2.execute(text("SELECT 1"))
+
+                stats = metrics.snapshot()
+                assert stats.checked_out == 2
+                assert stats.overflow == 1
+                assert stats.overflow_checkouts == 1
+
+                with pytest.raises(PoolTimeoutError):
+                    async with engine.connect() as c3:
+                        await c3.execute(text("SELECT 1"))
+
+        stats = metrics.snapshot()
+        assert stats.checked_out == 0
+        assert stats.checkouts == 2
+        assert stats.peak_checked_out == 2
+        assert stats.timeouts == 1
+        assert stats.wait_max >= 0.1
+
+        await engine.dispose()
+        async with engine.connect() as c:
+            await c.execute(text("SELECT 1"))
+        assert metrics.snapshot().checkouts == 3
+
+        await engine.dispose()
+
+    async def test_sqlite_keeps_dialect_pool(self):
+        """
+        Для SQLite пул выбирает диалект: :memory: живёт на одном соединении
+        (StaticPool), метрики выдач при этом считаются
+        """
+
+        metrics = PoolMetrics()
+        engine = make_engine("sqlite+aiosqlite://", PoolSettings(), metrics)
+        try:
+            assert not isinstance(engine.sync_engine.pool, InstrumentedPool)
+            async with engine.begin() as c:
+                await c.run_sync(BaseModel.metadata.create_all)
+            async with engine.connect() as c:
+                assert await c.scalar(text('SELECT COUNT(*) FROM "user"')) == 0
+
+            assert metrics.snapshot().checkouts == 2
+        finally:
+            await engine.dispose()
+
+    async def test_metrics_are_shared_between_engines(self):
+        """
+        Один PoolMetrics на primary и реплики: выдачи и размер пулов
+        суммируются по всем движкам
+        """
+
+        metrics = PoolMetrics()
+        primary = make_engine(DATABASE_URL, PoolSettings(size=2), metrics)
+        replica = make_engine(DATABASE_URL, PoolSettings(size=3), metrics)
+        try:
+            async with primary.connect() as c1, replica.connect() as c2:
+                await c1.execute(text("SELECT 1"))
+                await c2.execute(text("SELECT 1"))
+                assert metrics.snapshot().checked_out == 2
+
+            stats = metrics.snapshot()
+            assert stats.checkouts == 2
+            assert stats.size == 5
+        finally:
+            await primary.dispose()
+            await replica.dispose()
+
+
+class TestTransactionInstrumentation:
+    async def test_hook_receives_report_for_root_transaction(
+        self, tm: TransactionManager
+    ):
+        """
+        После корневой транзакции хук получает отчёт: число запросов, флашей,
+        затронутых строк, время, исход и имя метода, открывшего транзакцию
+        """
+
+        reports: list[TransactionReport] = []
+        tm.add_hook(reports.append)
+
+        async with tm.transaction() as tx:
+            async with tm.transaction() as nested:
+                nested.add_all([User.create(name="Bob"), User.create(name="Alice")])
+            await tx.execute(text("SELECT 1"))
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction(name="custom"):
+                await tx.execute(text("SELECT 1"))
+                raise RuntimeError("BOOM!")
+
+        async with tm.session() as s:
+            await s.execute(text("SELECT 1"))
+
+        tm.remove_hook(reports.append)
+        async with tm.transaction():
+            pass
+
+        committed, rolled_back = reports
+        assert committed.name == (
+            "TestTransactionInstrumentation."
+            "test_hook_receives_report_for_root_transaction"
+        )
+        assert committed.outcome == TransactionOutcome.COMMIT
+        assert committed.flushes == 1
+        assert committed.rows == 2
+        assert committed.statements >= 2
+        assert committed.wall_time >= committed.connection_time > 0
+
+        assert rolled_back.name == "custom"
+        assert rolled_back.outcome == TransactionOutcome.ROLLBACK
+        assert rolled_back.rows == 0
+
+    async def test_metrics_aggregate_reports_and_export_text(self):
+        """
+        TransactionMetrics собирает гистограммы по имени и исходу транзакции
+        и отдаёт их в текстовом формате Prometheus
+        """
+
+        metrics = TransactionMetrics()
+        for statements in range(1, 11):
+            metrics(
+                TransactionReport(
+                    name="PostService.create_post",
+                    outcome=TransactionOutcome.COMMIT,
+                    wall_time=0.25,
+                    connection_time=0.125,
+                    statements=statements,
+                    flushes=1,
+                    rows=statements,
+                )
+            )
+
+        histogram = metrics.histogram("PostService.create_post", "commit", "statements")
+        assert histogram is not None
+        assert histogram.count == 10
+        assert histogram.percentile(0.5) == 5
+        assert histogram.percentile(0.99) == 10
+
+        exported = metrics.export()
+        labels = 'name="PostService.create_post",outcome="commit"'
+        assert "# TYPE transaction_statements histogram" in exported
+        assert f'transaction_statements_bucket{{{labels},le="5"}} 5' in exported
+        assert f'transaction_statements_bucket{{{labels},le="+Inf"}} 10' in exported
+        assert f"transaction_statements_count{{{labels}}} 10" in exported
+        assert f"transaction_duration_seconds_sum{{{labels}}} 2.5" in exported
+
+    async def test_histogram_percentile_of_empty_and_overflow(self):
+        """
+        Перцентиль пустой гистограммы равен 0, значения больше последней
+        границы попадают в ячейку +Inf
+        """
+
+        histogram = Histogram((1, 2))
+        assert histogram.percentile(0.5) == 0.0
+
+        histogram.observe(100)
+        assert histogram.percentile(0.5) == float("inf")
+
+
+class TestTransactionRetry:
+    async def test_run_retries_deadlocked_root_transaction(
+        self, session_factory, background_executor
+    ):
+        """
+        Корневая транзакция tm.run(), проигравшая deadlock, повторяется целиком.
+        Колбэки on_commit выполняются по одному разу на успешную единицу работы,
+        повторы попадают в метрики
+        """
+
+        metrics = TransactionMetrics()
+        tm = TransactionManager(
+            session_factory,
+            background_executor,
+            retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+        )
+        tm.add_hook(metrics)
+
+        bob, alice = User.create(name="Bob"), User.create(name="Alice")
+        ids = {"Bob": bob.id, "Alice": alice.id}
+        async with tm.transaction() as tx:
+            tx.add_all([bob, alice])
+
+        locked = {name: asyncio.Event() for name in ids}
+        attempts: list[str] = []
+        committed: list[str] = []
+
+        async def increment_both(first: str, second: str) -> None:
+            attempts.append(first)
+            tx = tm.current_session()
+            assert tx is not None
+            tx.add_on_commit(lambda: committed.append(first))
+
+            increment = update(User).values(posts_count=User.posts_count + 1)
+            await tx.execute(increment.where(User.id == ids[first]))
+            if not locked[first].is_set():
+                locked[first].set()
+                await locked[second].wait()
+            await tx.execute(increment.where(User.id == ids[second]))
+
+        await asyncio.gather(
+            tm.run(lambda: increment_both("Bob", "Alice"), name="increment_both"),
+            tm.run(lambda: increment_both("Alice", "Bob"), name="increment_both"),
+        )
+
+        assert len(attempts) == 3
+        assert sorted(committed) == ["Alice", "Bob"]
+        assert metrics.retries("increment_both", "commit") == 1
+        rolled_back = metrics.histogram("increment_both", "rollback", "statements")
+        assert rolled_back is not None and rolled_back.count == 1
+
+        async with tm.session() as s:
+            for user_id in ids.values():
+                user = await s.get(User, user_id)
+                assert user is not None and user.posts_count == 2
+
+    async def test_run_does_not_retry_other_errors_or_nested_units(
+        self, session_factory, background_executor
+    ):
+        """
+        Ошибки, не похожие на конфликт транзакций, не повторяются,
+        как и единица работы внутри уже открытой транзакции
+        """
+
+        tm = TransactionManager(
+            session_factory, background_executor, retry_policy=RetryPolicy()
+        )
+        attempts = 0
+
+        async def fail(error: Exception) -> None:
+            nonlocal attempts
+            attempts += 1
+            raise error
+
+        with pytest.raises(ValueError):
+            await tm.run(lambda: fail(ValueError("BOOM!")))
+        assert attempts == 1
+
+        busy = sqlite3.OperationalError("database is locked")
+        with pytest.raises(sqlite3.OperationalError):
+            async with tm.transaction():
+                await tm.run(lambda: fail(busy))
+        assert attempts == 2
+
+        with pytest.raises(sqlite3.OperationalError):
+            await tm.run(lambda: fail(busy))
+        assert attempts == 5
+
+    async def test_default_classifiers(self):
+        """
+        Повторяются serialization failure и deadlock asyncpg, в том числе
+        обёрнутые SQLAlchemy, и занятая база SQLite
+        """
+
+        policy = RetryPolicy()
+        assert policy.is_retryable(SerializationError("could not serialize"))
+        assert policy.is_retryable(
+            DBAPIError("UPDATE", {}, DeadlockDetectedError("deadlock detected"))
+        )
+        assert policy.is_retryable(
+            OperationalError(
+                "INSERT", {}, sqlite3.OperationalError("database is locked")
+            )
+        )
+        assert not policy.is_retryable(
+            DBAPIError("INSERT", {}, UniqueViolationError("duplicate key"))
+        )
+        assert not policy.is_retryable(ValueError("BOOM!"))
+
+        with pytest.raises(ValueError):
+            RetryPolicy(max_attempts=0)
+
+
+class TestTransactionOptions:
+    async def test_isolation_level_and_read_only_apply_to_root_only(
+        self, tm: TransactionManager
+    ):
+        """
+        Уровень изоляции и READ ONLY действуют на корневую транзакцию
+        и сбрасываются, когда соединение возвращается в пул
+        """
+
+        show = (
+            "SELECT current_setting('transaction_isolation'), "
+            "current_setting('transaction_read_only')"
+        )
+
+        async with tm.transaction(
+            isolation_level=IsolationLevel.SERIALIZABLE, read_only=True, deferrable=True
+        ) as tx:
+            assert (await tx.execute(text(show))).one() == ("serializable", "on")
+
+        with pytest.raises(DBAPIError, match="read-only transaction"):
+            async with tm.transaction(read_only=True) as tx:
+                await tx.execute(update(User).values(posts_count=0))
+
+        async with tm.transaction() as tx:
+            assert (await tx.execute(text(show))).one() == ("read committed", "off")
+
+        with pytest.raises(ValueError):
+            tm.transaction(read_only=True, deferrable=True)
+
+    async def test_nested_transaction_must_be_compatible_with_root(
+        self, tm: TransactionManager
+    ):
+        """
+        Вложенный контекст не может писать в read-only транзакции
+        и требовать изоляцию сильнее, чем у корневой
+        """
+
+        async with tm.transaction(read_only=True):
+            with pytest.raises(RuntimeError, match="read-only"):
+                async with tm.transaction():
+                    pass
+            async with tm.transaction(read_only=True):
+                pass
+
+        async with tm.transaction(isolation_level=IsolationLevel.REPEATABLE_READ):
+            async with tm.transaction(isolation_level=IsolationLevel.READ_COMMITTED):
+                pass
+            with pytest.raises(RuntimeError, match="SERIALIZABLE"):
+                async with tm.transaction(isolation_level=IsolationLevel.SERIALIZABLE):
+                    pass
+
+        # Уровень корня по умолчанию берётся у базы
+        async with tm.transaction() as tx:
+            with pytest.raises(RuntimeError, match="REPEATABLE READ"):
+                async with tm.transaction(
+                    isolation_level=IsolationLevel.REPEATABLE_READ
+                ):
+                    pass
+            assert tm.current_session() is tx
+
+    async def test_read_only_root_uses_separate_pool(
+        self, session_factory, background_executor
+    ):
+        """
+        Корневые read-only транзакции берут соединения из отдельного пула,
+        вложенные контексты - сессию корня
+        """
+
+        read_only_engine = make_engine(DATABASE_URL, PoolSettings(size=1))
+        tm = TransactionManager(
+            session_factory,
+            background_executor,
+            read_only_session_factory=make_session_factory(read_only_engine),
+        )
+
+        try:
+            async with tm.transaction(read_only=True) as tx:
+                assert tx.bind is read_only_engine
+                async with tm.session() as s:
+                    assert s is tx
+
+            async with tm.transaction() as tx:
+                assert tx.bind is not read_only_engine
+        finally:
+            await read_only_engine.dispose()
+
+
+class TestUuid7:
+    async def test_uuid7_is_time_ordered_and_monotonic(self):
+        """
+        UUIDv7 содержит текущее время в миллисекундах и строго возрастает
+        в пределах процесса, в том числе при генерации из нескольких потоков
+        """
+
+        started_ms = time.time_ns() // 1_000_000
+        ids = [uuid7() for _ in range(10_000)]
+
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert all(id_.version == 7 and id_.variant == uuid.RFC_4122 for id_ in ids)
+        assert started_ms <= ids[0].int >> 80 <= time.time_ns() // 1_000_000
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            batches = list(
+                pool.map(lambda _: [uuid7() for _ in range(5_000)], range(4))
+            )
+        for batch in batches:
+            assert batch == sorted(batch)
+        assert len({id_ for batch in batches for id_ in batch}) == 20_000
+
+    async def test_models_use_uuid7_by_default(self):
+        """
+        По умолчанию модели получают UUIDv7, генератор можно выбрать на модели
+        """
+
+        user = User.create(name="Bob")
+        assert user.id.version == 7
+        assert User.id_factory is uuid7
@@ -0,0 +1,22 @@
+import pytest
+
+from app.infrastructure.database.query_budget import QueryBudget
+
+
+@pytest.fixture
+def query_budget(request: pytest.FixtureRequest):
+    """
+    Бюджет запросов на весь тест. Лимиты задаются маркером
+
+        @pytest.mark.query_budget(max_statements=5, max_repeats=1)
+
+    и проверяются после теста: превышение - ошибка теста с отчётом.
+    Фикстура отдаёт QueryReport, число запросов пишется в user_properties
+    """
+    marker = request.node.get_closest_marker("query_budget")
+    budget = QueryBudget(
+        **(marker.kwargs if marker is not None else {}), name=request.node.name
+    )
+    with budget as report:
+        yield report
+    request.node.user_properties.append(("query_budget_statements", len(report)))
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from dishka import AsyncContainer, make_async_container
+from sqlalchemy import delete, func, select
+
+from app.application.services.post import PostService
+from app.application.services.user import UserService
+from app.infrastructure.database.repository.outbox import OutboxRepository
+from app.infrastructure.database.transaction import TransactionManager
+from app.infrastructure.outbox import InMemoryOutboxSink, OutboxRelay
+from app.models import OutboxMessage
+from app.providers import ApplicationProvider, DatabaseProvider, InfrastructureProvider
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def di():
+    di = make_async_container(
+        DatabaseProvider(), InfrastructureProvider(), ApplicationProvider()
+    )
+    yield di
+    await di.close()
+
+
+@pytest_asyncio.fixture
+async def tm(di: AsyncContainer) -> TransactionManager:
+    return await di.get(TransactionManager)
+
+
+class FailingSink(InMemoryOutboxSink):
+    async def send(self, messages: list[OutboxMessage]) -> None:
+        raise RuntimeError("BOOM!")
+
+
+class TestOutbox:
+    async def test_create_post_writes_outbox_in_same_transaction(
+        self, di: AsyncContainer, tm: TransactionManager
+    ):
+        """
+        Сообщение outbox пишется в той же корневой транзакции, что и пост:
+        при откате транзакции сообщение не сохраняется
+        """
+
+        await self._clear_outbox(tm)
+
+        user_service = await di.get(UserService)
+        post_service = await di.get(PostService)
+
+        user_id = await user_service.create_user(name="Bob")
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await post_service.create_post(
+                    text="Hello world", user_id=user_id, attachments_url=[]
+                )
+                raise RuntimeError("BOOM!")
+
+        post_id = await post_service.create_post(
+            text="Hello world", user_id=user_id, attachments_url=[]
+        )
+
+        async with tm.session() as s:
+            messages = list(await s.scalars(select(OutboxMessage)))
+
+        assert [(m.topic, m.payload) for m in messages] == [
+            ("post_created", {"post_id": str(post_id), "user_id": str(user_id)})
+        ]
+
+    async def test_relay_delivers_in_batches_and_removes_messages(
+        self, tm: TransactionManager
+    ):
+        """
+        Релей доставляет сообщения пачками в порядке создания
+        и удаляет доставленные сообщения из таблицы
+        """
+
+        await self._clear_outbox(tm)
+
+        repository = OutboxRepository(tm)
+        async with tm.transaction():
+            for i in range(5):
+                await repository.add("test", {"i": i})
+
+        sink = InMemoryOutboxSink()
+        relay = OutboxRelay(tm, repository, sink, batch_size=2)
+
+        assert await relay.relay_once() == 2
+        assert await relay.relay_once() == 2
+        assert await relay.relay_once() == 1
+        assert await relay.relay_once() == 0
+
+        assert [m.payload["i"] for m in sink.messages] == [0, 1, 2, 3, 4]
+
+        async with tm.session() as s:
+            assert await s.scalar(select(func.count()).select_from(OutboxMessage)) == 0
+
+    async def test_relay_keeps_messages_when_sink_fails(self, tm: TransactionManager):
+        """
+        Если sink не смог доставить пачку, сообщения остаются в таблице
+        """
+
+        await self._clear_outbox(tm)
+
+        repository = OutboxRepository(tm)
+        await repository.add("test", {"i": 0})
+
+        with pytest.raises(RuntimeError):
+            await OutboxRelay(tm, repository, FailingSink()).relay_once()
+
+        sink = InMemoryOutboxSink()
+        assert await OutboxRelay(tm, repository, sink).relay_once() == 1
+        assert [m.payload for m in sink.messages] == [{"i": 0}]
+
+    async def test_concurrent_relays_do_not_deliver_twice(self, tm: TransactionManager):
+        """
+        Параллельные релеи не захватывают одни и те же сообщения
+        """
+
+        await self._clear_outbox(tm)
+
+        repository = OutboxRepository(tm)
+        async with tm.transaction():
+            for i in range(50):
+                await repository.add("test", {"i": i})
+
+        sink = InMemoryOutboxSink()
+        relays = [OutboxRelay(tm, repository, sink, batch_size=5) for _ in range(4)]
+
+        async def drain(relay: OutboxRelay) -> None:
+            while await relay.relay_once():
+                pass
+
+        await asyncio.gather(*(drain(relay) for relay in relays))
+
+        delivered = sorted(m.payload["i"] for m in sink.messages)
+        assert delivered == list(range(50))
+
+    async def test_relay_run_stops(self, tm: TransactionManager):
+        """
+        Фоновый цикл релея доставляет сообщения и останавливается по stop()
+        """
+
+        await self._clear_outbox(tm)
+
+        repository = OutboxRepository(tm)
+        sink = InMemoryOutboxSink()
+        relay = OutboxRelay(tm, repository, sink, poll_interval=0.01)
+
+        task = asyncio.create_task(relay.run())
+        await repository.add("test", {"i": 0})
+        await asyncio.sleep(0.1)
+        relay.stop()
+        await asyncio.wait_for(task, timeout=1)
+
+        assert [m.payload for m in sink.messages] == [{"i": 0}]
+
+    async def _clear_outbox(self, tm: TransactionManager):
+        async with tm.transaction() as tx:
+            await tx.execute(delete(OutboxMessage))
@@ -0,0 +1,1059 @@
+import asyncio
+import sqlite3
+
+import pytest
+from dishka import make_container
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.application.interfaces.transaction import ChildTasks, IsolationLevel
+from app.infrastructure.cache import CacheStats, LRUCache
+from app.infrastructure.common import BackgroundExecutor
+from app.infrastructure.database.ingest import BulkIngest
+from app.infrastructure.database.queries import PostQueries
+from app.infrastructure.database.query_budget import QueryBudget, statement_shape
+from app.infrastructure.database.repository.cached import (
+    CachedPostRepository,
+    CachedUserRepository,
+)
+from app.infrastructure.database.repository.common import select_by_ids, to_row
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.post_attachment import (
+    PostAttachmentRepository,
+)
+from app.infrastructure.database.repository.user import UserRepository
+from app.infrastructure.database.transaction import (
+    ReplicaRouter,
+    TransactionalSessionFactory,
+    TransactionManager,
+)
+from app.infrastructure.database.transaction.retry import RetryPolicy
+from app.models import BaseModel, Post, PostAttachment, User
+from app.providers import DatabaseProvider, make_entity_cache, make_session_factory
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture
+def di_container():
+    di_container = make_container(DatabaseProvider())
+    yield di_container
+    di_container.close()
+
+
+@pytest.fixture
+def tm(di_container) -> TransactionManager:
+    return TransactionManager(
+        di_container.get(TransactionalSessionFactory), BackgroundExecutor()
+    )
+
+
+@pytest.fixture
+def session_factory(di_container) -> TransactionalSessionFactory:
+    return di_container.get(TransactionalSessionFactory)
+
+
+@pytest.fixture
+def statements(di_container):
+    engine = di_container.get(AsyncEngine)
+    statements: list[str] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+
+
+class TestRepository:
+    async def test_insert_list_uses_single_statement(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        insert_list записывает весь список новых сущностей одним INSERT (executemany),
+        а не отдельным запросом на каждую сущность
+        """
+
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello world", user_id=user.id)
+        post_attachments = [
+            PostAttachment.create(
+                post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(50)
+        ]
+
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list([post])
+
+            statements.clear()
+            await PostAttachmentRepository(tm).insert_list(post_attachments)
+
+        inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+        assert len(inserts) == 1
+
+        async with tm.session() as s:
+            attachments_count = await s.scalar(
+                select(func.count())
+                .select_from(PostAttachment)
+                .where(PostAttachment.post_id == post.id)
+            )
+            assert attachments_count == 50
+
+    async def test_insert_list_empty_does_nothing(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Пустой список не порождает запросов к БД
+        """
+
+        await PostAttachmentRepository(tm).insert_list([])
+
+        assert not [s for s in statements if "post_attachment" in s]
+
+    async def test_save_new_entity_does_not_select(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Сохранение только что созданной сущности (.create()) выполняет только INSERT,
+        без предварительного SELECT по первичному ключу, как это делает merge()
+        """
+
+        user = User.create(name="Bob")
+
+        await UserRepository(tm).save(user)
+
+        assert not [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        assert (
+            len([s for s in statements if s.lstrip().upper().startswith("INSERT")]) == 1
+        )
+
+        async with tm.session() as s:
+            assert await s.get(User, user.id) is not None
+
+    async def test_save_detached_entity_updates_changed_columns(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Сохранение сущности, загруженной в другой сессии, выполняет UPDATE
+        только изменённых колонок без SELECT
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+        await user_repository.save(user)
+
+        async with tm.session():
+            detached_user = await user_repository.get_by_id(user.id)
+
+        detached_user.increament_posts_count()
+
+        statements.clear()
+        await user_repository.save(detached_user)
+
+        assert not [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        updates = [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+        assert len(updates) == 1
+        assert "posts_count" in updates[0]
+        assert "name" not in updates[0]
+
+        async with tm.session() as s:
+            saved_user = await s.get(User, user.id)
+            assert saved_user is not None
+            assert saved_user.posts_count == 1
+
+    async def test_save_falls_back_to_merge_on_identity_conflict(
+        self, tm: TransactionManager
+    ):
+        """
+        Если в сессии уже есть другой экземпляр с тем же первичным ключом,
+        сохранение откатывается к merge()
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+        await user_repository.save(user)
+
+        async with tm.session():
+            detached_user = await user_repository.get_by_id(user.id)
+        detached_user.increament_posts_count()
+
+        async with tm.transaction():
+            await user_repository.get_by_id(user.id)
+            await user_repository.save(detached_user)
+
+        async with tm.session() as s:
+            saved_user = await s.get(User, user.id)
+            assert saved_user is not None
+            assert saved_user.posts_count == 1
+
+    async def test_save_after_rollback_inserts_again(self, tm: TransactionManager):
+        """
+        Откат транзакции (и SAVEPOINT) возвращает записанную сущность в новые:
+        повторный save() снова выполняет INSERT, а не теряет строку
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+        user_id = user.id
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await user_repository.save(user)
+                raise RuntimeError
+
+        assert inspect(user).transient
+        await user_repository.save(user)
+
+        post = Post.create(text="Hello", user_id=user_id)
+        async with tm.transaction():
+            with pytest.raises(RuntimeError):
+                async with tm.transaction(savepoint=True):
+                    await PostRepository(tm).save(post)
+                    raise RuntimeError
+            assert inspect(post).transient
+            await PostRepository(tm).save(post)
+
+        async with tm.session() as s:
+            assert await s.get(User, user_id) is not None
+            assert await s.get(Post, post.id) is not None
+
+    async def test_save_inside_retried_run(self, session_factory):
+        """
+        Сущность, созданная вне единицы работы tm.run(), записывается
+        и повторной попыткой после отката первой
+        """
+
+        tm = TransactionManager(
+            session_factory, BackgroundExecutor(), retry_policy=RetryPolicy()
+        )
+        user = User.create(name="Bob")
+        user_id = user.id
+        attempts = 0
+
+        async def save_user() -> None:
+            nonlocal attempts
+            attempts += 1
+            await UserRepository(tm).save(user)
+            if attempts == 1:
+                raise sqlite3.OperationalError("database is locked")
+
+        await tm.run(save_user)
+
+        assert attempts == 2
+        async with tm.session() as s:
+            assert await s.get(User, user_id) is not None
+
+    async def test_save_flushes_pending_objects_first(self, tm: TransactionManager):
+        """
+        INSERT новой сущности выполняется после flush объектов, добавленных
+        в сессию через tx.add(): внешний ключ ссылается на уже записанную строку
+        """
+
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello", user_id=user.id)
+        post_id = post.id
+
+        async with tm.transaction() as tx:
+            tx.add(user)
+            await PostRepository(tm).save(post)
+
+        async with tm.session() as s:
+            assert await s.get(Post, post_id) is not None
+
+    async def test_increment_counter_is_single_update(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Инкремент счётчика выполняется одним UPDATE ... SET x = x + n
+        без предварительной загрузки сущности
+        """
+
+        user_repository = UserRepository(tm)
+        post_repository = PostRepository(tm)
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello world", user_id=user.id)
+        await user_repository.save(user)
+        await post_repository.save(post)
+
+        statements.clear()
+        await user_repository.increment_posts_count(user.id)
+        await post_repository.increment_attachments_count(post.id, 3)
+
+        assert [s.split()[0].upper() for s in statements] == ["UPDATE", "UPDATE"]
+
+        async with tm.session() as s:
+            saved_user = await s.get(User, user.id)
+            saved_post = await s.get(Post, post.id)
+            assert saved_user is not None
+            assert saved_post is not None
+            assert saved_user.posts_count == 1
+            assert saved_post.attachments_count == 3
+
+    async def test_increment_counter_of_missing_entity_raises(
+        self, tm: TransactionManager
+    ):
+        """
+        Инкремент счётчика несуществующей сущности приводит к ошибке
+        """
+
+        with pytest.raises(ValueError):
+            await UserRepository(tm).increment_posts_count(User.create(name="Bob").id)
+
+    async def test_get_by_id_uses_unit_of_work_cache(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        В рамках одной единицы работы get_by_id не ходит в БД за сущностями,
+        которые уже были сохранены или загружены в этой сессии
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+
+        async with tm.transaction():
+            await user_repository.save(user)
+            statements.clear()
+
+            assert await user_repository.get_by_id(user.id) is user
+            assert not statements
+
+        async with tm.transaction():
+            loaded_user = await user_repository.get_by_id(user.id)
+            assert len(statements) == 1
+
+            assert await user_repository.get_by_id(user.id) is loaded_user
+            assert len(statements) == 1
+
+    async def test_unit_of_work_cache_is_dropped_on_end(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Кэш единицы работы не переживает её завершение: после отката
+        сохранённая сущность в новой сессии не находится
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await user_repository.save(user)
+                raise RuntimeError("BOOM!")
+
+        with pytest.raises(ValueError):
+            await user_repository.get_by_id(user.id)
+
+    async def test_increment_counter_evicts_cached_entity(self, tm: TransactionManager):
+        """
+        Инкремент счётчика вытесняет сущность из кэша единицы работы,
+        чтобы get_by_id не вернул устаревшее значение
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+
+        async with tm.transaction():
+            await user_repository.save(user)
+            await user_repository.increment_posts_count(user.id)
+
+            loaded_user = await user_repository.get_by_id(user.id)
+            assert loaded_user.posts_count == 1
+
+    async def test_get_many_uses_single_query(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        get_many загружает все сущности одним SELECT ... WHERE id IN (...),
+        несуществующие идентификаторы просто отсутствуют в результате
+        """
+
+        user_repository = UserRepository(tm)
+        users = [User.create(name=f"Bob {i}") for i in range(5)]
+        await user_repository.insert_list(users)
+        missing_id = User.create(name="Ghost").id
+
+        statements.clear()
+        loaded = await user_repository.get_many([u.id for u in users] + [missing_id])
+
+        assert len(statements) == 1
+        assert set(loaded) == {u.id for u in users}
+
+    async def test_concurrent_get_by_id_is_batched(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Вызовы get_by_id, сделанные в одном тике event loop-а (asyncio.gather),
+        объединяются в один запрос
+        """
+
+        user_repository = UserRepository(tm)
+        users = [User.create(name=f"Bob {i}") for i in range(10)]
+        await user_repository.insert_list(users)
+
+        statements.clear()
+        loaded = await asyncio.gather(*(user_repository.get_by_id(u.id) for u in users))
+
+        assert len(statements) == 1
+        assert [u.id for u in loaded] == [u.id for u in users]
+
+        with pytest.raises(ValueError):
+            await user_repository.get_by_id(User.create(name="Ghost").id)
+
+    async def test_batched_get_by_id_uses_task_session(self, tm: TransactionManager):
+        """
+        Внутри единицы работы загрузчик использует сессию, привязанную к
+        вызывающей задаче, поэтому видны её незакомиченные данные
+        """
+
+        user_repository = UserRepository(tm)
+        user = User.create(name="Bob")
+
+        async with tm.transaction() as tx:
+            await user_repository.save(user)
+            tx.entity_cache.clear()
+
+            loaded_user = await user_repository.get_by_id(user.id)
+
+            assert loaded_user.id == user.id
+            assert inspect(loaded_user).async_session is tx
+
+    async def test_child_tasks_read_uncommitted_data_of_parent(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Дочерние задачи с унаследованной сессией видят незакомиченные данные
+        родителя, а их параллельные get_by_id объединяются в один запрос
+        """
+
+        user_repository = UserRepository(tm)
+        users = [User.create(name=f"Bob {i}") for i in range(5)]
+
+        async with tm.transaction(child_tasks=ChildTasks.INHERIT_READ_ONLY) as tx:
+            await user_repository.insert_list(users)
+            tx.entity_cache.clear()
+
+            statements.clear()
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(user_repository.get_by_id(u.id)) for u in users]
+
+            assert len(statements) == 1
+            assert [task.result().id for task in tasks] == [u.id for u in users]
+
+    async def test_child_tasks_stream_and_read_views_in_shared_session(
+        self, tm: TransactionManager
+    ):
+        """
+        Потоковое чтение, PostView и ORM-чтения дочерних задач в общей сессии
+        выполняются по очереди на одном соединении. Серверный курсор
+        в разделённой сессии запрещён, iter_keyset читает страницы целиком
+        """
+
+        user = User.create(name="Bob")
+        posts = [Post.create(text=f"Hello {i}", user_id=user.id) for i in range(30)]
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list(posts)
+
+        post_repository = PostRepository(tm)
+        queries = PostQueries(tm)
+
+        async def stream() -> list[Post]:
+            return [
+                post
+                async for post in post_repository.iter_posts_by_user(
+                    user.id, page_size=4
+                )
+            ]
+
+        async with (
+            tm.session(child_tasks=ChildTasks.INHERIT_READ_ONLY) as s,
+            asyncio.timeout(10),
+        ):
+            async with asyncio.TaskGroup() as tg:
+                streams = [tg.create_task(stream()) for _ in range(3)]
+                views = [
+                    tg.create_task(queries.get_post_view(post.id)) for post in posts
+                ]
+                loaded = tg.create_task(post_repository.get_many([p.id for p in posts]))
+
+            with pytest.raises(RuntimeError, match="shared with child tasks"):
+                await s.stream_scalars(select(Post))
+
+        for task in streams:
+            assert [post.id for post in task.result()] == [post.id for post in posts]
+        assert [task.result().id for task in views] == [post.id for post in posts]
+        assert len(loaded.result()) == len(posts)
+
+    async def test_get_many_reuses_one_statement_for_any_number_of_ids(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Загрузка по id строится один раз и даёт один текст запроса при любом
+        числе id - prepared statement asyncpg переиспользуется
+        """
+
+        users = [User.create(name=f"Bob {i}") for i in range(3)]
+        async with tm.transaction():
+            await UserRepository(tm).insert_list(users)
+
+        repository = UserRepository(tm)
+        statements.clear()
+        assert list(await repository.get_many([users[0].id])) == [users[0].id]
+        loaded = await repository.get_many([user.id for user in users])
+        assert set(loaded) == {user.id for user in users}
+
+        first, second = statements
+        assert first == second
+        assert select_by_ids(User, "postgresql") is select_by_ids(User, "postgresql")
+
+    async def test_iter_posts_by_user_streams_pages_in_keyset_order(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        iter_posts_by_user отдаёт посты пользователя в порядке (created_at, id)
+        страницами; вне сессии каждая страница читается в своей короткой
+        сессии, не привязанной к контексту вызывающего кода
+        """
+
+        user = User.create(name="Bob")
+        posts = [Post.create(text=f"Post {i}", user_id=user.id) for i in range(5)]
+        # Одинаковое время создания: порядок внутри задаёт id
+        for post in posts[:3]:
+            post.created_at = posts[0].created_at
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list(posts)
+
+        repository = PostRepository(tm)
+        statements.clear()
+        streamed = []
+        async for post in repository.iter_posts_by_user(user.id, page_size=2):
+            assert tm.current_session() is None
+            # Запись между строками идёт в собственной транзакции
+            async with tm.transaction():
+                await repository.increment_attachments_count(post.id)
+            streamed.append(post.id)
+
+        expected = sorted(posts, key=lambda post: (post.created_at, post.id))
+        assert streamed == [post.id for post in expected]
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+        assert len(selects) == 3
+
+        async with tm.session() as s:
+            attachments_count = await s.scalar(
+                select(func.sum(Post.attachments_count)).where(Post.user_id == user.id)
+            )
+            assert attachments_count == 5
+
+    async def test_iter_attachments_by_post_uses_callers_session(
+        self, tm: TransactionManager
+    ):
+        """
+        Внутри tm.session() страницы читаются в сессии вызывающего кода
+        """
+
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello world", user_id=user.id)
+        attachments = [
+            PostAttachment.create(
+                post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(3)
+        ]
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list([post])
+            await PostAttachmentRepository(tm).insert_list(attachments)
+
+        repository = PostAttachmentRepository(tm)
+        async with tm.session() as s:
+            streamed = [
+                attachment
+                async for attachment in repository.iter_attachments_by_post(
+                    post.id, page_size=3
+                )
+            ]
+            assert all(
+                inspect(attachment).session is s.sync_session for attachment in streamed
+            )
+
+        assert {attachment.id for attachment in streamed} == {
+            attachment.id for attachment in attachments
+        }
+
+
+class TestCachedRepository:
+    async def test_lru_cache_evicts_by_size_and_ttl(self):
+        """
+        LRU-кэш вытесняет самые давно использованные записи при переполнении
+        и записи с истёкшим TTL, ведя счётчики попаданий, промахов и вытеснений
+        """
+
+        now = [0.0]
+        cache: LRUCache[str, int] = LRUCache(max_size=2, ttl=10, clock=lambda: now[0])
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+        now[0] = 10
+        assert cache.get("a") is None
+
+        assert cache.stats == CacheStats(hits=3, misses=2, evictions=1, expirations=1)
+
+    async def test_get_by_id_reads_through_cache(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        Повторное чтение закомиченной сущности обслуживается из кэша без запроса к БД
+        """
+
+        repository = CachedUserRepository(
+            tm, UserRepository(tm), make_entity_cache(User)
+        )
+        user = User.create(name="Bob")
+        await repository.save(user)
+
+        statements.clear()
+        first = await repository.get_by_id(user.id)
+        second = await repository.get_by_id(user.id)
+
+        assert len(statements) == 1
+        assert first is not second
+        assert second.name == "Bob"
+        assert repository.cache.stats.hits == 1
+
+    async def test_cache_never_serves_uncommitted_or_rolled_back_data(
+        self, tm: TransactionManager
+    ):
+        """
+        Кэш не отдаёт незакомиченные и откаченные данные: запись вытесняется
+        только после коммита, а внутри изменившей сущность единицы работы
+        кэш не используется
+        """
+
+        repository = CachedUserRepository(
+            tm, UserRepository(tm), make_entity_cache(User)
+        )
+        user = User.create(name="Bob")
+        await repository.save(user)
+        assert (await repository.get_by_id(user.id)).posts_count == 0
+
+        async def read_posts_count() -> int:
+            return (await repository.get_by_id(user.id)).posts_count
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await repository.increment_posts_count(user.id)
+
+                assert await repository.get_by_id(user.id) is not None
+                assert (await repository.get_by_id(user.id)).posts_count == 1
+                assert await asyncio.create_task(read_posts_count()) == 0
+                raise RuntimeError("BOOM!")
+
+        assert await read_posts_count() == 0
+
+        async with tm.transaction():
+            await repository.increment_posts_count(user.id)
+            assert await asyncio.create_task(read_posts_count()) == 0
+
+        assert await read_posts_count() == 1
+
+    async def test_cache_is_not_populated_by_uncommitted_insert(
+        self, tm: TransactionManager
+    ):
+        """
+        Сущность, созданная в откаченной единице работы, не попадает в кэш
+        """
+
+        repository = CachedUserRepository(
+            tm, UserRepository(tm), make_entity_cache(User)
+        )
+        user = User.create(name="Bob")
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await repository.save(user)
+                assert await repository.get_by_id(user.id) is user
+                raise RuntimeError("BOOM!")
+
+        with pytest.raises(ValueError):
+            await repository.get_by_id(user.id)
+
+    async def test_cache_is_not_populated_from_lagging_replica(
+        self, session_factory, tmp_path
+    ):
+        """
+        Промах кэша вне единицы работы читается с primary. Строки, прочитанные
+        в сессии реплики, в кэш не кладутся: отстающая реплика не может
+        оставить в кэше устаревшую строку на весь TTL
+        """
+
+        replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/replica.db")
+        async with replica.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.create_all)
+        try:
+            tm = TransactionManager(
+                session_factory,
+                BackgroundExecutor(),
+                ReplicaRouter([make_session_factory(replica)]),
+            )
+            repository = CachedUserRepository(
+                tm, UserRepository(tm), make_entity_cache(User)
+            )
+
+            user = User.create(name="Bob")
+            user_id = user.id
+            await repository.save(user)
+            # Реплика получила строку, но ещё не получила инкремент
+            async with make_session_factory(replica).begin() as s:
+                s.add(User(**to_row(user)))
+            await repository.increment_posts_count(user_id)
+
+            async with tm.session():
+                assert (await repository.get_by_id(user_id)).posts_count == 0
+                assert (await repository.get_many([user_id]))[user_id].posts_count == 0
+
+            assert (await repository.get_by_id(user_id)).posts_count == 1
+            assert (await repository.get_many([user_id]))[user_id].posts_count == 1
+            assert repository.cache.stats.hits == 1
+        finally:
+            await replica.dispose()
+
+    async def test_cache_is_not_populated_from_transaction_snapshot(
+        self, tm: TransactionManager
+    ):
+        """
+        Чтение в транзакции REPEATABLE READ видит снимок, взятый до чужого
+        коммита, и не кладёт его в кэш: после обеих транзакций читается
+        актуальная строка
+        """
+
+        repository = CachedUserRepository(
+            tm, UserRepository(tm), make_entity_cache(User)
+        )
+        user = User.create(name="Bob")
+        user_id = user.id
+        await repository.save(user)
+
+        async with tm.transaction(isolation_level=IsolationLevel.REPEATABLE_READ) as tx:
+            await tx.execute(text("SELECT 1"))
+            await asyncio.create_task(repository.increment_posts_count(user_id))
+
+            assert (await repository.get_by_id(user_id)).posts_count == 0
+            assert (await repository.get_many([user_id]))[user_id].posts_count == 0
+
+        assert (await repository.get_by_id(user_id)).posts_count == 1
+        assert (await repository.get_many([user_id]))[user_id].posts_count == 1
+
+
+class TestQueryBudget:
+    async def test_statement_shape_ignores_values(self):
+        """
+        Форма запроса не зависит от значений параметров, литералов
+        и длины списков IN / VALUES
+        """
+
+        assert statement_shape(
+            "SELECT * FROM post\n WHERE id IN ($1::UUID, $2::UUID) AND n = 10"
+        ) == statement_shape("SELECT * FROM post WHERE id IN ($1::UUID) AND n = 7")
+        assert (
+            statement_shape("INSERT INTO t (a, b) VALUES ($1, 'x'), ($2, 'y')")
+            == "INSERT INTO t (a, b) VALUES (?)"
+        )
+
+    async def test_budget_flags_n_plus_one(self, tm: TransactionManager):
+        """
+        save_list выполняет INSERT на каждую сущность - бюджет помечает
+        повторяющийся запрос, а insert_list укладывается в один запрос
+        """
+
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello", user_id=user.id)
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list([post])
+
+        repository = PostAttachmentRepository(tm)
+
+        def attachments():
+            return [
+                PostAttachment.create(
+                    post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+                )
+                for i in range(3)
+            ]
+
+        with pytest.raises(AssertionError, match="3x INSERT INTO post_attachment"):
+            with QueryBudget(max_repeats=1):
+                await repository.save_list(attachments())
+
+        with pytest.raises(AssertionError, match="3 statements \\(max 2\\)"):
+            with QueryBudget(max_statements=2):
+                await repository.save_list(attachments())
+
+        with QueryBudget(max_statements=1, max_repeats=1) as report:
+            await repository.insert_list(attachments())
+        assert len(report) == 1
+
+    async def test_log_only_budget_of_root_transactions(
+        self, tm: TransactionManager, caplog
+    ):
+        """
+        tm.set_query_budget включает лог-детектор: превысившие бюджет
+        корневые транзакции пишутся в лог с именем метода, исключение не бросается
+        """
+
+        tm.set_query_budget(max_statements=1)
+
+        async with tm.transaction() as tx:
+            await tx.execute(text("SELECT 1"))
+        assert "Query budget" not in caplog.text
+
+        async with tm.transaction() as tx:
+            await tx.execute(text("SELECT 1"))
+            await tx.execute(text("SELECT 2"))
+
+        assert (
+            "Query budget of TestQueryBudget.test_log_only_budget_of_root_transactions:"
+            " 2 statements (max 1)"
+        ) in caplog.text
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
+class TestBulkIngest:
+    async def test_ingest_copies_chunks_and_recomputes_counters(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        На Postgres строки пишутся через COPY чанками, минуя INSERT,
+        после загрузки attachments_count и posts_count пересчитываются
+        """
+
+        user = User.create(name="Bob")
+        user_id = user.id
+        await UserRepository(tm).insert_list([user])
+
+        posts = [Post.create(text=f"Hello {i}", user_id=user_id) for i in range(5)]
+        post_ids = [post.id for post in posts]
+        attachments = [
+            PostAttachment.create(
+                post_id=post_ids[i % 2], file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(7)
+        ]
+
+        statements.clear()
+        assert await BulkIngest(
+            tm, make_entity_cache(User), make_entity_cache(Post)
+        ).ingest(aiter_list(posts), aiter_list(attachments), chunk_size=2) == (5, 7)
+
+        assert not [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+
+        async with tm.session() as s:
+            assert (await s.get(User, user_id)).posts_count == 5
+            counts = dict(
+                (await s.execute(select(Post.id, Post.attachments_count))).all()
+            )
+            assert [counts[post_id] for post_id in post_ids] == [4, 3, 0, 0, 0]
+
+    async def test_ingest_recomputes_and_evicts_only_touched_rows(
+        self, tm: TransactionManager
+    ):
+        """
+        Счётчики пересчитываются только у пользователей и постов из загрузки,
+        их закэшированные строки вытесняются после коммита
+        """
+
+        user_cache, post_cache = make_entity_cache(User), make_entity_cache(Post)
+        users = CachedUserRepository(tm, UserRepository(tm), user_cache)
+        bob, alice = User.create(name="Bob"), User.create(name="Alice")
+        bob_id, alice_id = bob.id, alice.id
+        post = Post.create(text="Hello", user_id=bob_id)
+        post_id = post.id
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([bob, alice])
+            # Счётчики не ведутся: пост Alice пересчёт не затрагивает
+            await PostRepository(tm).insert_list(
+                [post, Post.create(text="Hi", user_id=alice_id)]
+            )
+        posts = CachedPostRepository(tm, PostRepository(tm), post_cache)
+        assert (await users.get_by_id(bob_id)).posts_count == 0
+        assert (await posts.get_by_id(post_id)).attachments_count == 0
+
+        await BulkIngest(tm, user_cache, post_cache).ingest(
+            aiter_list([Post.create(text="Hello 2", user_id=bob_id)]),
+            aiter_list(
+                [
+                    PostAttachment.create(
+                        post_id=post_id, file_url="https://examle.com/1.jpg"
+                    )
+                ]
+            ),
+        )
+
+        assert (await users.get_by_id(bob_id)).posts_count == 2
+        assert (await posts.get_by_id(post_id)).attachments_count == 1
+        assert (await users.get_by_id(alice_id)).posts_count == 0
+
+    async def test_copy_is_part_of_outer_transaction(self, tm: TransactionManager):
+        """
+        COPY выполняется в транзакции сессии: откат внешней транзакции
+        откатывает загруженные строки
+        """
+
+        user = User.create(name="Bob")
+        user_id = user.id
+        await UserRepository(tm).insert_list([user])
+        posts = [Post.create(text="Hello", user_id=user_id) for _ in range(3)]
+
+        with pytest.raises(RuntimeError):
+            async with tm.transaction():
+                await BulkIngest(
+                    tm, make_entity_cache(User), make_entity_cache(Post)
+                ).ingest_posts(aiter_list(posts), chunk_size=2)
+                raise RuntimeError
+
+        async with tm.session() as s:
+            assert not list(
+                await s.scalars(select(Post).where(Post.user_id == user_id))
+            )
+
+    async def test_invalid_url_rejects_whole_chunk(self, tm: TransactionManager):
+        """
+        url вложений проверяются пачкой до записи: чанк с невалидным url
+        не записывается целиком, уже записанные чанки остаются
+        """
+
+        user = User.create(name="Bob")
+        post = Post.create(text="Hello", user_id=user.id)
+        post_id = post.id
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list([post])
+
+        base = PostAttachment.gen_base_properties
+        attachments = [
+            PostAttachment(**base(), post_id=post_id, file_url=file_url)
+            for file_url in (
+                "https://examle.com/1.jpg",
+                "https://examle.com/2.jpg",
+                "https://examle.com/3.jpg",
+                "not a url",
+            )
+        ]
+
+        with pytest.raises(ValueError, match="incorrect pattern"):
+            await BulkIngest(
+                tm, make_entity_cache(User), make_entity_cache(Post)
+            ).ingest_attachments(aiter_list(attachments), chunk_size=2)
+
+        async with tm.session() as s:
+            file_urls = await s.scalars(
+                select(PostAttachment.file_url).where(PostAttachment.post_id == post_id)
+            )
+            assert sorted(file_urls) == [
+                "https://examle.com/1.jpg",
+                "https://examle.com/2.jpg",
+            ]
+
+    async def test_sqlite_falls_back_to_executemany(self, tmp_path):
+        """
+        На драйверах без COPY чанки пишутся одним INSERT (executemany) на чанк
+        """
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/ingest.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.create_all)
+        tm = TransactionManager(make_session_factory(engine), BackgroundExecutor())
+
+        statements: list[str] = []
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+
+        user = User.create(name="Bob")
+        user_id = user.id
+        posts = [Post.create(text="Hello", user_id=user_id) for _ in range(5)]
+        attachments = [
+            PostAttachment.create(
+                post_id=posts[0].id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(3)
+        ]
+        await UserRepository(tm).insert_list([user])
+
+        await BulkIngest(tm, make_entity_cache(User), make_entity_cache(Post)).ingest(
+            aiter_list(posts), aiter_list(attachments), chunk_size=2
+        )
+
+        inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+        assert len(inserts) == 1 + 3 + 2
+
+        async with tm.session() as s:
+            assert (await s.get(User, user_id)).posts_count == 5
+
+        await engine.dispose()
+
+
+class TestPostQueries:
+    async def test_post_views_skip_identity_map(
+        self, tm: TransactionManager, statements: list[str]
+    ):
+        """
+        PostView собирается из колонок двумя запросами (посты с автором
+        и вложения), сущности в identity map сессии не попадают
+        """
+
+        user = User.create(name="Bob")
+        posts = [Post.create(text=f"Hello {i}", user_id=user.id) for i in range(3)]
+        post_ids = [post.id for post in posts]
+        attachments = [
+            PostAttachment.create(
+                post_id=post_ids[0], file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(2)
+        ]
+        posts[0].update_attachments_count(2)
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            await PostRepository(tm).insert_list(posts)
+            await PostAttachmentRepository(tm).insert_list(attachments)
+
+        queries = PostQueries(tm)
+        statements.clear()
+        async with tm.session() as s:
+            views = await queries.get_post_views(post_ids[:2])
+            assert len(s.identity_map) == 0
+
+        assert len(statements) == 2
+        assert list(views) == post_ids[:2]
+        assert views[post_ids[0]].author_name == "Bob"
+        assert views[post_ids[0]].attachment_urls == (
+            "https://examle.com/image0.jpg",
+            "https://examle.com/image1.jpg",
+        )
+        assert views[post_ids[1]].attachment_urls == ()
+
+        statements.clear()
+        latest = await queries.list_post_views_by_user(user.id, limit=2)
+        assert [view.id for view in latest] == post_ids[:0:-1]
+        # У последних двух постов вложений нет, запрос вложений не нужен
+        assert len(statements) == 1
+
+        with pytest.raises(ValueError, match="Post not found"):
+            await queries.get_post_view(User.id_factory())
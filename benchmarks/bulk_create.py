@@ -0,0 +1,106 @@
+"""
+Пакетное создание постов PostService.create_posts в зависимости от размера
+чанка против create_post в цикле: пропускная способность и пик памяти
+(tracemalloc) на пакет из TOTAL постов с вложением.
+
+    uv run -m benchmarks.bulk_create
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+from app.application.services.post import NewPost, PostService
+from app.application.services.post_attachment import PostattachmentService
+from app.application.services.user import UserService
+from app.infrastructure.database.repository.outbox import OutboxRepository
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.post_attachment import (
+    PostAttachmentRepository,
+)
+from app.infrastructure.database.repository.user import UserRepository
+
+from .common import count_statements, make_engine, make_tm, print_table
+
+TOTAL = 5_000
+USERS = 50
+CHUNK_SIZES = (10, 100, 500, 2000)
+LOOP_TOTAL = 500
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    user_repository = UserRepository(tm)
+    post_repository = PostRepository(tm)
+    post_attachment_repository = PostAttachmentRepository(tm)
+    post_service = PostService(
+        _tm=tm,
+        _post_repository=post_repository,
+        _user_repository=user_repository,
+        _outbox_repository=OutboxRepository(tm),
+        _post_attachment_repository=post_attachment_repository,
+        _post_attachment_servie=PostattachmentService(
+            tm, post_attachment_repository, post_repository
+        ),
+    )
+
+    user_ids = await UserService(tm, user_repository).create_users(
+        names=[f"bench {i}" for i in range(USERS)]
+    )
+
+    def make_posts(total: int) -> list[NewPost]:
+        return [
+            NewPost(
+                text=f"bench {i}",
+                user_id=user_ids[i % USERS],
+                attachments_url=[f"https://examle.com/image{i}.jpg"],
+            )
+            for i in range(total)
+        ]
+
+    async def create_in_loop(posts: list[NewPost]) -> None:
+        for post in posts:
+            await post_service.create_post(
+                text=post.text,
+                user_id=post.user_id,
+                attachments_url=post.attachments_url,
+            )
+
+    variants = [("create_post loop", "-", LOOP_TOTAL, create_in_loop)]
+    for chunk_size in CHUNK_SIZES:
+
+        async def create_posts(posts: list[NewPost], chunk_size=chunk_size) -> None:
+            await post_service.create_posts(posts=posts, chunk_size=chunk_size)
+
+        variants.append(("create_posts", str(chunk_size), TOTAL, create_posts))
+
+    rows = []
+    for name, chunk, total, fn in variants:
+        posts = make_posts(total)
+
+        tracemalloc.start()
+        with count_statements(engine) as statements:
+            started = time.perf_counter()
+            await fn(posts)
+            elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append(
+            (
+                name,
+                chunk,
+                total,
+                len(statements),
+                f"{total / elapsed:.0f}",
+                f"{peak / 2**20:.1f}",
+            )
+        )
+
+    print_table(("method", "chunk", "posts", "statements", "posts/s", "peak MiB"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
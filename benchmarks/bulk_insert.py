@@ -0,0 +1,61 @@
+"""
+Сравнение PostAttachmentRepository.save_list (запрос на каждую сущность)
+и insert_list (один INSERT / executemany) по числу запросов и задержке.
+
+    uv run -m benchmarks.bulk_insert
+"""
+
+import asyncio
+
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.post_attachment import (
+    PostAttachmentRepository,
+)
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import Post, PostAttachment, User
+
+from .common import count_statements, make_engine, make_tm, measure, print_table
+
+SIZES = (1, 10, 50, 200, 1000)
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    repository = PostAttachmentRepository(tm)
+
+    user = User.create(name="bench")
+    post = Post.create(text="bench", user_id=user.id)
+    async with tm.transaction():
+        await UserRepository(tm).insert_list([user])
+        await PostRepository(tm).insert_list([post])
+
+    def make_attachments(size: int) -> list[PostAttachment]:
+        return [
+            PostAttachment.create(
+                post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i in range(size)
+        ]
+
+    rows = []
+    for size in SIZES:
+        for name, method in (
+            ("save_list", repository.save_list),
+            ("insert_list", repository.insert_list),
+        ):
+            with count_statements(engine) as statements:
+                await method(make_attachments(size))
+
+            async def run(method=method, size=size):
+                await method(make_attachments(size))
+
+            median, p95 = await measure(run)
+            rows.append((name, size, len(statements), f"{median:.2f}", f"{p95:.2f}"))
+
+    print_table(("method", "size", "statements", "median ms", "p95 ms"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
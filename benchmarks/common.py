@@ -0,0 +1,72 @@
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.config import DATABASE_URL
+from app.infrastructure.common import BackgroundExecutor
+from app.infrastructure.database.transaction import (
+    TransactionalSession,
+    TransactionManager,
+)
+
+
+def make_engine() -> AsyncEngine:
+    return create_async_engine(DATABASE_URL)
+
+
+def make_tm(engine: AsyncEngine) -> TransactionManager:
+    return TransactionManager(
+        async_sessionmaker(
+            bind=engine,
+            class_=TransactionalSession,
+            expire_on_commit=True,
+            autoflush=False,
+        ),
+        BackgroundExecutor(),
+    )
+
+
+@dataclass
+class StatementCounter:
+    statements: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_statements(engine: AsyncEngine):
+    counter = StatementCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter._on_execute)
+
+
+async def measure(
+    fn: Callable[[], Awaitable[object]], repeat: int = 5
+) -> tuple[float, float]:
+    """Возвращает медиану и p95 (в миллисекундах) для `repeat` прогонов."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))]
+
+
+def print_table(header: tuple[str, ...], rows: list[tuple]) -> None:
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in (header, *rows):
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,94 @@
+"""
+Накладные расходы Python на вызов get_by_id: запрос, собираемый
+на каждый вызов (как было), против заранее построенного select_by_ids,
+а также влияние кэша скомпилированных запросов SQLAlchemy
+и кэша prepared statements asyncpg.
+
+    uv run -m benchmarks.get_by_id
+"""
+
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app.config import DATABASE_URL, PoolSettings, StatementCacheSettings
+from app.infrastructure.database.pool import make_engine
+from app.infrastructure.database.repository.common import select_by_ids
+from app.models import User
+
+from .common import make_tm, print_table
+
+ITERATIONS = 2_000
+BUILD_ITERATIONS = 50_000
+
+
+def build_per_call(user_id: uuid.UUID):
+    # Запрос исходного UserRepository.get_by_id
+    return select(User).where(User.id == user_id).limit(1)
+
+
+async def main() -> None:
+    rows = []
+
+    started = time.perf_counter()
+    for _ in range(BUILD_ITERATIONS):
+        build_per_call(uuid.uuid4())
+    elapsed = time.perf_counter() - started
+    rows.append(
+        ("build select per call", "-", f"{elapsed / BUILD_ITERATIONS * 1e6:.2f}")
+    )
+
+    started = time.perf_counter()
+    for _ in range(BUILD_ITERATIONS):
+        select_by_ids(User, "postgresql")
+    elapsed = time.perf_counter() - started
+    rows.append(
+        ("prebuilt select_by_ids", "-", f"{elapsed / BUILD_ITERATIONS * 1e6:.2f}")
+    )
+
+    for cache_name, cache in (
+        ("default caches", StatementCacheSettings()),
+        ("no compiled cache", StatementCacheSettings(compiled_cache_size=0)),
+        ("no prepared cache", StatementCacheSettings(prepared_statement_cache_size=0)),
+    ):
+        engine = make_engine(DATABASE_URL, PoolSettings(), statement_cache=cache)
+        tm = make_tm(engine)
+
+        user = User.create(name="bench")
+        user_id = user.id
+        async with tm.transaction() as tx:
+            tx.add(user)
+
+        for query_name, query in (
+            ("per call", lambda: (build_per_call(user_id), None)),
+            ("prebuilt", lambda: (select_by_ids(User, "postgresql"), [user_id])),
+        ):
+
+            async def get_by_id(s, query=query):
+                statement, ids = query()
+                params = {"ids": ids} if ids is not None else None
+                # identity map очищается, чтобы каждый вызов шёл в базу
+                s.expunge_all()
+                return (await s.scalars(statement, params)).one()
+
+            async with tm.session() as s:
+                await get_by_id(s)
+
+                started = time.perf_counter()
+                for _ in range(ITERATIONS):
+                    await get_by_id(s)
+                elapsed = time.perf_counter() - started
+
+            rows.append(
+                (f"{query_name} query", cache_name, f"{elapsed / ITERATIONS * 1e6:.2f}")
+            )
+
+        await engine.dispose()
+
+    print_table(("variant", "caches", "us per call"), rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Загрузка постов с вложениями: insert_list репозиториев против BulkIngest
+(COPY через asyncpg) - пропускная способность на TOTAL постов
+и столько же вложений; пересчёт счётчиков затронутых пользователей
+и постов (одинаковый для обоих) замеряется отдельно.
+
+    uv run -m benchmarks.ingest
+"""
+
+import asyncio
+import itertools
+import time
+
+from app.infrastructure.database.ingest import INGEST_CHUNK_SIZE, BulkIngest
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.post_attachment import (
+    PostAttachmentRepository,
+)
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import Post, PostAttachment, User
+from app.providers import make_entity_cache
+
+from .common import make_engine, make_tm, print_table
+
+TOTAL = 50_000
+USERS = 100
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    post_repository = PostRepository(tm)
+    post_attachment_repository = PostAttachmentRepository(tm)
+    ingest = BulkIngest(tm, make_entity_cache(User), make_entity_cache(Post))
+
+    users = [User.create(name=f"bench {i}") for i in range(USERS)]
+    user_ids = [user.id for user in users]
+    await UserRepository(tm).insert_list(users)
+
+    def make_rows() -> tuple[list[Post], list[PostAttachment]]:
+        posts = [
+            Post.create(text=f"bench {i}", user_id=user_ids[i % USERS])
+            for i in range(TOTAL)
+        ]
+        attachments = [
+            PostAttachment.create(
+                post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for i, post in enumerate(posts)
+        ]
+        return posts, attachments
+
+    async def insert_list(posts, attachments) -> None:
+        for chunk in itertools.batched(posts, INGEST_CHUNK_SIZE):
+            await post_repository.insert_list(list(chunk))
+        for chunk in itertools.batched(attachments, INGEST_CHUNK_SIZE):
+            await post_attachment_repository.insert_list(list(chunk))
+
+    async def copy(posts, attachments) -> None:
+        await ingest.ingest_posts(aiter_list(posts))
+        await ingest.ingest_attachments(aiter_list(attachments))
+
+    rows = []
+    for name, fn in (("insert_list", insert_list), ("BulkIngest (COPY)", copy)):
+        posts, attachments = make_rows()
+        started = time.perf_counter()
+        await fn(posts, attachments)
+        elapsed = time.perf_counter() - started
+        rows.append(
+            (name, str(TOTAL * 2), f"{elapsed:.2f}", f"{TOTAL * 2 / elapsed:.0f}")
+        )
+
+    started = time.perf_counter()
+    await ingest.recompute_counters(user_ids, [post.id for post in posts])
+    elapsed = time.perf_counter() - started
+    rows.append(("recompute_counters", "-", f"{elapsed:.2f}", "-"))
+
+    print_table(("method", "rows", "s", "rows/s"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Задержка event loop-а, пока параллельно идут транзакции и CPU-нагруженная
+обработка пачек ссылок: прямо в корутине, в пуле потоков и в пуле процессов
+(BackgroundExecutor.run_in_pool).
+
+    uv run -m benchmarks.loop_lag
+"""
+
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from app.infrastructure.common import BackgroundExecutor, PoolMode
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import PostAttachment, User
+
+from .common import make_engine, make_tm, print_table
+
+BATCHES = 20
+BATCH_SIZE = 20_000
+TICK = 0.005
+
+
+def canonicalize_urls(urls: list[str]) -> list[str]:
+    result = []
+    for url in urls:
+        PostAttachment.validate_file_url(url)
+        parts = urlsplit(url.strip())
+        path = "/".join(part for part in parts.path.split("/") if part)
+        result.append(
+            urlunsplit((parts.scheme.lower(), parts.netloc.lower(), f"/{path}", "", ""))
+        )
+    return result
+
+
+async def measure_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+    return lags
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    repository = UserRepository(tm)
+
+    urls = [f"https://Examle.com//images/{i}.jpg" for i in range(BATCH_SIZE)]
+
+    async def db_load(stop: asyncio.Event) -> int:
+        transactions = 0
+        while not stop.is_set():
+            async with tm.transaction():
+                await repository.insert_list([User.create(name="bench")])
+            transactions += 1
+        return transactions
+
+    rows = []
+    for name, pool_mode in (
+        ("inline", None),
+        ("thread", PoolMode.THREAD),
+        ("process", PoolMode.PROCESS),
+    ):
+        executor = BackgroundExecutor(pool_mode=pool_mode or PoolMode.THREAD)
+
+        async def process(batch: list[str]) -> list[str]:
+            if pool_mode is None:
+                return canonicalize_urls(batch)
+            return await executor.run_in_pool(canonicalize_urls, batch)
+
+        # Прогрев пула, чтобы не учитывать запуск процессов
+        await process(urls[:1])
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(measure_lag(stop))
+        db_task = asyncio.create_task(db_load(stop))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(process(urls) for _ in range(BATCHES)))
+        elapsed = (time.perf_counter() - started) * 1000
+
+        stop.set()
+        lags = sorted(await lag_task)
+        transactions = await db_task
+        await executor.shutdown()
+
+        rows.append(
+            (
+                name,
+                f"{elapsed:.0f}",
+                transactions,
+                f"{statistics.median(lags):.2f}",
+                f"{lags[int(0.99 * (len(lags) - 1))]:.2f}",
+                f"{lags[-1]:.2f}",
+            )
+        )
+
+    print_table(
+        ("mode", "total ms", "transactions", "lag p50 ms", "lag p99 ms", "lag max ms"),
+        rows,
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Чтение постов пользователя с автором и вложениями: ORM-сущности
+(Post, User, PostAttachment в identity map сессии) против PostView
+из PostQueries. Время CPU и пик памяти (tracemalloc) на строку.
+
+    uv run -m benchmarks.read_models
+"""
+
+import asyncio
+import itertools
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from app.infrastructure.database.ingest import BulkIngest
+from app.infrastructure.database.queries import PostQueries
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import Post, PostAttachment, User
+from app.providers import make_entity_cache
+
+from .common import make_engine, make_tm, print_table
+
+SIZES = (100, 1_000, 10_000)
+ATTACHMENTS = 2
+REPEAT = 5
+
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    queries = PostQueries(tm)
+
+    async def load_entities(user_id, limit: int) -> int:
+        async with tm.session() as s:
+            posts = list(
+                await s.scalars(
+                    select(Post)
+                    .where(Post.user_id == user_id)
+                    .order_by(Post.created_at.desc(), Post.id.desc())
+                    .limit(limit)
+                )
+            )
+            await s.get(User, user_id)
+            attachments = list(
+                await s.scalars(
+                    select(PostAttachment)
+                    .where(PostAttachment.post_id.in_([post.id for post in posts]))
+                    .order_by(
+                        PostAttachment.post_id,
+                        PostAttachment.created_at,
+                        PostAttachment.id,
+                    )
+                )
+            )
+            assert len(attachments) == len(posts) * ATTACHMENTS
+            return len(posts)
+
+    async def load_views(user_id, limit: int) -> int:
+        return len(await queries.list_post_views_by_user(user_id, limit=limit))
+
+    rows = []
+    for size in SIZES:
+        user = User.create(name="bench")
+        user_id = user.id
+        await UserRepository(tm).insert_list([user])
+        posts = [
+            Post.create(
+                text=f"bench {i}", user_id=user_id, attachments_count=ATTACHMENTS
+            )
+            for i in range(size)
+        ]
+        attachments = [
+            PostAttachment.create(
+                post_id=post.id, file_url=f"https://examle.com/image{i}.jpg"
+            )
+            for post, i in itertools.product(posts, range(ATTACHMENTS))
+        ]
+        ingest = BulkIngest(tm, make_entity_cache(User), make_entity_cache(Post))
+        await ingest.ingest_posts(aiter_list(posts))
+        await ingest.ingest_attachments(aiter_list(attachments))
+
+        for name, fn in (("ORM entities", load_entities), ("PostView", load_views)):
+            await fn(user_id, size)
+
+            cpu = []
+            for _ in range(REPEAT):
+                started = time.process_time()
+                count = await fn(user_id, size)
+                cpu.append(time.process_time() - started)
+                assert count == size
+
+            tracemalloc.start()
+            await fn(user_id, size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            rows.append(
+                (
+                    name,
+                    size,
+                    f"{min(cpu) / size * 1e6:.1f}",
+                    f"{peak / size / 1024:.2f}",
+                )
+            )
+
+    print_table(("method", "posts", "CPU us/post", "peak KiB/post"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Накладные расходы вложенных tm.transaction(): только flush (по умолчанию)
+против SAVEPOINT (savepoint=True) - число запросов и задержка корневой
+транзакции с N вложенными единицами работы.
+
+    uv run -m benchmarks.savepoint
+"""
+
+import asyncio
+
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import User
+
+from .common import count_statements, make_engine, make_tm, measure, print_table
+
+SIZES = (1, 10, 50, 200)
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    repository = UserRepository(tm)
+
+    async def run(size: int, savepoint: bool) -> None:
+        async with tm.transaction():
+            for _ in range(size):
+                async with tm.transaction(savepoint=savepoint):
+                    await repository.save(User.create(name="bench"))
+
+    rows = []
+    for size in SIZES:
+        for name, savepoint in (("flush", False), ("savepoint", True)):
+            with count_statements(engine) as statements:
+                await run(size, savepoint)
+
+            async def bench(size=size, savepoint=savepoint):
+                await run(size, savepoint)
+
+            median, p95 = await measure(bench)
+            rows.append((name, size, len(statements), f"{median:.2f}", f"{p95:.2f}"))
+
+    print_table(("nesting", "units", "statements", "median ms", "p95 ms"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Накладные расходы привязки сессии к задаче: вход/выход из корневого и
+вложенных контекстов tm.session() и поиск tm.current_session().
+К БД запросы не выполняются, измеряется только учёт контекстов.
+
+    uv run -m benchmarks.session_context
+"""
+
+import asyncio
+import time
+from contextlib import nullcontext
+
+from .common import make_engine, make_tm, print_table
+
+ITERATIONS = 20_000
+NESTED = 5
+TASKS = 100
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+
+    async def root_context() -> None:
+        async with tm.session():
+            pass
+
+    async def nested_contexts() -> None:
+        for _ in range(NESTED):
+            async with tm.session():
+                tm.current_session()
+
+    async def in_tasks() -> None:
+        await asyncio.gather(*(root_context() for _ in range(TASKS)))
+
+    rows = []
+    for name, fn, iterations in (
+        ("root session()", root_context, ITERATIONS),
+        (f"{NESTED} nested in root", nested_contexts, ITERATIONS),
+        (f"{TASKS} tasks x root", in_tasks, ITERATIONS // TASKS),
+    ):
+        async with tm.session() if fn is nested_contexts else nullcontext():
+            await fn()
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await fn()
+            elapsed = time.perf_counter() - started
+
+        rows.append((name, iterations, f"{elapsed / iterations * 1e6:.2f}"))
+
+    lookups = ITERATIONS * 10
+    async with tm.session():
+        started = time.perf_counter()
+        for _ in range(lookups):
+            tm.current_session()
+        elapsed = time.perf_counter() - started
+    rows.append(("current_session()", lookups, f"{elapsed / lookups * 1e6:.3f}"))
+
+    print_table(("operation", "iterations", "us per op"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Чтение всех постов пользователя: session.scalars() целиком против
+потокового iter_posts_by_user (серверный курсор + keyset-пагинация).
+Пик памяти (tracemalloc) должен расти с числом постов только у scalars().
+
+    uv run -m benchmarks.stream
+"""
+
+import asyncio
+import itertools
+import time
+import tracemalloc
+
+from sqlalchemy import select
+
+from app.infrastructure.database.repository.post import PostRepository
+from app.infrastructure.database.repository.user import UserRepository
+from app.models import Post, User
+
+from .common import make_engine, make_tm, print_table
+
+SIZES = (1_000, 10_000, 50_000)
+
+
+async def main() -> None:
+    engine = make_engine()
+    tm = make_tm(engine)
+    repository = PostRepository(tm)
+
+    async def read_all(user_id) -> int:
+        async with tm.session() as s:
+            posts = list(await s.scalars(select(Post).where(Post.user_id == user_id)))
+        return len(posts)
+
+    async def stream(user_id) -> int:
+        count = 0
+        async for _ in repository.iter_posts_by_user(user_id):
+            count += 1
+        return count
+
+    rows = []
+    for size in SIZES:
+        user = User.create(name="bench")
+        user_id = user.id
+        async with tm.transaction():
+            await UserRepository(tm).insert_list([user])
+            for chunk in itertools.batched(range(size), 5_000):
+                await repository.insert_list(
+                    [Post.create(text=f"bench {i}", user_id=user_id) for i in chunk]
+                )
+
+        for name, fn in (("scalars()", read_all), ("iter_posts_by_user", stream)):
+            tracemalloc.start()
+            started = time.perf_counter()
+            count = await fn(user_id)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            assert count == size
+            rows.append((name, size, f"{elapsed * 1000:.0f}", f"{peak / 2**20:.1f}"))
+
+    print_table(("method", "posts", "ms", "peak MiB"), rows)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
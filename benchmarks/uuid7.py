@@ -0,0 +1,84 @@
+"""
+Первичные ключи uuid4 против UUIDv7: скорость генерации, пропускная
+способность вставки пачками и размер таблицы и индекса первичного ключа
+после вставки ROWS строк (Postgres).
+
+    uv run -m benchmarks.uuid7
+"""
+
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import Column, MetaData, String, Table, Uuid, insert, text
+
+from app.models.ids import uuid7
+
+from .common import make_engine, print_table
+
+ROWS = 200_000
+BATCH = 2_000
+GENERATE = 100_000
+
+
+async def main() -> None:
+    engine = make_engine()
+    rows = []
+
+    for name, factory in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+        started = time.perf_counter()
+        for _ in range(GENERATE):
+            factory()
+        generate_us = (time.perf_counter() - started) / GENERATE * 1e6
+
+        metadata = MetaData()
+        table = Table(
+            f"bench_ids_{name}",
+            metadata,
+            Column("id", Uuid, primary_key=True),
+            Column("payload", String, nullable=False),
+        )
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.drop_all)
+            await conn.run_sync(metadata.create_all)
+
+        started = time.perf_counter()
+        for _ in range(ROWS // BATCH):
+            async with engine.begin() as conn:
+                await conn.execute(
+                    insert(table),
+                    [{"id": factory(), "payload": "bench"} for _ in range(BATCH)],
+                )
+        elapsed = time.perf_counter() - started
+
+        async with engine.begin() as conn:
+            table_size, index_size = (
+                await conn.execute(
+                    text(
+                        "SELECT pg_relation_size(:table), "
+                        "pg_relation_size(:table || '_pkey')"
+                    ),
+                    {"table": table.name},
+                )
+            ).one()
+            await conn.run_sync(metadata.drop_all)
+
+        rows.append(
+            (
+                name,
+                f"{generate_us:.2f}",
+                f"{ROWS / elapsed:.0f}",
+                f"{table_size / 2**20:.1f}",
+                f"{index_size / 2**20:.1f}",
+            )
+        )
+
+    print_table(
+        ("id", "us per id", "rows/s", "table MiB", "pkey index MiB"),
+        rows,
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())